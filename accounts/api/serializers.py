@@ -4,9 +4,18 @@ from rest_framework import exceptions
 
 
 class UserSerializer(serializers.HyperlinkedModelSerializer):
+    followers_count = serializers.IntegerField(
+        source='profile.followers_count',
+        read_only=True,
+    )
+    followings_count = serializers.IntegerField(
+        source='profile.followings_count',
+        read_only=True,
+    )
+
     class Meta:
         model = User
-        fields = ('id', 'username', 'email')
+        fields = ('id', 'username', 'email', 'followers_count', 'followings_count')
 
 
 class UserSerializerForTweet(serializers.ModelSerializer):
@@ -23,6 +32,14 @@ class UserSerializerForComment(UserSerializerForTweet):
     pass
 
 
+class UserSerializerForLike(UserSerializerForTweet):
+    pass
+
+
+class UserSerializerForNotification(UserSerializerForTweet):
+    pass
+
+
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField()
@@ -1,5 +1,5 @@
 from testing.testcases import TestCase
-from rest_framework.test import APIClient
+from testing.clients import APIClient
 from django.contrib.auth.models import User
 
 
@@ -13,6 +13,7 @@ class AccountApiTests(TestCase):
 
     def setUp(self):
         # this function is executed when the 'test function' command is triggered
+        self.clear_cache()
         self.client = APIClient()
         self.user = self.create_user(
             username='admin',
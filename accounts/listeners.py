@@ -0,0 +1,13 @@
+def user_changed(sender, instance, created=False, **kwargs):
+    # import inside the function to avoid the circular import
+    from accounts.models import UserProfile
+    from utils.memcached_helper import MemcachedHelper
+
+    MemcachedHelper.invalidate_cached_object(sender, instance.pk)
+    if created:
+        UserProfile.objects.create(user=instance)
+
+
+def profile_changed(sender, instance, **kwargs):
+    from utils.memcached_helper import MemcachedHelper
+    MemcachedHelper.invalidate_cached_object(sender, instance.pk)
@@ -0,0 +1,133 @@
+from accounts.models import UserProfile
+from comments.models import Comment
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.contrib.contenttypes.models import ContentType
+from friendships.models import Friendship
+from likes.models import Like
+from likes.services import LikeService
+from tweets.models import Tweet
+from utils.memcached_helper import MemcachedHelper
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the denormalized counters, Tweet.comments_count, '
+        'Tweet.likes_count / Comment.likes_count and '
+        'UserProfile.followers_count / followings_count, in batches and '
+        'fix the rows which drifted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='number of rows recomputed per batch',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fixed = self.reconcile_comments_counts(batch_size)
+        self.stdout.write('{} tweets comments_count fixed'.format(fixed))
+        # the buffered likes are written first, otherwise the next flush
+        # would add them on top of the recomputed counts
+        LikeService.flush_likes_counts()
+        for model_class in (Tweet, Comment):
+            fixed = self.reconcile_likes_counts(model_class, batch_size)
+            self.stdout.write('{} {} likes_count fixed'.format(
+                fixed,
+                model_class._meta.verbose_name_plural,
+            ))
+        fixed = self.reconcile_friendships_counts(batch_size)
+        self.stdout.write('{} user profiles counts fixed'.format(fixed))
+
+    def iterate_batches(self, queryset, batch_size):
+        # walk the table by primary key range, no OFFSET is issued
+        last_pk = None
+        while True:
+            batch = queryset.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            batch = list(batch[:batch_size])
+            if not batch:
+                return
+            yield batch
+            last_pk = batch[-1].pk
+
+    def count_by(self, queryset, field, values):
+        rows = queryset.filter(**{'{}__in'.format(field): values})\
+            .values(field)\
+            .annotate(count=Count('id'))
+        return {row[field]: row['count'] for row in rows}
+
+    def reconcile_comments_counts(self, batch_size):
+        fixed = 0
+        queryset = Tweet.objects.only('id', 'comments_count')
+        for tweets in self.iterate_batches(queryset, batch_size):
+            counts = self.count_by(
+                Comment.objects.all(),
+                'tweet_id',
+                [tweet.id for tweet in tweets],
+            )
+            for tweet in tweets:
+                count = counts.get(tweet.id, 0)
+                if tweet.comments_count == count:
+                    continue
+                Tweet.objects.filter(id=tweet.id).update(comments_count=count)
+                MemcachedHelper.invalidate_cached_object(Tweet, tweet.id)
+                fixed += 1
+        return fixed
+
+    def reconcile_likes_counts(self, model_class, batch_size):
+        fixed = 0
+        queryset = model_class.objects.only('id', 'likes_count')
+        likes = Like.objects.filter(
+            content_type=ContentType.objects.get_for_model(model_class),
+        )
+        for objects in self.iterate_batches(queryset, batch_size):
+            counts = self.count_by(likes, 'object_id', [obj.id for obj in objects])
+            for obj in objects:
+                count = counts.get(obj.id, 0)
+                if obj.likes_count == count:
+                    continue
+                model_class.objects.filter(id=obj.id).update(likes_count=count)
+                MemcachedHelper.invalidate_cached_object(model_class, obj.id)
+                fixed += 1
+        return fixed
+
+    def reconcile_friendships_counts(self, batch_size):
+        fixed = 0
+        queryset = User.objects.only('id')
+        for users in self.iterate_batches(queryset, batch_size):
+            user_ids = [user.id for user in users]
+            # users created before the profiles existed may miss one
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=user_id) for user_id in user_ids],
+                ignore_conflicts=True,
+            )
+            followers_counts = self.count_by(
+                Friendship.objects.all(),
+                'to_user_id',
+                user_ids,
+            )
+            followings_counts = self.count_by(
+                Friendship.objects.all(),
+                'from_user_id',
+                user_ids,
+            )
+            profiles = UserProfile.objects.filter(user_id__in=user_ids)
+            for profile in profiles:
+                followers_count = followers_counts.get(profile.user_id, 0)
+                followings_count = followings_counts.get(profile.user_id, 0)
+                if profile.followers_count == followers_count and \
+                        profile.followings_count == followings_count:
+                    continue
+                UserProfile.objects.filter(user_id=profile.user_id).update(
+                    followers_count=followers_count,
+                    followings_count=followings_count,
+                )
+                MemcachedHelper.invalidate_cached_object(UserProfile, profile.user_id)
+                fixed += 1
+        return fixed
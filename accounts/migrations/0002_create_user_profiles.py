@@ -0,0 +1,34 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def create_user_profiles(apps, schema_editor):
+    # the counters start at 0, run manage.py reconcile_counters afterwards
+    User = apps.get_model('auth', 'User')
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    last_user_id = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(id__gt=last_user_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:BATCH_SIZE]
+        )
+        if not user_ids:
+            break
+        UserProfile.objects.bulk_create(
+            [UserProfile(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+        last_user_id = user_ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_user_profiles, migrations.RunPython.noop),
+    ]
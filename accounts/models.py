@@ -0,0 +1,39 @@
+from accounts.listeners import profile_changed, user_changed
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models.signals import post_save, pre_delete
+
+
+class UserProfile(models.Model):
+    # the primary key is the user id, so the profiles can be cached by user
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    # denormalized counters, updated with F() expressions by the friendship
+    # listeners and fixed by the reconcile_counters command if they drift
+    followers_count = models.IntegerField(default=0)
+    followings_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return '{} {}'.format(self.user, self.followers_count)
+
+
+def get_profile(user):
+    from accounts.services import UserService
+
+    if hasattr(user, '_cached_user_profile'):
+        return getattr(user, '_cached_user_profile')
+    profile = UserService.get_profile_through_cache(user.id)
+    # cache on the user object to avoid repeated cache lookups
+    setattr(user, '_cached_user_profile', profile)
+    return profile
+
+
+# add a profile property to User for quick access
+User.profile = property(get_profile)
+
+# hook up with listeners to invalidate the cached users and profiles
+post_save.connect(user_changed, sender=User)
+pre_delete.connect(user_changed, sender=User)
+post_save.connect(profile_changed, sender=UserProfile)
+pre_delete.connect(profile_changed, sender=UserProfile)
@@ -0,0 +1,69 @@
+from accounts.models import UserProfile
+from django.contrib.auth.models import User
+from django.db.models import F
+from utils.memcached_helper import MemcachedHelper
+
+
+class UserService(object):
+
+    @classmethod
+    def get_user_through_cache(cls, user_id):
+        # returns None if the user does not exist
+        return MemcachedHelper.get_object_through_cache(User, user_id)
+
+    @classmethod
+    def get_users_through_cache(cls, user_ids):
+        # returns {user_id: user} with one cache multi-get, the misses are
+        # loaded with a single IN query
+        return MemcachedHelper.get_objects_through_cache(User, user_ids)
+
+    @classmethod
+    def get_profile_through_cache(cls, user_id):
+        # UserProfile is keyed by user id, so is its cache
+        return MemcachedHelper.get_object_through_cache(UserProfile, user_id)
+
+    @classmethod
+    def get_profiles_through_cache(cls, user_ids):
+        # returns {user_id: profile}
+        return MemcachedHelper.get_objects_through_cache(UserProfile, user_ids)
+
+    @classmethod
+    def incr_profile_counts(cls, user_id, **deltas):
+        """
+        atomically add the deltas to the profile counters, e.g.
+        incr_profile_counts(user_id, followers_count=1). update() does not
+        send post_save, so the cached profile is invalidated here
+        """
+        UserProfile.objects.filter(user_id=user_id).update(**{
+            field: F(field) + delta
+            for field, delta in deltas.items()
+        })
+        MemcachedHelper.invalidate_cached_object(UserProfile, user_id)
+
+    @classmethod
+    def incr_profiles_counts(cls, user_ids, **deltas):
+        # the same deltas for many profiles, with one UPDATE
+        UserProfile.objects.filter(user_id__in=user_ids).update(**{
+            field: F(field) + delta
+            for field, delta in deltas.items()
+        })
+        MemcachedHelper.invalidate_cached_objects(UserProfile, user_ids)
+
+    @classmethod
+    def hydrate_users(cls, objects, user_field='user'):
+        """
+        load the users referenced by user_field of a page of objects in one
+        batch and attach them, so that the UserSerializerFor* serializers
+        do not issue one query per object
+        """
+        objects = list(objects)
+        user_id_field = '{}_id'.format(user_field)
+        users = cls.get_users_through_cache([
+            getattr(obj, user_id_field)
+            for obj in objects
+        ])
+        for obj in objects:
+            user_id = getattr(obj, user_id_field)
+            if user_id in users:
+                setattr(obj, user_field, users[user_id])
+        return objects
@@ -0,0 +1,98 @@
+from accounts.models import UserProfile
+from accounts.services import UserService
+from django.core.management import call_command
+from io import StringIO
+from testing.testcases import TestCase
+from tweets.models import Tweet
+from tweets.services import TweetService
+
+
+class UserServiceTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+
+    def test_get_user_through_cache(self):
+        user = self.create_user('alfredo')
+
+        # cache miss
+        with self.assertNumQueries(1):
+            cached_user = UserService.get_user_through_cache(user.id)
+        self.assertEqual(cached_user.username, 'alfredo')
+
+        # cache hit
+        with self.assertNumQueries(0):
+            cached_user = UserService.get_user_through_cache(user.id)
+        self.assertEqual(cached_user.username, 'alfredo')
+
+        # the cache is invalidated on save
+        user.username = 'alfredo2'
+        user.save()
+        cached_user = UserService.get_user_through_cache(user.id)
+        self.assertEqual(cached_user.username, 'alfredo2')
+
+        # the cache is invalidated on delete
+        user_id = user.id
+        user.delete()
+        self.assertEqual(UserService.get_user_through_cache(user_id), None)
+
+    def test_hydrate_users(self):
+        users = [self.create_user('user{}'.format(i)) for i in range(3)]
+        tweets = [self.create_tweet(user) for user in users]
+        tweets = [
+            TweetService.get_tweet_through_cache(tweet.id)
+            for tweet in tweets
+        ]
+
+        with self.assertNumQueries(1):
+            UserService.hydrate_users(tweets)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [tweet.user.username for tweet in tweets],
+                ['user0', 'user1', 'user2'],
+            )
+            UserService.hydrate_users(tweets)
+
+    def test_profile(self):
+        user = self.create_user('alfredo')
+        self.assertEqual(UserProfile.objects.filter(user=user).exists(), True)
+        self.assertEqual(user.profile.followers_count, 0)
+        self.assertEqual(user.profile.followings_count, 0)
+
+
+class ReconcileCountersCommandTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+
+    def test_reconcile_counters(self):
+        alfredo = self.create_user('alfredo')
+        trump = self.create_user('trump')
+        tweet = self.create_tweet(alfredo)
+        self.create_comment(trump, tweet)
+        self.create_friendship(trump, alfredo)
+        # the like is still buffered, it is flushed before the recount
+        self.create_like(trump, tweet)
+
+        # let the counters drift
+        Tweet.objects.filter(id=tweet.id).update(comments_count=5)
+        UserProfile.objects.filter(user=alfredo).update(followers_count=0)
+        UserProfile.objects.filter(user=trump).delete()
+
+        out = StringIO()
+        call_command('reconcile_counters', batch_size=1, stdout=out)
+        self.assertIn('1 tweets comments_count fixed', out.getvalue())
+        self.assertIn('0 tweets likes_count fixed', out.getvalue())
+        self.assertIn('2 user profiles counts fixed', out.getvalue())
+        self.assertEqual(TweetService.get_tweet_through_cache(tweet.id).comments_count, 1)
+        self.assertEqual(TweetService.get_tweet_through_cache(tweet.id).likes_count, 1)
+        profile = UserService.get_profile_through_cache(alfredo.id)
+        self.assertEqual(profile.followers_count, 1)
+        profile = UserService.get_profile_through_cache(trump.id)
+        self.assertEqual(profile.followings_count, 1)
+
+        # nothing to fix the second time
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('0 tweets comments_count fixed', out.getvalue())
+        self.assertIn('0 user profiles counts fixed', out.getvalue())
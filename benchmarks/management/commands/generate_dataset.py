@@ -0,0 +1,215 @@
+from comments.models import Comment
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from friendships.models import Friendship
+from itertools import accumulate
+from newsfeeds.models import NewsFeed
+from newsfeeds.sharding import get_shard_alias
+from tweets.models import Tweet
+from utils.storage import WIDE_COLUMN, get_storage_backend
+import random
+
+WORDS = (
+    'django', 'python', 'redis', 'cache', 'mysql', 'feed', 'tweet', 'follow',
+    'latency', 'query', 'index', 'shard', 'queue', 'worker', 'celery', 'hello',
+    'world', 'today', 'coffee', 'music', 'game', 'news', 'sports', 'weather',
+)
+HASHTAGS = ('#django', '#python', '#news', '#music', '#sports', '#tbt')
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic dataset: users, a power-law follow graph, '
+        'tweets with their newsfeeds, and comments, inserted with bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--max-followings',
+            type=int,
+            default=100,
+            help='each user follows between 1 and this many users',
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.2,
+            help='exponent of the power law of the followers counts',
+        )
+        parser.add_argument('--tweets-per-user', type=int, default=5)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument(
+            '--prefix',
+            default='bench',
+            help='prefix of the generated usernames',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                'users prefixed with "{}" already exist, use another --prefix'
+                .format(prefix),
+            )
+
+        user_ids = self.create_users(prefix, options['users'])
+        self.stdout.write('{} users created'.format(len(user_ids)))
+        followers = self.create_friendships(
+            user_ids,
+            options['max_followings'],
+            options['alpha'],
+        )
+        self.stdout.write('{} friendships created'.format(
+            sum(len(ids) for ids in followers.values()),
+        ))
+        tweets = self.create_tweets(user_ids, options['tweets_per_user'])
+        self.stdout.write('{} tweets created'.format(len(tweets)))
+        newsfeeds_count = self.create_newsfeeds(tweets, followers)
+        self.stdout.write('{} newsfeeds created'.format(newsfeeds_count))
+        comments_count = self.create_comments(
+            user_ids,
+            tweets,
+            options['comments'],
+        )
+        self.stdout.write('{} comments created'.format(comments_count))
+
+        # bulk_create sends no signal, let reconcile_counters create the
+        # profiles and compute the counters
+        call_command(
+            'reconcile_counters',
+            batch_size=self.batch_size,
+            stdout=self.stdout,
+        )
+        # the wide column rows are written by the signals and the fanout,
+        # copy the bulk inserted rows when a wide column backend is used
+        if get_storage_backend('friendships.Friendship') == WIDE_COLUMN:
+            call_command(
+                'copy_friendships_to_wide_column',
+                batch_size=self.batch_size,
+                stdout=self.stdout,
+            )
+        if get_storage_backend('newsfeeds.NewsFeed') == WIDE_COLUMN:
+            call_command(
+                'copy_newsfeeds_to_wide_column',
+                batch_size=self.batch_size,
+                stdout=self.stdout,
+            )
+        # the tweets are indexed by the signals too
+        call_command(
+            'rebuild_search_index',
+            chunk_size=self.batch_size,
+            stdout=self.stdout,
+        )
+
+    def bulk_create(self, model_class, objects, using=None):
+        model_class.objects.db_manager(using).bulk_create(
+            objects,
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+
+    def create_users(self, prefix, users_count):
+        # hashing is slow on purpose, share a single hash across the users
+        password = make_password('generic password')
+        self.bulk_create(User, [
+            User(
+                username='{}{}'.format(prefix, i),
+                email='{}{}@twitter.com'.format(prefix, i),
+                password=password,
+            )
+            for i in range(users_count)
+        ])
+        return list(
+            User.objects.filter(username__startswith=prefix)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+    def create_friendships(self, user_ids, max_followings, alpha):
+        """
+        every user follows a uniform number of users, picked with a
+        probability proportional to 1 / rank ** alpha of a random popularity
+        rank, so that the followers counts follow a power law.
+        returns {user_id: [follower_id]}
+        """
+        ranked_user_ids = list(user_ids)
+        self.random.shuffle(ranked_user_ids)
+        cum_weights = list(accumulate(
+            1.0 / (rank + 1) ** alpha
+            for rank in range(len(ranked_user_ids))
+        ))
+
+        followers = {user_id: [] for user_id in user_ids}
+        friendships = []
+        for from_user_id in user_ids:
+            followings_count = self.random.randint(1, max_followings)
+            to_user_ids = set(self.random.choices(
+                ranked_user_ids,
+                cum_weights=cum_weights,
+                k=followings_count,
+            ))
+            to_user_ids.discard(from_user_id)
+            for to_user_id in to_user_ids:
+                followers[to_user_id].append(from_user_id)
+                friendships.append(Friendship(
+                    from_user_id=from_user_id,
+                    to_user_id=to_user_id,
+                ))
+        self.bulk_create(Friendship, friendships)
+        return followers
+
+    def random_content(self):
+        words = self.random.choices(WORDS, k=self.random.randint(3, 12))
+        if self.random.random() < 0.3:
+            words.append(self.random.choice(HASHTAGS))
+        return ' '.join(words)
+
+    def create_tweets(self, user_ids, tweets_per_user):
+        # returns [(tweet_id, user_id)], the ids are generated up front
+        tweets = [
+            Tweet(user_id=user_id, content=self.random_content())
+            for user_id in user_ids
+            for _ in range(self.random.randint(0, tweets_per_user * 2))
+        ]
+        self.bulk_create(Tweet, tweets)
+        return [(tweet.id, tweet.user_id) for tweet in tweets]
+
+    def create_newsfeeds(self, tweets, followers):
+        # mirror the fanout: the author and, unless they are a celebrity,
+        # every follower receives a newsfeed
+        newsfeeds = []
+        for tweet_id, user_id in tweets:
+            newsfeeds.append(NewsFeed(user_id=user_id, tweet_id=tweet_id))
+            if len(followers[user_id]) > settings.CELEBRITY_FOLLOWERS_THRESHOLD:
+                continue
+            for follower_id in followers[user_id]:
+                newsfeeds.append(NewsFeed(user_id=follower_id, tweet_id=tweet_id))
+        shards = {}
+        for newsfeed in newsfeeds:
+            alias = get_shard_alias(newsfeed.user_id)
+            shards.setdefault(alias, []).append(newsfeed)
+        for alias, shard_newsfeeds in shards.items():
+            self.bulk_create(NewsFeed, shard_newsfeeds, using=alias)
+        return len(newsfeeds)
+
+    def create_comments(self, user_ids, tweets, comments_count):
+        if not tweets:
+            return 0
+        comments = [
+            Comment(
+                user_id=self.random.choice(user_ids),
+                tweet_id=self.random.choice(tweets)[0],
+                content=self.random_content()[:140],
+            )
+            for _ in range(comments_count)
+        ]
+        self.bulk_create(Comment, comments)
+        return len(comments)
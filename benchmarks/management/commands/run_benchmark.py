@@ -0,0 +1,118 @@
+from benchmarks.stats import summarize
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+from testing.clients import CaptureAllQueriesContext
+from tweets.models import Tweet
+from twitter import celery_app
+import json
+import random
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the main endpoints through the test client against the users '
+        'generated by generate_dataset, and report the p50 / p95 / p99 '
+        'latency and the query counts of every endpoint as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix',
+            default='bench',
+            help='prefix of the usernames created by generate_dataset',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='number of measured requests per endpoint',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=20,
+            help='number of unmeasured requests per endpoint, to fill caches',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--sync-fanout',
+            action='store_true',
+            help='run the fanout tasks inline, so tweets.create includes them',
+        )
+        parser.add_argument('--output', help='also write the report to a file')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.user_ids = list(
+            User.objects.filter(username__startswith=options['prefix'])
+            .values_list('id', flat=True)
+        )
+        if not self.user_ids:
+            raise CommandError(
+                'no user prefixed with "{}", run generate_dataset first'
+                .format(options['prefix']),
+            )
+        self.tweet_ids = list(
+            Tweet.objects.filter(user_id__in=self.user_ids[:1000])
+            .values_list('id', flat=True)[:10000]
+        )
+        if options['sync_fanout']:
+            celery_app.conf.task_always_eager = True
+
+        report = {}
+        for name, make_request in self.get_endpoints():
+            for _ in range(options['warmup']):
+                make_request()
+            report[name] = self.measure(make_request, options['requests'])
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def get_client(self):
+        client = APIClient(SERVER_NAME='localhost')
+        user = User(id=self.random.choice(self.user_ids))
+        client.force_authenticate(user)
+        return client
+
+    def get_endpoints(self):
+        return [
+            ('tweets.create', lambda: self.get_client().post('/api/tweets/', {
+                'content': 'benchmark tweet {}'.format(self.random.random()),
+            })),
+            ('newsfeeds.list', lambda: self.get_client().get(
+                '/api/newsfeeds/',
+            )),
+            ('comments.list', lambda: self.get_client().get('/api/comments/', {
+                'tweet_id': self.random.choice(self.tweet_ids or [0]),
+            })),
+            ('friendships.followers', lambda: self.get_client().get(
+                '/api/friendships/{}/followers/'.format(
+                    self.random.choice(self.user_ids),
+                ),
+            )),
+            ('friendships.followings', lambda: self.get_client().get(
+                '/api/friendships/{}/followings/'.format(
+                    self.random.choice(self.user_ids),
+                ),
+            )),
+        ]
+
+    def measure(self, make_request, requests_count):
+        latencies_ms, queries_counts, errors = [], [], 0
+        for _ in range(requests_count):
+            with CaptureAllQueriesContext() as context:
+                start = time.perf_counter()
+                response = make_request()
+                latency = time.perf_counter() - start
+            if response.status_code >= 400:
+                errors += 1
+            latencies_ms.append(round(latency * 1000, 3))
+            queries_counts.append(len(context.captured_queries))
+        summary = summarize(latencies_ms, queries_counts)
+        summary['errors'] = errors
+        return summary
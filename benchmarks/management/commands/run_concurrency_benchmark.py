@@ -0,0 +1,259 @@
+from asgiref.sync import async_to_sync
+from benchmarks.stats import summarize
+from contextlib import contextmanager
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from io import BytesIO
+from tweets.models import Tweet
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+import asyncio
+import json
+import random
+import time
+
+MODES = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare how many concurrent requests one worker serves in the WSGI '
+        'and in the ASGI mode. The clients send waves of --concurrency GET '
+        'requests to the read endpoints: the WSGI worker serves a wave one '
+        'request at a time, the ASGI worker interleaves it on its event '
+        'loop. Reports the latency seen by the clients and the throughput '
+        'of every endpoint and mode as JSON. --query-latency-ms stands for '
+        'the round trips to a remote database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix',
+            default='bench',
+            help='prefix of the usernames created by generate_dataset',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='number of measured requests per endpoint and mode',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help='number of requests sent at the same time',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=20,
+            help='number of unmeasured requests per endpoint, to fill caches',
+        )
+        parser.add_argument(
+            '--query-latency-ms',
+            type=float,
+            default=0,
+            help='time added to every database query',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='also write the report to a file')
+
+    def handle(self, *args, **options):
+        # imported here, the applications set Django up when imported
+        from twitter.asgi import application as asgi_application
+        from twitter.wsgi import application as wsgi_application
+
+        self.asgi_application = asgi_application
+        self.wsgi_application = wsgi_application
+        self.random = random.Random(options['seed'])
+        self.user_ids = list(
+            User.objects.filter(username__startswith=options['prefix'])
+            .values_list('id', flat=True)
+        )
+        if not self.user_ids:
+            raise CommandError(
+                'no user prefixed with "{}", run generate_dataset first'
+                .format(options['prefix']),
+            )
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        self.tweet_ids = list(
+            Tweet.objects.filter(user_id__in=self.user_ids[:1000])
+            .values_list('id', flat=True)[:10000]
+        )
+        self.cookies = [
+            self.login(user_id)
+            for user_id in self.random.sample(
+                self.user_ids,
+                min(options['concurrency'], len(self.user_ids)),
+            )
+        ]
+
+        report = {}
+        with self.query_latency(options['query_latency_ms']):
+            for name, make_request in self.get_endpoints():
+                report[name] = {}
+                for mode in MODES:
+                    self.run_wave(mode, [
+                        make_request() for _ in range(options['warmup'])
+                    ])
+                    report[name][mode] = self.measure(
+                        mode,
+                        make_request,
+                        options['requests'],
+                        options['concurrency'],
+                    )
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def login(self, user_id):
+        # both modes authenticate with the session cookie
+        client = Client()
+        client.force_login(User.objects.get(id=user_id))
+        return '{}={}'.format(
+            settings.SESSION_COOKIE_NAME,
+            client.cookies[settings.SESSION_COOKIE_NAME].value,
+        )
+
+    def get_endpoints(self):
+        # a request is (path, query params, session cookie)
+        def request(path, params=None):
+            return path, params or {}, self.random.choice(self.cookies)
+
+        return [
+            ('tweets.list', lambda: request('/api/tweets/', {
+                'user_id': self.random.choice(self.user_ids),
+            })),
+            ('tweets.retrieve', lambda: request('/api/tweets/{}/'.format(
+                self.random.choice(self.tweet_ids or [0]),
+            ))),
+            ('newsfeeds.list', lambda: request('/api/newsfeeds/')),
+            ('friendships.followers', lambda: request(
+                '/api/friendships/{}/followers/'.format(
+                    self.random.choice(self.user_ids),
+                ),
+            )),
+            ('friendships.followings', lambda: request(
+                '/api/friendships/{}/followings/'.format(
+                    self.random.choice(self.user_ids),
+                ),
+            )),
+        ]
+
+    @contextmanager
+    def query_latency(self, latency_ms):
+        # every connection, the ones of the thread pool of the ASGI mode
+        # included, sleeps before it runs a query
+        def delay(execute, sql, params, many, context):
+            time.sleep(latency_ms / 1000)
+            return execute(sql, params, many, context)
+
+        def add_delay(sender, connection, **kwargs):
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        if not latency_ms:
+            yield
+            return
+        connection_created.connect(add_delay)
+        for connection in connections.all():
+            add_delay(None, connection)
+        try:
+            yield
+        finally:
+            connection_created.disconnect(add_delay)
+            for connection in connections.all():
+                connection.execute_wrappers.remove(delay)
+
+    def measure(self, mode, make_request, requests_count, concurrency):
+        latencies_ms, errors = [], 0
+        start = time.perf_counter()
+        for i in range(0, requests_count, concurrency):
+            wave = [
+                make_request()
+                for _ in range(min(concurrency, requests_count - i))
+            ]
+            for latency, status_code in self.run_wave(mode, wave):
+                latencies_ms.append(round(latency * 1000, 3))
+                if status_code >= 400:
+                    errors += 1
+        elapsed = time.perf_counter() - start
+        summary = summarize(latencies_ms)
+        summary['errors'] = errors
+        summary['throughput_rps'] = round(requests_count / elapsed, 1) if elapsed else None
+        return summary
+
+    def run_wave(self, mode, wave):
+        # returns [(latency, status_code)], the latencies are counted from
+        # the start of the wave, when every client sent its request
+        if mode == 'wsgi':
+            start = time.perf_counter()
+            results = []
+            for request in wave:
+                status_code = self.call_wsgi(*request)
+                results.append((time.perf_counter() - start, status_code))
+            return results
+        return async_to_sync(self.run_asgi_wave)(wave)
+
+    async def run_asgi_wave(self, wave):
+        start = time.perf_counter()
+
+        async def run(request):
+            status_code = await self.call_asgi(*request)
+            return time.perf_counter() - start, status_code
+
+        return await asyncio.gather(*[run(request) for request in wave])
+
+    def call_wsgi(self, path, params, cookie):
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': urlencode(params),
+            'HTTP_COOKIE': cookie,
+            'wsgi.input': BytesIO(),
+        }
+        setup_testing_defaults(environ)
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(int(status.split(' ', 1)[0]))
+
+        result = self.wsgi_application(environ, start_response)
+        try:
+            b''.join(result)
+        finally:
+            result.close()
+        return statuses[0]
+
+    async def call_asgi(self, path, params, cookie):
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': urlencode(params).encode(),
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+        }
+        statuses = []
+        received = []
+
+        async def receive():
+            if not received:
+                received.append(True)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        await self.asgi_application(scope, receive, send)
+        return statuses[0]
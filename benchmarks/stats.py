@@ -0,0 +1,26 @@
+import math
+
+
+def percentile(sorted_values, percent):
+    # nearest-rank percentile of an ascending list
+    if not sorted_values:
+        return None
+    rank = max(int(math.ceil(percent / 100.0 * len(sorted_values))), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies_ms, queries_counts=None):
+    latencies_ms = sorted(latencies_ms)
+    summary = {
+        'requests': len(latencies_ms),
+        'p50_ms': percentile(latencies_ms, 50),
+        'p95_ms': percentile(latencies_ms, 95),
+        'p99_ms': percentile(latencies_ms, 99),
+        'max_ms': latencies_ms[-1] if latencies_ms else None,
+    }
+    if queries_counts is not None:
+        summary['queries_mean'] = (
+            sum(queries_counts) / len(queries_counts) if queries_counts else None
+        )
+        summary['queries_max'] = max(queries_counts) if queries_counts else None
+    return summary
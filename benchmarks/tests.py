@@ -0,0 +1,127 @@
+from benchmarks.stats import percentile, summarize
+from comments.models import Comment
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core import signals
+from django.core.management.base import CommandError
+from django.db import close_old_connections
+from friendships.models import Friendship
+from io import StringIO
+from newsfeeds.models import NewsFeed
+from testing.testcases import TestCase
+from tweets.models import Tweet
+import json
+
+
+class StatsTests(TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), None)
+
+    def test_summarize(self):
+        summary = summarize([3, 1, 2], [4, 2, 3])
+        self.assertEqual(summary['requests'], 3)
+        self.assertEqual(summary['p50_ms'], 2)
+        self.assertEqual(summary['max_ms'], 3)
+        self.assertEqual(summary['queries_mean'], 3)
+        self.assertEqual(summary['queries_max'], 4)
+
+
+class BenchmarkCommandsTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+
+    def generate(self, **options):
+        call_command(
+            'generate_dataset',
+            users=30,
+            max_followings=5,
+            tweets_per_user=2,
+            comments=20,
+            stdout=StringIO(),
+            **options
+        )
+
+    def test_generate_dataset(self):
+        self.generate()
+        users = User.objects.filter(username__startswith='bench')
+        self.assertEqual(users.count(), 30)
+        self.assertEqual(Comment.objects.count(), 20)
+        self.assertEqual(
+            NewsFeed.objects.filter(tweet__user_id__in=users).count() >=
+            Tweet.objects.count(),
+            True,
+        )
+        for friendship in Friendship.objects.all():
+            self.assertNotEqual(friendship.from_user_id, friendship.to_user_id)
+        # counters are computed after the bulk inserts
+        user = users.first()
+        self.assertEqual(
+            user.profile.followers_count,
+            Friendship.objects.filter(to_user=user).count(),
+        )
+
+        # the same dataset cannot be generated twice
+        with self.assertRaises(CommandError):
+            self.generate()
+
+    def test_run_benchmark(self):
+        with self.assertRaises(CommandError):
+            call_command('run_benchmark', stdout=StringIO())
+
+        self.generate()
+        stdout = StringIO()
+        call_command('run_benchmark', requests=5, warmup=1, stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(set(report.keys()), {
+            'tweets.create',
+            'newsfeeds.list',
+            'comments.list',
+            'friendships.followers',
+            'friendships.followings',
+        })
+        for summary in report.values():
+            self.assertEqual(summary['requests'], 5)
+            self.assertEqual(summary['errors'], 0)
+            self.assertEqual(summary['p50_ms'] <= summary['p99_ms'], True)
+            self.assertEqual(summary['queries_max'] > 0, True)
+
+    def test_run_concurrency_benchmark(self):
+        with self.assertRaises(CommandError):
+            call_command('run_concurrency_benchmark', stdout=StringIO())
+
+        # like the test client, keep the connection of the test transaction
+        for signal in [signals.request_started, signals.request_finished]:
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+        self.generate()
+        stdout = StringIO()
+        call_command(
+            'run_concurrency_benchmark',
+            requests=5,
+            concurrency=2,
+            warmup=1,
+            query_latency_ms=1,
+            stdout=stdout,
+        )
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(set(report.keys()), {
+            'tweets.list',
+            'tweets.retrieve',
+            'newsfeeds.list',
+            'friendships.followers',
+            'friendships.followings',
+        })
+        for modes in report.values():
+            self.assertEqual(set(modes.keys()), {'wsgi', 'asgi'})
+            for summary in modes.values():
+                self.assertEqual(summary['requests'], 5)
+                self.assertEqual(summary['errors'], 0)
+                self.assertEqual(summary['p50_ms'] <= summary['p99_ms'], True)
+                self.assertEqual(summary['throughput_rps'] > 0, True)
@@ -2,21 +2,32 @@ from accounts.api.serializers import UserSerializerForComment
 from comments.models import Comment
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from tweets.models import Tweet
+from tweets.services import TweetService
 
 
 class CommentSerializer(serializers.ModelSerializer):
+    # the snowflake ids go beyond the integers of javascript, the *_str
+    # fields are the ids as strings
+    id_str = serializers.CharField(source='id', read_only=True)
+    tweet_id_str = serializers.CharField(source='tweet_id', read_only=True)
+    # set by LikeService.hydrate_likes
     user = UserSerializerForComment()
+    likes_count = serializers.IntegerField(source='likes_count_with_pending')
+    has_liked = serializers.BooleanField()
 
     class Meta:
         model = Comment
         fields = (
             'id',
+            'id_str',
             'tweet_id',
+            'tweet_id_str',
             'user',
             'content',
             'created_at',
             'updated_at',
+            'likes_count',
+            'has_liked',
         )
 
 
@@ -30,7 +41,7 @@ class CommentSerializerForCreate(serializers.ModelSerializer):
 
     def validate(self, data):
         tweet_id = data['tweet_id']
-        if not Tweet.objects.filter(id=tweet_id).exists():
+        if TweetService.get_tweet_through_cache(tweet_id) is None:
             raise ValidationError({'message': 'tweet does not exist'})
         # return the validated data as input
         return data
@@ -1,7 +1,11 @@
 from testing.testcases import TestCase
-from rest_framework.test import APIClient
+from testing.clients import APIClient
 from comments.models import Comment
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+from utils.paginations import EndlessPagination
 
 
 COMMENT_URL = '/api/comments/'
@@ -10,6 +14,7 @@ COMMENT_DETAIL_URL = '/api/comments/{}/'
 class CommentApiTests(TestCase):
 
     def setUp(self):
+        self.clear_cache()
         self.alfredo = self.create_user('alfredo')
         self.alfredo_client = APIClient()
         self.alfredo_client.force_authenticate(self.alfredo)
@@ -110,6 +115,10 @@ class CommentApiTests(TestCase):
         response = self.anonymous_client.get(COMMENT_URL)
         self.assertEqual(response.status_code, 400)
 
+        # the tweet has to exist
+        response = self.anonymous_client.get(COMMENT_URL, {'tweet_id': -1})
+        self.assertEqual(response.status_code, 400)
+
         # can access with tweet_id
         # no comment initially
         response = self.anonymous_client.get(COMMENT_URL, {
@@ -117,8 +126,9 @@ class CommentApiTests(TestCase):
         })
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data['comments']), 0)
+        self.assertEqual(response.data['has_next_page'], False)
 
-        # sorted by comment time
+        # comments are ordered by created_at
         self.create_comment(self.alfredo, self.tweet, '1')
         self.create_comment(self.trump, self.tweet, '2')
         self.create_comment(self.trump, self.create_tweet(self.trump), '3')
@@ -134,4 +144,106 @@ class CommentApiTests(TestCase):
             'tweet_id': self.tweet.id,
             'user_id': self.alfredo.id,
         })
-        self.assertEqual(len(response.data['comments']), 2)
\ No newline at end of file
+        self.assertEqual(len(response.data['comments']), 2)
+
+    def test_list_pagination(self):
+        page_size = EndlessPagination.page_size
+        comments = [
+            self.create_comment(self.trump, self.tweet, str(i))
+            for i in range(page_size * 2)
+        ]
+
+        # the latest page, oldest first
+        response = self.anonymous_client.get(COMMENT_URL, {
+            'tweet_id': self.tweet.id,
+        })
+        self.assertEqual(response.data['has_next_page'], True)
+        self.assertEqual(
+            [comment['id'] for comment in response.data['comments']],
+            [comment.id for comment in comments[page_size:]],
+        )
+
+        # scroll up to the older comments with the cursor, the preview of
+        # the tweet hands out the same kind of cursor
+        response = self.anonymous_client.get(COMMENT_URL, {
+            'tweet_id': self.tweet.id,
+            'created_before': comments[page_size].created_at,
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        self.assertEqual(
+            [comment['id'] for comment in response.data['comments']],
+            [comment.id for comment in comments[:page_size]],
+        )
+
+        # a cursor without offset is in UTC
+        response = self.anonymous_client.get(COMMENT_URL, {
+            'tweet_id': self.tweet.id,
+            'created_before': comments[page_size].created_at
+            .replace(tzinfo=None).isoformat(),
+        })
+        self.assertEqual(
+            [comment['id'] for comment in response.data['comments']],
+            [comment.id for comment in comments[:page_size]],
+        )
+
+        # pull to refresh
+        new_comment = self.create_comment(self.alfredo, self.tweet, 'new')
+        response = self.anonymous_client.get(COMMENT_URL, {
+            'tweet_id': self.tweet.id,
+            'created_after': comments[-1].created_at,
+        })
+        self.assertEqual(
+            [comment['id'] for comment in response.data['comments']],
+            [new_comment.id],
+        )
+
+    def test_list_cache(self):
+        comment = self.create_comment(self.trump, self.tweet, 'old')
+        params = {'tweet_id': self.tweet.id}
+        self.anonymous_client.get(COMMENT_URL, params)
+
+        # the tweet, the comments and the users all come from the cache
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.anonymous_client.get(COMMENT_URL, params)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(response.data['comments'][0]['id'], comment.id)
+
+        # create, update and destroy keep the cached list coherent
+        response = self.alfredo_client.post(COMMENT_URL, {
+            'tweet_id': self.tweet.id,
+            'content': 'created',
+        })
+        created_id = response.data['id']
+        response = self.anonymous_client.get(COMMENT_URL, params)
+        self.assertEqual(
+            [comment['id'] for comment in response.data['comments']],
+            [comment.id, created_id],
+        )
+
+        self.trump_client.put(COMMENT_DETAIL_URL.format(comment.id), {
+            'content': 'updated',
+        })
+        response = self.anonymous_client.get(COMMENT_URL, params)
+        self.assertEqual(response.data['comments'][0]['content'], 'updated')
+
+        self.alfredo_client.delete(COMMENT_DETAIL_URL.format(created_id))
+        response = self.anonymous_client.get(COMMENT_URL, params)
+        self.assertEqual(
+            [comment['id'] for comment in response.data['comments']],
+            [comment.id],
+        )
+
+    def test_list_beyond_cached_window(self):
+        limit = settings.REDIS_LIST_LENGTH_LIMIT
+        comments = [
+            self.create_comment(self.trump, self.tweet, str(i))
+            for i in range(limit + 5)
+        ]
+        response = self.anonymous_client.get(COMMENT_URL, {
+            'tweet_id': self.tweet.id,
+            'created_before': comments[5].created_at,
+        })
+        self.assertEqual(
+            [comment['id'] for comment in response.data['comments']],
+            [comment.id for comment in comments[:5]],
+        )
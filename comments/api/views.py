@@ -1,6 +1,10 @@
+from accounts.services import UserService
 from comments.models import Comment
+from comments.services import CommentService
+from likes.services import LikeService
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from comments.api.permissions import IsObjectOwner
 from comments.api.serializers import (
@@ -8,7 +12,9 @@ from comments.api.serializers import (
     CommentSerializerForCreate,
     CommentSerializerForUpdate,
 )
-from utils.decorators import required_params
+from tweets.services import TweetService
+from utils.decorators import query_budget, required_params
+from utils.paginations import EndlessPagination
 
 
 class CommentViewSet(viewsets.GenericViewSet):
@@ -19,7 +25,7 @@ class CommentViewSet(viewsets.GenericViewSet):
 
     serializer_class = CommentSerializerForCreate
     queryset = Comment.objects.all()
-    filterset_fields = ('tweet_id',)
+    pagination_class = EndlessPagination
 
     def get_permissions(self):
         if self.action == 'create':
@@ -46,21 +52,36 @@ class CommentViewSet(viewsets.GenericViewSet):
 
         # save will trigger create() method in the serializer
         comment = serializer.save()
+        UserService.hydrate_users([comment])
+        LikeService.hydrate_likes(request.user, [comment])
         return Response(
             CommentSerializer(comment).data,
             status=status.HTTP_201_CREATED,
         )
 
+    def paginate_comments(self, request, tweet_id):
+        cached_comments = CommentService.get_cached_comments(tweet_id)
+        comments = self.paginator.paginate_cached_list(cached_comments, request)
+        # the page goes beyond the cached window, read it from the database
+        if comments is None:
+            queryset = Comment.objects.filter(tweet_id=tweet_id)
+            comments = self.paginate_queryset(queryset)
+        return comments
+
+    @query_budget(max_queries=5)
     @required_params(params=['tweet_id'])
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        comments = self.filter_queryset(queryset)\
-            .prefetch_related('user').\
-            order_by('created_at')
-        serializer = CommentSerializer(comments, many=True)
-        return Response({
-            'comments': serializer.data
-        }, status=status.HTTP_200_OK)
+        # the latest page of comments, oldest first. has_next_page tells
+        # whether older comments exist, they are loaded with created_before
+        # set to the created_at of the first comment
+        tweet = TweetService.get_tweet_through_cache(request.query_params['tweet_id'])
+        if tweet is None:
+            raise ValidationError({'tweet_id': 'tweet does not exist'})
+        comments = self.paginate_comments(request, tweet.id)
+        comments = UserService.hydrate_users(comments)
+        comments = LikeService.hydrate_likes(request.user, comments)
+        serializer = CommentSerializer(comments[::-1], many=True)
+        return self.paginator.get_paginated_response(serializer.data, key='comments')
 
     def update(self, request, *args, **kwargs):
         # get_object is a function in DRF package，will raise 404 error when not found
@@ -79,6 +100,8 @@ class CommentViewSet(viewsets.GenericViewSet):
         # save method will decide on whether to trigger create or update based on
         # whether instance parameter is specified or not
         comment = serializer.save()
+        UserService.hydrate_users([comment])
+        LikeService.hydrate_likes(request.user, [comment])
         return Response(
             CommentSerializer(comment).data,
             status=status.HTTP_200_OK,
@@ -0,0 +1,3 @@
+# number of newest comments embedded in a retrieved tweet, the rest is
+# loaded from the comments api with the returned cursor
+COMMENTS_PREVIEW_SIZE = 10
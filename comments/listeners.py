@@ -0,0 +1,45 @@
+def incr_comments_count(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    # import inside the function to avoid the circular import
+    from tweets.services import TweetService
+    TweetService.incr_comments_count(instance.tweet_id, 1)
+
+
+def decr_comments_count(sender, instance, **kwargs):
+    from tweets.services import TweetService
+    TweetService.incr_comments_count(instance.tweet_id, -1)
+
+
+def comment_changed(sender, instance, created, **kwargs):
+    if instance.tweet_id is None:
+        return
+
+    from comments.services import CommentService
+    from notifications.constants import COMMENT
+    from notifications.services import NotificationService
+    from trends.services import TrendService
+    from tweets.models import Tweet
+    CommentService.invalidate_comments_preview(instance.tweet_id)
+    if created:
+        CommentService.push_comment_to_cache(instance)
+        # the author of the tweet is looked up by the notification writer
+        NotificationService.notify(
+            COMMENT,
+            instance.user_id,
+            target_model=Tweet,
+            target_id=instance.tweet_id,
+        )
+        TrendService.record_tweet_engagements([instance.tweet_id])
+    else:
+        CommentService.invalidate_cached_comments(instance.tweet_id)
+
+
+def comment_deleted(sender, instance, **kwargs):
+    if instance.tweet_id is None:
+        return
+
+    from comments.services import CommentService
+    CommentService.invalidate_comments_preview(instance.tweet_id)
+    CommentService.invalidate_cached_comments(instance.tweet_id)
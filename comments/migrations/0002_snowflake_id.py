@@ -0,0 +1,19 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:25
+
+from django.db import migrations, models
+import utils.snowflake
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='id',
+            field=models.BigIntegerField(default=utils.snowflake.generate_id, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -1,12 +1,24 @@
+from comments.listeners import (
+    comment_changed,
+    comment_deleted,
+    decr_comments_count,
+    incr_comments_count,
+)
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 from tweets.models import Tweet
+from utils.snowflake import generate_id
 
 
 class Comment(models.Model):
+    # time ordered and unique across the shards, see utils.snowflake
+    id = models.BigIntegerField(primary_key=True, default=generate_id, editable=False)
     user = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
     tweet = models.ForeignKey(Tweet, null=True, on_delete=models.SET_NULL)
     content = models.TextField(max_length=140)
+    # write-behind counter, see Tweet.likes_count
+    likes_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -21,3 +33,12 @@ class Comment(models.Model):
             self.content,
             self.tweet_id,
         )
+
+
+# hook up with listeners to update the comments count of the tweet
+post_save.connect(incr_comments_count, sender=Comment)
+post_delete.connect(decr_comments_count, sender=Comment)
+
+# keep the cached comments list and preview of the tweet coherent
+post_save.connect(comment_changed, sender=Comment)
+post_delete.connect(comment_deleted, sender=Comment)
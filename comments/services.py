@@ -0,0 +1,48 @@
+from comments.constants import COMMENTS_PREVIEW_SIZE
+from comments.models import Comment
+from twitter.cache import TWEET_COMMENTS_PATTERN, TWEET_COMMENTS_PREVIEW_PATTERN
+from utils.memcached_helper import MemcachedHelper
+from utils.redis_helper import RedisHelper
+
+
+class CommentService(object):
+
+    @classmethod
+    def get_comments_preview(cls, tweet_id):
+        """
+        returns (comments, has_next_page), the COMMENTS_PREVIEW_SIZE newest
+        comments of the tweet read through the (tweet, created_at) index.
+        the users are not attached, hydrate them with UserService.
+        """
+        key = TWEET_COMMENTS_PREVIEW_PATTERN.format(tweet_id=tweet_id)
+        # keep one more comment to know whether there is a next page
+        comments = MemcachedHelper.get_list_through_cache(
+            key,
+            lambda: Comment.objects.filter(tweet_id=tweet_id)
+            .order_by('-created_at')[:COMMENTS_PREVIEW_SIZE + 1],
+        )
+        has_next_page = len(comments) > COMMENTS_PREVIEW_SIZE
+        return comments[:COMMENTS_PREVIEW_SIZE], has_next_page
+
+    @classmethod
+    def invalidate_comments_preview(cls, tweet_id):
+        key = TWEET_COMMENTS_PREVIEW_PATTERN.format(tweet_id=tweet_id)
+        MemcachedHelper.invalidate_cached_list(key)
+
+    @classmethod
+    def get_cached_comments(cls, tweet_id):
+        queryset = Comment.objects.filter(tweet_id=tweet_id).order_by('-created_at')
+        key = TWEET_COMMENTS_PATTERN.format(tweet_id=tweet_id)
+        return RedisHelper.load_objects(key, queryset)
+
+    @classmethod
+    def push_comment_to_cache(cls, comment):
+        key = TWEET_COMMENTS_PATTERN.format(tweet_id=comment.tweet_id)
+        RedisHelper.push_object(key, comment)
+
+    @classmethod
+    def invalidate_cached_comments(cls, tweet_id):
+        # edits and deletions are rare, drop the list and reload it lazily
+        # rather than rewriting the serialized comment in place
+        key = TWEET_COMMENTS_PATTERN.format(tweet_id=tweet_id)
+        RedisHelper.invalidate_key(key)
@@ -1,10 +1,69 @@
+from comments.constants import COMMENTS_PREVIEW_SIZE
+from comments.services import CommentService
 from testing.testcases import TestCase
+from tweets.services import TweetService
 
 
 class CommentModelTest(TestCase):
 
+    def setUp(self):
+        self.clear_cache()
+
     def test_comment(self):
         user = self.create_user('alfredo')
         tweet = self.create_tweet(user)
         comment = self.create_comment(user, tweet)
         self.assertNotEqual(comment.__str__(), None)
+
+    def test_comments_count(self):
+        user = self.create_user('alfredo')
+        tweet = self.create_tweet(user)
+        comments = [self.create_comment(user, tweet) for _ in range(2)]
+        tweet.refresh_from_db()
+        self.assertEqual(tweet.comments_count, 2)
+
+        # the cached tweet is refreshed as well
+        comments[0].delete()
+        cached_tweet = TweetService.get_tweet_through_cache(tweet.id)
+        self.assertEqual(cached_tweet.comments_count, 1)
+
+        # updating a comment does not change the count
+        comments[1].content = 'new content'
+        comments[1].save()
+        tweet.refresh_from_db()
+        self.assertEqual(tweet.comments_count, 1)
+
+
+class CommentServiceTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+
+    def test_get_comments_preview(self):
+        user = self.create_user('alfredo')
+        tweet = self.create_tweet(user)
+        comments, has_next_page = CommentService.get_comments_preview(tweet.id)
+        self.assertEqual(comments, [])
+        self.assertEqual(has_next_page, False)
+
+        comments = [
+            self.create_comment(user, tweet)
+            for _ in range(COMMENTS_PREVIEW_SIZE + 1)
+        ]
+        preview, has_next_page = CommentService.get_comments_preview(tweet.id)
+        self.assertEqual(
+            [comment.id for comment in preview],
+            [comment.id for comment in comments[:0:-1]],
+        )
+        self.assertEqual(has_next_page, True)
+
+        # cache hit
+        with self.assertNumQueries(0):
+            CommentService.get_comments_preview(tweet.id)
+
+        # deleting a comment drops the cached preview
+        comments[-1].delete()
+        with self.assertNumQueries(1):
+            preview, has_next_page = CommentService.get_comments_preview(tweet.id)
+        self.assertEqual(preview[0].id, comments[-2].id)
+        self.assertEqual(has_next_page, False)
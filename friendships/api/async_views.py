@@ -0,0 +1,34 @@
+from accounts.services import UserService
+from friendships.api.serializers import FollowerSerializer, FollowingSerializer
+from friendships.services import FriendshipService
+from rest_framework.response import Response
+from utils.asgi import async_view, run_sync
+from utils.decorators import query_budget
+
+
+def load_followers(user_id):
+    friendships = FriendshipService.get_followers(user_id)
+    friendships = UserService.hydrate_users(friendships, 'from_user')
+    return FollowerSerializer(friendships, many=True).data
+
+
+def load_followings(user_id):
+    friendships = FriendshipService.get_followings(user_id)
+    friendships = UserService.hydrate_users(friendships, 'to_user')
+    return FollowingSerializer(friendships, many=True).data
+
+
+@async_view()
+@query_budget(max_queries=5)
+async def list_followers(request):
+    # the async FriendshipViewSet.followers
+    data = await run_sync(load_followers, request.kwargs['pk'])
+    return Response({'followers': data})
+
+
+@async_view()
+@query_budget(max_queries=5)
+async def list_followings(request):
+    # the async FriendshipViewSet.followings
+    data = await run_sync(load_followings, request.kwargs['pk'])
+    return Response({'followings': data})
@@ -2,6 +2,7 @@ from django.contrib.auth.models import User
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from accounts.api.serializers import UserSerializerForFriendship
+from friendships.constants import FRIENDSHIP_BULK_LIMIT
 from friendships.models import Friendship
 
 
@@ -44,4 +45,16 @@ class FriendshipSerializerForCreate(serializers.ModelSerializer):
         return Friendship.objects.create(
             from_user_id=validated_data['from_user_id'],
             to_user_id=validated_data['to_user_id'],
-        )
\ No newline at end of file
+        )
+
+
+class FriendshipSerializerForBulk(serializers.Serializer):
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=FRIENDSHIP_BULK_LIMIT,
+    )
+
+    def validate_user_ids(self, user_ids):
+        # drop the repeated ids, keep the order of the request
+        return list(dict.fromkeys(user_ids))
@@ -1,5 +1,18 @@
+from accounts.services import UserService
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from friendships.constants import (
+    DUPLICATE,
+    FOLLOWED,
+    FRIENDSHIP_BULK_LIMIT,
+    NOT_FOLLOWING,
+    NOT_FOUND,
+    SELF,
+    UNFOLLOWED,
+)
 from friendships.models import Friendship
-from rest_framework.test import APIClient
+from friendships.services import FriendshipService
+from testing.clients import APIClient, AsgiClient
 from testing.testcases import TestCase
 
 
@@ -7,11 +20,14 @@ FOLLOW_URL = '/api/friendships/{}/follow/'
 UNFOLLOW_URL = '/api/friendships/{}/unfollow/'
 FOLLOWERS_URL = '/api/friendships/{}/followers/'
 FOLLOWINGS_URL = '/api/friendships/{}/followings/'
+BULK_FOLLOW_URL = '/api/friendships/bulk_follow/'
+BULK_UNFOLLOW_URL = '/api/friendships/bulk_unfollow/'
 
 
 class FriendshipApiTest(TestCase):
 
     def setUp(self):
+        self.clear_cache()
         self.alfredo = self.create_user('alfredo')
         self.alfredo_client = APIClient()
         self.alfredo_client.force_authenticate(self.alfredo)
@@ -122,4 +138,132 @@ class FriendshipApiTest(TestCase):
         self.assertEqual(
             response.data['followers'][1]['user']['username'],
             'alfredo_follower0',
-        )
\ No newline at end of file
+        )
+
+    def test_followers_query_count_does_not_grow(self):
+        url = FOLLOWERS_URL.format(self.alfredo.id)
+
+        def count_followers_queries():
+            # warm up the cached users
+            self.anonymous_client.get(url)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.anonymous_client.get(url)
+            return len(response.data['followers']), len(ctx.captured_queries)
+
+        followers_count, few_followers_queries = count_followers_queries()
+        self.assertEqual(followers_count, 2)
+        for i in range(5):
+            follower = self.create_user('another_follower{}'.format(i))
+            self.create_friendship(follower, self.alfredo)
+        followers_count, more_followers_queries = count_followers_queries()
+        self.assertEqual(followers_count, 7)
+        self.assertEqual(few_followers_queries, more_followers_queries)
+
+    def test_bulk_follow(self):
+        users = [self.create_user('suggested{}'.format(i)) for i in range(20)]
+        user_ids = [user.id for user in users]
+        # warm up the cached sets so that the bulk follow updates them
+        self.create_friendship(self.alfredo, users[0])
+        FriendshipService.get_follower_ids(users[0].id)
+        FriendshipService.get_following_ids(self.trump.id)
+
+        # only authenticated users can follow, with a list of user ids
+        response = self.anonymous_client.post(BULK_FOLLOW_URL, {'user_ids': user_ids})
+        self.assertEqual(response.status_code, 403)
+        response = self.trump_client.post(BULK_FOLLOW_URL, {'user_ids': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.trump_client.post(BULK_FOLLOW_URL, {
+            'user_ids': list(range(FRIENDSHIP_BULK_LIMIT + 1)),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.trump_client.post(BULK_FOLLOW_URL, {
+            'user_ids': user_ids[:10] + [self.trump.id, 0, user_ids[0]],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(r['user_id'], r['result']) for r in response.data['results']],
+            [(user_id, FOLLOWED) for user_id in user_ids[:10]] +
+            [(self.trump.id, SELF), (0, NOT_FOUND)],
+        )
+        # the query count does not grow with the number of users
+        small_queries = len(self.trump_client.last_call.queries)
+        response = self.trump_client.post(BULK_FOLLOW_URL, {
+            'user_ids': user_ids,
+        }, format='json')
+        self.assertEqual(
+            [r['result'] for r in response.data['results']],
+            [DUPLICATE] * 10 + [FOLLOWED] * 10,
+        )
+        self.assertEqual(len(self.trump_client.last_call.queries), small_queries)
+        # nothing is created when every user is followed already
+        response = self.trump_client.post(BULK_FOLLOW_URL, {
+            'user_ids': user_ids[:3],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['result'] for r in response.data['results']], [DUPLICATE] * 3)
+
+        # the caches and counters are updated like by single follows
+        self.assertEqual(Friendship.objects.filter(from_user=self.trump).count(), 20)
+        with self.assertNumQueries(0):
+            self.assertSetEqual(
+                FriendshipService.get_following_ids(self.trump.id),
+                set(user_ids),
+            )
+            self.assertSetEqual(
+                FriendshipService.get_follower_ids(users[0].id),
+                {self.alfredo.id, self.trump.id},
+            )
+        self.assertEqual(UserService.get_profile_through_cache(self.trump.id).followings_count, 20)
+        self.assertEqual(UserService.get_profile_through_cache(users[5].id).followers_count, 1)
+
+    def test_bulk_unfollow(self):
+        users = [self.create_user('suggested{}'.format(i)) for i in range(5)]
+        user_ids = [user.id for user in users]
+        self.trump_client.post(BULK_FOLLOW_URL, {'user_ids': user_ids}, format='json')
+        FriendshipService.get_following_ids(self.trump.id)
+
+        response = self.anonymous_client.post(BULK_UNFOLLOW_URL, {'user_ids': user_ids})
+        self.assertEqual(response.status_code, 403)
+        response = self.trump_client.post(BULK_UNFOLLOW_URL, {
+            'user_ids': user_ids[:3] + [self.alfredo.id, self.trump.id],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(r['user_id'], r['result']) for r in response.data['results']],
+            [(user_id, UNFOLLOWED) for user_id in user_ids[:3]] +
+            [(self.alfredo.id, NOT_FOLLOWING), (self.trump.id, SELF)],
+        )
+        with self.assertNumQueries(0):
+            self.assertSetEqual(
+                FriendshipService.get_following_ids(self.trump.id),
+                set(user_ids[3:]),
+            )
+        self.assertEqual(Friendship.objects.filter(from_user=self.trump).count(), 2)
+        self.assertEqual(UserService.get_profile_through_cache(self.trump.id).followings_count, 2)
+        self.assertEqual(UserService.get_profile_through_cache(users[0].id).followers_count, 0)
+        self.assertEqual(UserService.get_profile_through_cache(users[4].id).followers_count, 1)
+
+
+class AsyncFriendshipApiTest(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        for i in range(2):
+            follower = self.create_user('alfredo_follower{}'.format(i))
+            self.create_friendship(follower, self.alfredo)
+            self.create_friendship(self.alfredo, follower)
+        self.asgi_client = AsgiClient()
+
+    def test_followers_and_followings(self):
+        for url in [FOLLOWERS_URL, FOLLOWINGS_URL]:
+            url = url.format(self.alfredo.id)
+            response = self.asgi_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # the async views answer like the sync ones
+            self.assertEqual(response.json(), self.anonymous_client.get(url).json())
+        self.assertEqual(
+            [f['user']['username'] for f in response.json()['followings']],
+            ['alfredo_follower1', 'alfredo_follower0'],
+        )
@@ -1,3 +1,4 @@
+from accounts.services import UserService
 from rest_framework import viewsets, status
 from django.contrib.auth.models import User
 from rest_framework.decorators import action
@@ -6,9 +7,13 @@ from rest_framework.response import Response
 from friendships.api.serializers import (
     FollowerSerializer,
     FollowingSerializer,
+    FriendshipSerializerForBulk,
     FriendshipSerializerForCreate,
 )
+from friendships.constants import FOLLOWED
 from friendships.models import Friendship
+from friendships.services import FriendshipService
+from utils.decorators import query_budget
 
 
 class FriendshipViewSet(viewsets.GenericViewSet):
@@ -16,8 +21,10 @@ class FriendshipViewSet(viewsets.GenericViewSet):
     queryset = User.objects.all()
 
     @action(methods=['GET'], detail=True, permission_classes=[AllowAny])
+    @query_budget(max_queries=3)
     def followers(self, request, pk):
-        friendships = Friendship.objects.filter(to_user_id=pk).order_by('-created_at')
+        friendships = FriendshipService.get_followers(pk)
+        friendships = UserService.hydrate_users(friendships, 'from_user')
         serializer = FollowerSerializer(friendships, many=True)
         return Response(
             {'followers': serializer.data},
@@ -25,8 +32,10 @@ class FriendshipViewSet(viewsets.GenericViewSet):
         )
 
     @action(methods=['GET'], detail=True, permission_classes=[AllowAny])
+    @query_budget(max_queries=3)
     def followings(self, request, pk):
-        friendships = Friendship.objects.filter(from_user_id=pk).order_by('-created_at')
+        friendships = FriendshipService.get_followings(pk)
+        friendships = UserService.hydrate_users(friendships, 'to_user')
         serializer = FollowingSerializer(friendships, many=True)
         return Response(
             {'followings': serializer.data},
@@ -34,10 +43,11 @@ class FriendshipViewSet(viewsets.GenericViewSet):
         )
 
     @action(methods=['POST'], detail=True, permission_classes=[IsAuthenticated])
+    @query_budget(max_queries=8)
     def follow(self, request, pk):
         # special case for follow (when there are multiple clicks on the Follow button from the front end)
         # silence it instead of treating it as an error
-        if Friendship.objects.filter(from_user=request.user, to_user=pk).exists():
+        if FriendshipService.has_followed(request.user.id, int(pk)):
             return Response({
                 'success': True,
                 'duplicate': True,
@@ -53,6 +63,7 @@ class FriendshipViewSet(viewsets.GenericViewSet):
                 "errors": serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
         instance = serializer.save()
+        UserService.hydrate_users([instance], 'to_user')
         return Response(
             FollowingSerializer(instance).data,
             status=status.HTTP_201_CREATED,
@@ -75,5 +86,51 @@ class FriendshipViewSet(viewsets.GenericViewSet):
             'deleted': deleted,
         })
 
+    @action(methods=['POST'], detail=False, permission_classes=[IsAuthenticated])
+    @query_budget(max_queries=10)
+    def bulk_follow(self, request):
+        serializer = FriendshipSerializerForBulk(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Please check input',
+                'errors': serializer.errors,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        results = FriendshipService.bulk_follow(
+            request.user.id,
+            serializer.validated_data['user_ids'],
+        )
+        # 201 only when a friendship was created
+        created = FOLLOWED in results.values()
+        return Response({
+            'success': True,
+            'results': [
+                {'user_id': user_id, 'result': result}
+                for user_id, result in results.items()
+            ],
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(methods=['POST'], detail=False, permission_classes=[IsAuthenticated])
+    @query_budget(max_queries=10)
+    def bulk_unfollow(self, request):
+        serializer = FriendshipSerializerForBulk(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Please check input',
+                'errors': serializer.errors,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        results = FriendshipService.bulk_unfollow(
+            request.user.id,
+            serializer.validated_data['user_ids'],
+        )
+        return Response({
+            'success': True,
+            'results': [
+                {'user_id': user_id, 'result': result}
+                for user_id, result in results.items()
+            ],
+        })
+
     def list(self, request):
         return Response({'message': 'this is friendships home page'})
\ No newline at end of file
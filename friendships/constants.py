@@ -0,0 +1,10 @@
+# max number of users followed or unfollowed by one bulk request
+FRIENDSHIP_BULK_LIMIT = 100
+
+# per user results of the bulk requests
+FOLLOWED = 'followed'
+UNFOLLOWED = 'unfollowed'
+DUPLICATE = 'duplicate'
+NOT_FOLLOWING = 'not_following'
+NOT_FOUND = 'not_found'
+SELF = 'self'
@@ -0,0 +1,43 @@
+def friendship_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    # import inside the function to avoid the circular import
+    from accounts.services import UserService
+    from friendships.services import FriendshipService
+    from newsfeeds.services import NewsFeedService
+    from notifications.constants import FOLLOW
+    from notifications.services import NotificationService
+    FriendshipService.add_friendship_to_storage(instance)
+    FriendshipService.add_friendship_to_cache(
+        instance.from_user_id,
+        instance.to_user_id,
+    )
+    UserService.incr_profile_counts(instance.to_user_id, followers_count=1)
+    UserService.incr_profile_counts(instance.from_user_id, followings_count=1)
+    NewsFeedService.backfill_newsfeeds_on_follow(
+        instance.from_user_id,
+        [instance.to_user_id],
+    )
+    NotificationService.notify(
+        FOLLOW,
+        instance.from_user_id,
+        recipient_id=instance.to_user_id,
+    )
+
+
+def friendship_deleted(sender, instance, **kwargs):
+    from accounts.services import UserService
+    from friendships.services import FriendshipService
+    from newsfeeds.services import NewsFeedService
+    FriendshipService.remove_friendship_from_storage(instance)
+    FriendshipService.remove_friendship_from_cache(
+        instance.from_user_id,
+        instance.to_user_id,
+    )
+    UserService.incr_profile_counts(instance.to_user_id, followers_count=-1)
+    UserService.incr_profile_counts(instance.from_user_id, followings_count=-1)
+    NewsFeedService.cleanup_newsfeeds_on_unfollow(
+        instance.from_user_id,
+        [instance.to_user_id],
+    )
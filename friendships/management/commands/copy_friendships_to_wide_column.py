@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from friendships.models import Friendship
+from friendships.storage import WideColumnFriendshipStorage
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the friendships into the wide column tables, before '
+        'MODEL_STORAGE_BACKENDS switches friendships.Friendship to '
+        '"wide_column". Rows are overwritten, the copy can be run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='number of friendships copied per batch',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        last_pk = None
+        while True:
+            # walk the table by primary key range, no OFFSET is issued
+            queryset = Friendship.objects.filter(
+                from_user_id__isnull=False,
+                to_user_id__isnull=False,
+            ).order_by('pk')
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            batch = list(queryset[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            WideColumnFriendshipStorage.add_friendships(batch)
+            total += len(batch)
+        self.stdout.write('{} friendships copied'.format(total))
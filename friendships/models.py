@@ -1,5 +1,7 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from friendships.listeners import friendship_created, friendship_deleted
 
 
 class Friendship(models.Model):
@@ -28,4 +30,9 @@ class Friendship(models.Model):
         unique_together = (('from_user_id', 'to_user_id'),)
 
     def __str__(self):
-        return '{} followed {}'.format(self.from_user_id, self.to_user_id)
\ No newline at end of file
+        return '{} followed {}'.format(self.from_user_id, self.to_user_id)
+
+
+# hook up with listeners to keep the cached id sets and counts up to date
+post_save.connect(friendship_created, sender=Friendship)
+post_delete.connect(friendship_deleted, sender=Friendship)
@@ -1,11 +1,235 @@
+from accounts.services import UserService
+from django.db import IntegrityError, router, transaction
+from friendships.constants import (
+    DUPLICATE,
+    FOLLOWED,
+    NOT_FOLLOWING,
+    NOT_FOUND,
+    SELF,
+    UNFOLLOWED,
+)
 from friendships.models import Friendship
+from friendships.storage import get_friendship_storage
+from twitter.cache import (
+    USER_FOLLOWER_IDS_PATTERN,
+    USER_FOLLOWING_IDS_PATTERN,
+)
+from utils.redis_helper import RedisHelper
 
 
 class FriendshipService(object):
 
     @classmethod
-    def get_followers(cls, user):
-        friendships = Friendship.objects.filter(
-            to_user=user,
-        ).prefetch_related('from_user')
-        return [friendship.from_user for friendship in friendships]
\ No newline at end of file
+    def get_follower_ids(cls, user_id):
+        # the ids are only read from the storage on a cache miss
+        follower_ids = get_friendship_storage().get_follower_ids(user_id)
+        key = USER_FOLLOWER_IDS_PATTERN.format(user_id=user_id)
+        return RedisHelper.load_id_set(key, follower_ids)
+
+    @classmethod
+    def get_following_ids(cls, user_id):
+        following_ids = get_friendship_storage().get_following_ids(user_id)
+        key = USER_FOLLOWING_IDS_PATTERN.format(user_id=user_id)
+        return RedisHelper.load_id_set(key, following_ids)
+
+    @classmethod
+    def get_followers(cls, user_id):
+        # friendships to the user, newest first
+        return get_friendship_storage().get_followers(int(user_id))
+
+    @classmethod
+    def get_followings(cls, user_id):
+        return get_friendship_storage().get_followings(int(user_id))
+
+    @classmethod
+    def has_followed(cls, from_user_id, to_user_id):
+        return to_user_id in cls.get_following_ids(from_user_id)
+
+    @classmethod
+    def add_friendship_to_storage(cls, friendship):
+        # the relational row stays the source of truth, a wide column
+        # backend gets its rows written next to it
+        get_friendship_storage().add_friendship(friendship)
+
+    @classmethod
+    def remove_friendship_from_storage(cls, friendship):
+        get_friendship_storage().remove_friendship(friendship)
+
+    @classmethod
+    def add_friendship_to_cache(cls, from_user_id, to_user_id):
+        RedisHelper.add_to_cached_set(
+            USER_FOLLOWER_IDS_PATTERN.format(user_id=to_user_id),
+            from_user_id,
+        )
+        RedisHelper.add_to_cached_set(
+            USER_FOLLOWING_IDS_PATTERN.format(user_id=from_user_id),
+            to_user_id,
+        )
+
+    @classmethod
+    def remove_friendship_from_cache(cls, from_user_id, to_user_id):
+        RedisHelper.remove_from_cached_set(
+            USER_FOLLOWER_IDS_PATTERN.format(user_id=to_user_id),
+            from_user_id,
+        )
+        RedisHelper.remove_from_cached_set(
+            USER_FOLLOWING_IDS_PATTERN.format(user_id=from_user_id),
+            to_user_id,
+        )
+
+    @classmethod
+    def bulk_follow(cls, from_user_id, to_user_ids):
+        """
+        follow many users at once, returns {to_user_id: result}. the users
+        are checked with one cache multi-get (and one IN query for the
+        misses), the friendships inserted with one bulk insert and the
+        caches and counters updated in one pass
+        """
+        users = UserService.get_users_through_cache(to_user_ids)
+        following_ids = cls.get_following_ids(from_user_id)
+        results, new_user_ids = {}, []
+        for to_user_id in to_user_ids:
+            if to_user_id == from_user_id:
+                results[to_user_id] = SELF
+            elif to_user_id not in users:
+                results[to_user_id] = NOT_FOUND
+            elif to_user_id in following_ids:
+                results[to_user_id] = DUPLICATE
+            else:
+                results[to_user_id] = FOLLOWED
+                new_user_ids.append(to_user_id)
+        if new_user_ids:
+            followed_ids = set(cls.create_friendships(from_user_id, new_user_ids))
+            # followed concurrently meanwhile
+            for to_user_id in new_user_ids:
+                if to_user_id not in followed_ids:
+                    results[to_user_id] = DUPLICATE
+        return results
+
+    @classmethod
+    def insert_friendships(cls, from_user_id, to_user_ids):
+        """
+        insert the friendships which do not exist yet, returns the ones
+        inserted. the existing pairs are selected first, a pair followed
+        concurrently meanwhile makes the bulk insert fail, the rows are
+        then inserted one at a time to tell them apart
+        """
+        db = router.db_for_write(Friendship)
+        existing_ids = set(Friendship.objects.using(db).filter(
+            from_user_id=from_user_id,
+            to_user_id__in=to_user_ids,
+        ).values_list('to_user_id', flat=True))
+        friendships = [
+            Friendship(from_user_id=from_user_id, to_user_id=to_user_id)
+            for to_user_id in to_user_ids
+            if to_user_id not in existing_ids
+        ]
+        try:
+            with transaction.atomic(using=db):
+                return Friendship.objects.using(db).bulk_create(friendships)
+        except IntegrityError:
+            pass
+        inserted = []
+        for friendship in friendships:
+            try:
+                with transaction.atomic(using=db):
+                    Friendship.objects.using(db).bulk_create([friendship])
+            except IntegrityError:
+                continue
+            inserted.append(friendship)
+        return inserted
+
+    @classmethod
+    def create_friendships(cls, from_user_id, to_user_ids):
+        """
+        bulk_create sends no post_save, do the work of the listeners in one
+        pass. returns the ids of the users followed, a friendship which
+        exists already is not created nor counted again
+        """
+        friendships = cls.insert_friendships(from_user_id, to_user_ids)
+        to_user_ids = [friendship.to_user_id for friendship in friendships]
+        if not to_user_ids:
+            return []
+        get_friendship_storage().add_friendships(friendships)
+        members_by_key = {
+            USER_FOLLOWER_IDS_PATTERN.format(user_id=to_user_id): [from_user_id]
+            for to_user_id in to_user_ids
+        }
+        members_by_key[USER_FOLLOWING_IDS_PATTERN.format(user_id=from_user_id)] = to_user_ids
+        RedisHelper.add_to_cached_sets(members_by_key)
+        UserService.incr_profiles_counts(to_user_ids, followers_count=1)
+        UserService.incr_profile_counts(
+            from_user_id,
+            followings_count=len(to_user_ids),
+        )
+        # import inside the function to avoid the circular import
+        from newsfeeds.services import NewsFeedService
+        from notifications.constants import FOLLOW
+        from notifications.services import NotificationService
+        NewsFeedService.backfill_newsfeeds_on_follow(from_user_id, to_user_ids)
+        NotificationService.notify_many([
+            {'verb': FOLLOW, 'actor_id': from_user_id, 'recipient_id': to_user_id}
+            for to_user_id in to_user_ids
+        ])
+        return to_user_ids
+
+    @classmethod
+    def bulk_unfollow(cls, from_user_id, to_user_ids):
+        # unfollow many users at once, returns {to_user_id: result}
+        friendships = cls.delete_friendships(from_user_id, to_user_ids)
+        unfollowed_ids = set(friendship.to_user_id for friendship in friendships)
+        results = {}
+        for to_user_id in to_user_ids:
+            if to_user_id == from_user_id:
+                results[to_user_id] = SELF
+            elif to_user_id in unfollowed_ids:
+                results[to_user_id] = UNFOLLOWED
+            else:
+                results[to_user_id] = NOT_FOLLOWING
+        return results
+
+    @classmethod
+    def delete_friendships(cls, from_user_id, to_user_ids):
+        """
+        a queryset delete sends one post_delete per row, delete the rows
+        with a single DELETE and do the work of the listeners in one pass.
+        the rows are locked first: a concurrent unfollow of the same users
+        waits, then finds them deleted and does not count them again.
+        returns the friendships deleted
+        """
+        db = router.db_for_write(Friendship)
+        with transaction.atomic(using=db):
+            friendships = list(Friendship.objects.using(db).select_for_update().filter(
+                from_user_id=from_user_id,
+                to_user_id__in=to_user_ids,
+            ))
+            if not friendships:
+                return []
+            Friendship.objects.using(db).filter(
+                id__in=[friendship.id for friendship in friendships],
+            )._raw_delete(db)
+        get_friendship_storage().remove_friendships(friendships)
+        to_user_ids = [friendship.to_user_id for friendship in friendships]
+        members_by_key = {
+            USER_FOLLOWER_IDS_PATTERN.format(user_id=to_user_id): [from_user_id]
+            for to_user_id in to_user_ids
+        }
+        members_by_key[USER_FOLLOWING_IDS_PATTERN.format(user_id=from_user_id)] = to_user_ids
+        RedisHelper.remove_from_cached_sets(members_by_key)
+        UserService.incr_profiles_counts(to_user_ids, followers_count=-1)
+        UserService.incr_profile_counts(
+            from_user_id,
+            followings_count=-len(to_user_ids),
+        )
+        from newsfeeds.services import NewsFeedService
+        NewsFeedService.cleanup_newsfeeds_on_unfollow(from_user_id, to_user_ids)
+        return friendships
+
+    @classmethod
+    def get_followers_counts(cls, user_ids):
+        # returns {user_id: followers_count} from the cached profile counters
+        profiles = UserService.get_profiles_through_cache(user_ids)
+        return {
+            user_id: profiles[user_id].followers_count if user_id in profiles else 0
+            for user_id in user_ids
+        }
@@ -0,0 +1,161 @@
+from friendships.models import Friendship
+from utils.storage import WIDE_COLUMN, get_storage_backend
+from utils.wide_column import (
+    WideColumnClient,
+    from_reverse_timestamp,
+    make_row_key,
+    parse_row_key,
+    reverse_timestamp,
+)
+
+
+class RelationalFriendshipStorage(object):
+    """
+    Friendship rows read through the (to_user, created_at) and
+    (from_user, created_at) indexes, the rows are written by the model itself
+    """
+
+    @classmethod
+    def get_follower_ids(cls, user_id):
+        return Friendship.objects.filter(
+            to_user_id=user_id,
+            from_user_id__isnull=False,
+        ).values_list('from_user_id', flat=True)
+
+    @classmethod
+    def get_following_ids(cls, user_id):
+        return Friendship.objects.filter(
+            from_user_id=user_id,
+            to_user_id__isnull=False,
+        ).values_list('to_user_id', flat=True)
+
+    @classmethod
+    def get_followers(cls, user_id):
+        return Friendship.objects.filter(to_user_id=user_id).order_by('-created_at')
+
+    @classmethod
+    def get_followings(cls, user_id):
+        return Friendship.objects.filter(from_user_id=user_id).order_by('-created_at')
+
+    @classmethod
+    def add_friendship(cls, friendship):
+        pass
+
+    @classmethod
+    def add_friendships(cls, friendships):
+        pass
+
+    @classmethod
+    def remove_friendship(cls, friendship):
+        pass
+
+    @classmethod
+    def remove_friendships(cls, friendships):
+        pass
+
+
+class WideColumnFriendshipStorage(object):
+    """
+    every friendship is written twice, as 'friendship_followers' row
+    to_user_id + reversed created_at + from_user_id and as
+    'friendship_followings' row from_user_id + reversed created_at +
+    to_user_id, so that both lists are one newest first range. the relational
+    rows are still written and keep the counters and signals going.
+    """
+    FOLLOWERS_TABLE_NAME = 'friendship_followers'
+    FOLLOWINGS_TABLE_NAME = 'friendship_followings'
+
+    @classmethod
+    def scan_user(cls, table_name, user_id):
+        user_id = int(user_id)
+        table = WideColumnClient.get_table(table_name)
+        for row_key, columns in table.scan(
+            make_row_key(user_id),
+            make_row_key(user_id + 1),
+        ):
+            yield parse_row_key(row_key)
+
+    @classmethod
+    def get_follower_ids(cls, user_id):
+        # a generator, the rows are only scanned when it is consumed
+        for _, _, from_user_id in cls.scan_user(cls.FOLLOWERS_TABLE_NAME, user_id):
+            yield from_user_id
+
+    @classmethod
+    def get_following_ids(cls, user_id):
+        for _, _, to_user_id in cls.scan_user(cls.FOLLOWINGS_TABLE_NAME, user_id):
+            yield to_user_id
+
+    @classmethod
+    def get_followers(cls, user_id):
+        # unsaved Friendship objects, newest first
+        return [
+            Friendship(
+                from_user_id=from_user_id,
+                to_user_id=to_user_id,
+                created_at=from_reverse_timestamp(reversed_created_at),
+            )
+            for to_user_id, reversed_created_at, from_user_id
+            in cls.scan_user(cls.FOLLOWERS_TABLE_NAME, user_id)
+        ]
+
+    @classmethod
+    def get_followings(cls, user_id):
+        return [
+            Friendship(
+                from_user_id=from_user_id,
+                to_user_id=to_user_id,
+                created_at=from_reverse_timestamp(reversed_created_at),
+            )
+            for from_user_id, reversed_created_at, to_user_id
+            in cls.scan_user(cls.FOLLOWINGS_TABLE_NAME, user_id)
+        ]
+
+    @classmethod
+    def get_row_keys(cls, friendship):
+        reversed_created_at = reverse_timestamp(friendship.created_at)
+        follower_key = make_row_key(
+            friendship.to_user_id,
+            reversed_created_at,
+            friendship.from_user_id,
+        )
+        following_key = make_row_key(
+            friendship.from_user_id,
+            reversed_created_at,
+            friendship.to_user_id,
+        )
+        return follower_key, following_key
+
+    @classmethod
+    def add_friendships(cls, friendships):
+        followers, followings = [], []
+        for friendship in friendships:
+            follower_key, following_key = cls.get_row_keys(friendship)
+            followers.append((follower_key, {}))
+            followings.append((following_key, {}))
+        WideColumnClient.get_table(cls.FOLLOWERS_TABLE_NAME).put_many(followers)
+        WideColumnClient.get_table(cls.FOLLOWINGS_TABLE_NAME).put_many(followings)
+
+    @classmethod
+    def add_friendship(cls, friendship):
+        cls.add_friendships([friendship])
+
+    @classmethod
+    def remove_friendship(cls, friendship):
+        cls.remove_friendships([friendship])
+
+    @classmethod
+    def remove_friendships(cls, friendships):
+        follower_keys, following_keys = [], []
+        for friendship in friendships:
+            follower_key, following_key = cls.get_row_keys(friendship)
+            follower_keys.append(follower_key)
+            following_keys.append(following_key)
+        WideColumnClient.get_table(cls.FOLLOWERS_TABLE_NAME).delete_many(follower_keys)
+        WideColumnClient.get_table(cls.FOLLOWINGS_TABLE_NAME).delete_many(following_keys)
+
+
+def get_friendship_storage():
+    if get_storage_backend('friendships.Friendship') == WIDE_COLUMN:
+        return WideColumnFriendshipStorage
+    return RelationalFriendshipStorage
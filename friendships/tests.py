@@ -1,3 +1,255 @@
-from django.test import TestCase
+from accounts.services import UserService
+from datetime import timedelta
+from django.core.management import call_command
+from django.db.models.query import QuerySet
+from django.test import override_settings
+from django.utils import timezone
+from friendships.constants import DUPLICATE, FOLLOWED, NOT_FOLLOWING
+from friendships.models import Friendship
+from friendships.services import FriendshipService
+from io import StringIO
+from testing.testcases import TestCase
+from twitter.cache import USER_FOLLOWER_IDS_PATTERN
+from unittest import mock
+from utils.redis_helper import RedisHelper
+from utils.wide_column import (
+    from_reverse_timestamp,
+    make_row_key,
+    parse_row_key,
+    reverse_timestamp,
+)
 
-# Create your tests here.
+
+class FriendshipServiceTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.trump = self.create_user('trump')
+
+    def test_get_following_ids(self):
+        user1 = self.create_user('user1')
+        user2 = self.create_user('user2')
+        for to_user in [user1, user2, self.trump]:
+            self.create_friendship(self.alfredo, to_user)
+
+        # cache miss
+        user_ids = FriendshipService.get_following_ids(self.alfredo.id)
+        self.assertSetEqual(user_ids, {user1.id, user2.id, self.trump.id})
+
+        # cache hit
+        with self.assertNumQueries(0):
+            user_ids = FriendshipService.get_following_ids(self.alfredo.id)
+        self.assertSetEqual(user_ids, {user1.id, user2.id, self.trump.id})
+
+        # the cached set is updated on unfollow and follow
+        Friendship.objects.filter(from_user=self.alfredo, to_user=self.trump).delete()
+        user3 = self.create_user('user3')
+        self.create_friendship(self.alfredo, user3)
+        with self.assertNumQueries(0):
+            user_ids = FriendshipService.get_following_ids(self.alfredo.id)
+        self.assertSetEqual(user_ids, {user1.id, user2.id, user3.id})
+        self.assertEqual(FriendshipService.has_followed(self.alfredo.id, user3.id), True)
+        self.assertEqual(FriendshipService.has_followed(self.alfredo.id, self.trump.id), False)
+
+    def test_get_follower_ids(self):
+        # an uncached set is not created by a follow
+        self.create_friendship(self.trump, self.alfredo)
+        self.assertSetEqual(
+            FriendshipService.get_follower_ids(self.alfredo.id),
+            {self.trump.id},
+        )
+
+        user1 = self.create_user('user1')
+        self.create_friendship(user1, self.alfredo)
+        with self.assertNumQueries(0):
+            user_ids = FriendshipService.get_follower_ids(self.alfredo.id)
+        self.assertSetEqual(user_ids, {self.trump.id, user1.id})
+
+        Friendship.objects.filter(to_user=self.alfredo).delete()
+        self.assertSetEqual(FriendshipService.get_follower_ids(self.alfredo.id), set())
+
+    def test_id_sets_fill(self):
+        # an empty set is cached too
+        self.assertSetEqual(FriendshipService.get_following_ids(self.alfredo.id), set())
+        with self.assertNumQueries(0):
+            self.assertSetEqual(FriendshipService.get_following_ids(self.alfredo.id), set())
+
+        # trump is followed while his follower ids are read, the stale ids
+        # are not cached
+        user1 = self.create_user('user1')
+        self.create_friendship(user1, self.trump)
+        follower_ids = Friendship.objects.filter(
+            to_user_id=self.trump.id,
+        ).values_list('from_user_id', flat=True)
+
+        def follow_while_read():
+            ids = list(follower_ids)
+            self.create_friendship(self.alfredo, self.trump)
+            yield from ids
+        key = USER_FOLLOWER_IDS_PATTERN.format(user_id=self.trump.id)
+        self.assertSetEqual(RedisHelper.load_id_set(key, follow_while_read()), {user1.id})
+        self.assertSetEqual(
+            FriendshipService.get_follower_ids(self.trump.id),
+            {user1.id, self.alfredo.id},
+        )
+
+    def test_profile_counts(self):
+        user1 = self.create_user('user1')
+        self.create_friendship(self.alfredo, self.trump)
+        self.create_friendship(user1, self.trump)
+        self.assertEqual(self.trump.profile.followers_count, 2)
+        self.assertEqual(self.trump.profile.followings_count, 0)
+        self.assertEqual(
+            UserService.get_profile_through_cache(self.alfredo.id).followings_count,
+            1,
+        )
+
+        Friendship.objects.filter(from_user=self.alfredo).delete()
+        profile = UserService.get_profile_through_cache(self.trump.id)
+        self.assertEqual(profile.followers_count, 1)
+        profile = UserService.get_profile_through_cache(self.alfredo.id)
+        self.assertEqual(profile.followings_count, 0)
+
+    def test_bulk_follow_conflicts(self):
+        user1 = self.create_user('user1')
+        # alfredo followed trump concurrently, after the following ids were
+        # read by the bulk follow
+        self.create_friendship(self.alfredo, self.trump)
+        with mock.patch.object(FriendshipService, 'get_following_ids', return_value=set()):
+            results = FriendshipService.bulk_follow(
+                self.alfredo.id,
+                [self.trump.id, user1.id],
+            )
+        self.assertEqual(results, {self.trump.id: DUPLICATE, user1.id: FOLLOWED})
+        # only the friendship inserted is counted
+        profile = UserService.get_profile_through_cache(self.alfredo.id)
+        self.assertEqual(profile.followings_count, 2)
+        profile = UserService.get_profile_through_cache(self.trump.id)
+        self.assertEqual(profile.followers_count, 1)
+
+        # a single DELETE removes the friendships, no post_delete is sent
+        results = FriendshipService.bulk_unfollow(
+            self.alfredo.id,
+            [self.trump.id, user1.id],
+        )
+        self.assertEqual(Friendship.objects.filter(from_user=self.alfredo).count(), 0)
+        profile = UserService.get_profile_through_cache(self.alfredo.id)
+        self.assertEqual(profile.followings_count, 0)
+
+        # the friendships are gone, unfollowing again counts nothing
+        results = FriendshipService.bulk_unfollow(self.alfredo.id, [self.trump.id])
+        self.assertEqual(results, {self.trump.id: NOT_FOLLOWING})
+        profile = UserService.get_profile_through_cache(self.trump.id)
+        self.assertEqual(profile.followers_count, 0)
+
+    def test_bulk_follow_races_a_follow(self):
+        user1 = self.create_user('user1')
+        # alfredo followed trump concurrently, after the existing pairs were
+        # selected, the bulk insert fails on the conflict
+        self.create_friendship(self.alfredo, self.trump)
+        with mock.patch.object(FriendshipService, 'get_following_ids', return_value=set()), \
+                mock.patch.object(QuerySet, 'values_list', return_value=[]):
+            results = FriendshipService.bulk_follow(
+                self.alfredo.id,
+                [self.trump.id, user1.id],
+            )
+        self.assertEqual(results, {self.trump.id: DUPLICATE, user1.id: FOLLOWED})
+        self.assertEqual(Friendship.objects.filter(from_user=self.alfredo).count(), 2)
+        profile = UserService.get_profile_through_cache(self.alfredo.id)
+        self.assertEqual(profile.followings_count, 2)
+        profile = UserService.get_profile_through_cache(self.trump.id)
+        self.assertEqual(profile.followers_count, 1)
+
+WIDE_COLUMN_BACKENDS = {'friendships.Friendship': 'wide_column'}
+
+
+@override_settings(MODEL_STORAGE_BACKENDS=WIDE_COLUMN_BACKENDS)
+class WideColumnFriendshipTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.users = [self.create_user('user{}'.format(i)) for i in range(3)]
+
+    def test_row_keys(self):
+        # the row keys sort like the tuples of integers they are made of
+        keys = [(1, 2, 3), (1, 2, 256), (1, 3, 0), (2, 0, 0), (256, 0, 1)]
+        row_keys = [make_row_key(*key) for key in keys]
+        self.assertEqual(sorted(row_keys), row_keys)
+        for key, row_key in zip(keys, row_keys):
+            self.assertEqual(parse_row_key(row_key), key)
+
+        now = timezone.now()
+        earlier = now - timedelta(seconds=1)
+        self.assertEqual(reverse_timestamp(now) < reverse_timestamp(earlier), True)
+        self.assertEqual(from_reverse_timestamp(reverse_timestamp(now)), now)
+
+    def test_followers_and_followings(self):
+        for user in self.users:
+            self.create_friendship(user, self.alfredo)
+            self.create_friendship(self.alfredo, user)
+
+        followers = FriendshipService.get_followers(self.alfredo.id)
+        self.assertEqual(
+            [friendship.from_user_id for friendship in followers],
+            [user.id for user in reversed(self.users)],
+        )
+        followings = FriendshipService.get_followings(self.alfredo.id)
+        self.assertEqual(
+            [friendship.to_user_id for friendship in followings],
+            [user.id for user in reversed(self.users)],
+        )
+        # the rows are read from the wide column tables
+        with self.assertNumQueries(0):
+            self.assertSetEqual(
+                FriendshipService.get_follower_ids(self.alfredo.id),
+                set(user.id for user in self.users),
+            )
+        self.assertEqual(
+            FriendshipService.has_followed(self.alfredo.id, self.users[0].id),
+            True,
+        )
+
+        # unfollow removes both rows
+        Friendship.objects.filter(from_user=self.users[0], to_user=self.alfredo).delete()
+        self.assertEqual(
+            [f.from_user_id for f in FriendshipService.get_followers(self.alfredo.id)],
+            [self.users[2].id, self.users[1].id],
+        )
+        self.assertEqual(FriendshipService.get_followings(self.users[0].id), [])
+        self.assertEqual(len(FriendshipService.get_followings(self.alfredo.id)), 3)
+
+    def test_copy_friendships_to_wide_column(self):
+        with override_settings(MODEL_STORAGE_BACKENDS={}):
+            friendships = [
+                self.create_friendship(user, self.alfredo)
+                for user in self.users
+            ]
+        self.assertEqual(FriendshipService.get_followers(self.alfredo.id), [])
+
+        stdout = StringIO()
+        call_command('copy_friendships_to_wide_column', batch_size=2, stdout=stdout)
+        self.assertIn('3 friendships copied', stdout.getvalue())
+        followers = FriendshipService.get_followers(self.alfredo.id)
+        self.assertEqual(
+            [(f.from_user_id, f.created_at) for f in followers],
+            [(f.from_user_id, f.created_at) for f in reversed(friendships)],
+        )
+        # copying again overwrites the same rows
+        call_command('copy_friendships_to_wide_column', stdout=StringIO())
+        self.assertEqual(len(FriendshipService.get_followers(self.alfredo.id)), 3)
+
+    def test_bulk_follow_and_unfollow(self):
+        user_ids = [user.id for user in self.users]
+        FriendshipService.bulk_follow(self.alfredo.id, user_ids)
+        self.assertSetEqual(
+            set(f.to_user_id for f in FriendshipService.get_followings(self.alfredo.id)),
+            set(user_ids),
+        )
+        FriendshipService.bulk_unfollow(self.alfredo.id, user_ids[:2])
+        self.assertEqual(
+            [f.to_user_id for f in FriendshipService.get_followings(self.alfredo.id)],
+            [user_ids[2]],
+        )
+        self.assertEqual(FriendshipService.get_followers(user_ids[0]), [])
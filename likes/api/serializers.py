@@ -0,0 +1,66 @@
+from accounts.api.serializers import UserSerializerForLike
+from comments.models import Comment
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError
+from likes.models import Like
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from tweets.models import Tweet
+
+
+class LikeSerializer(serializers.ModelSerializer):
+    user = UserSerializerForLike()
+
+    class Meta:
+        model = Like
+        fields = ('user', 'created_at')
+
+
+class BaseLikeSerializerForCreateAndCancel(serializers.ModelSerializer):
+    content_type = serializers.ChoiceField(choices=['comment', 'tweet'])
+    object_id = serializers.IntegerField()
+
+    class Meta:
+        model = Like
+        fields = ('content_type', 'object_id')
+
+    def _get_model_class(self, data):
+        if data['content_type'] == 'comment':
+            return Comment
+        return Tweet
+
+    def validate(self, data):
+        model_class = self._get_model_class(data)
+        if not model_class.objects.filter(id=data['object_id']).exists():
+            raise ValidationError({'object_id': 'Object does not exist'})
+        return data
+
+    def get_lookup(self, validated_data):
+        model_class = self._get_model_class(validated_data)
+        return {
+            'content_type': ContentType.objects.get_for_model(model_class),
+            'object_id': validated_data['object_id'],
+            'user': self.context['request'].user,
+        }
+
+
+class LikeSerializerForCreate(BaseLikeSerializerForCreateAndCancel):
+
+    def create(self, validated_data):
+        # liking twice is a no-op, the counter is only buffered and the
+        # owner notified on creation. a concurrent like of the same object
+        # wins the unique index, its like is read back
+        lookup = self.get_lookup(validated_data)
+        try:
+            instance, _ = Like.objects.get_or_create(**lookup)
+        except IntegrityError:
+            instance = Like.objects.get(**lookup)
+        return instance
+
+
+class LikeSerializerForCancel(BaseLikeSerializerForCreateAndCancel):
+
+    def cancel(self):
+        # delete() on the instances sends post_delete for the counter
+        for like in Like.objects.filter(**self.get_lookup(self.validated_data)):
+            like.delete()
@@ -0,0 +1,167 @@
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from likes.models import Like
+from likes.services import LikeService
+from testing.clients import APIClient
+from testing.testcases import TestCase
+from unittest import mock
+
+LIKE_BASE_URL = '/api/likes/'
+LIKE_CANCEL_URL = '/api/likes/cancel/'
+TWEET_LIST_API = '/api/tweets/'
+TWEET_DETAIL_API = '/api/tweets/{}/'
+COMMENT_LIST_API = '/api/comments/'
+NEWSFEED_LIST_API = '/api/newsfeeds/'
+
+
+class LikeApiTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.alfredo_client = APIClient()
+        self.alfredo_client.force_authenticate(self.alfredo)
+
+        self.trump = self.create_user('trump')
+        self.trump_client = APIClient()
+        self.trump_client.force_authenticate(self.trump)
+
+        self.tweet = self.create_tweet(self.alfredo)
+        self.comment = self.create_comment(self.trump, self.tweet)
+
+    def test_like(self):
+        data = {'content_type': 'tweet', 'object_id': self.tweet.id}
+
+        # anonymous is not allowed
+        response = self.anonymous_client.post(LIKE_BASE_URL, data)
+        self.assertEqual(response.status_code, 403)
+
+        # get is not allowed
+        response = self.alfredo_client.get(LIKE_BASE_URL, data)
+        self.assertEqual(response.status_code, 405)
+
+        # wrong content_type
+        response = self.alfredo_client.post(LIKE_BASE_URL, {
+            'content_type': 'twitter',
+            'object_id': self.tweet.id,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('content_type', response.data['errors'])
+
+        # wrong object_id
+        response = self.alfredo_client.post(LIKE_BASE_URL, {
+            'content_type': 'comment',
+            'object_id': 0,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('object_id', response.data['errors'])
+
+        # post success
+        response = self.alfredo_client.post(LIKE_BASE_URL, data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user']['id'], self.alfredo.id)
+        self.assertEqual(Like.objects.count(), 1)
+
+        # duplicate likes are ignored
+        self.alfredo_client.post(LIKE_BASE_URL, data)
+        self.assertEqual(Like.objects.count(), 1)
+        self.trump_client.post(LIKE_BASE_URL, data)
+        self.assertEqual(Like.objects.count(), 2)
+
+        # the liked row is not written to, only the like is inserted
+        data = {'content_type': 'comment', 'object_id': self.comment.id}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.alfredo_client.post(LIKE_BASE_URL, data)
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(any(
+            query['sql'].startswith('UPDATE') for query in ctx.captured_queries
+        ))
+
+    def test_concurrent_likes(self):
+        data = {'content_type': 'tweet', 'object_id': self.tweet.id}
+
+        # the same like is inserted by a concurrent request first
+        def like_concurrently(**lookup):
+            Like.objects.create(**lookup)
+            raise IntegrityError('UNIQUE constraint failed')
+        with mock.patch.object(Like.objects, 'get_or_create', side_effect=like_concurrently):
+            response = self.trump_client.post(LIKE_BASE_URL, data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user']['id'], self.trump.id)
+        self.assertEqual(Like.objects.count(), 1)
+        response = self.anonymous_client.get(TWEET_DETAIL_API.format(self.tweet.id))
+        self.assertEqual(response.data['likes_count'], 1)
+
+    def test_cancel(self):
+        data = {'content_type': 'comment', 'object_id': self.comment.id}
+        self.alfredo_client.post(LIKE_BASE_URL, data)
+        self.trump_client.post(LIKE_BASE_URL, data)
+        self.assertEqual(Like.objects.count(), 2)
+
+        # login required
+        response = self.anonymous_client.post(LIKE_CANCEL_URL, data)
+        self.assertEqual(response.status_code, 403)
+
+        # missing params
+        response = self.alfredo_client.post(LIKE_CANCEL_URL, {
+            'content_type': 'comment',
+        })
+        self.assertEqual(response.status_code, 400)
+
+        # cancel success, twice is fine
+        response = self.alfredo_client.post(LIKE_CANCEL_URL, data)
+        self.assertEqual(response.status_code, 200)
+        response = self.alfredo_client.post(LIKE_CANCEL_URL, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Like.objects.count(), 1)
+        self.assertEqual(Like.objects.first().user, self.trump)
+
+    def test_likes_in_tweets_and_comments_api(self):
+        self.create_like(self.trump, self.tweet)
+        self.create_like(self.alfredo, self.comment)
+
+        # the counts include the buffered likes
+        response = self.alfredo_client.get(TWEET_LIST_API, {
+            'user_id': self.alfredo.id,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tweets'][0]['likes_count'], 1)
+        self.assertEqual(response.data['tweets'][0]['has_liked'], False)
+        response = self.trump_client.get(TWEET_LIST_API, {
+            'user_id': self.alfredo.id,
+        })
+        self.assertEqual(response.data['tweets'][0]['has_liked'], True)
+
+        response = self.anonymous_client.get(TWEET_DETAIL_API.format(self.tweet.id))
+        self.assertEqual(response.data['likes_count'], 1)
+        self.assertEqual(response.data['has_liked'], False)
+        self.assertEqual(response.data['comments'][0]['likes_count'], 1)
+        self.assertEqual(response.data['comments'][0]['has_liked'], False)
+        response = self.alfredo_client.get(TWEET_DETAIL_API.format(self.tweet.id))
+        self.assertEqual(response.data['comments'][0]['has_liked'], True)
+
+        response = self.alfredo_client.get(COMMENT_LIST_API, {
+            'tweet_id': self.tweet.id,
+        })
+        self.assertEqual(response.data['comments'][0]['likes_count'], 1)
+        self.assertEqual(response.data['comments'][0]['has_liked'], True)
+
+        # the counts stay the same across a flush
+        LikeService.flush_likes_counts()
+        self.trump_client.post(LIKE_BASE_URL, {
+            'content_type': 'comment',
+            'object_id': self.comment.id,
+        })
+        response = self.trump_client.get(TWEET_DETAIL_API.format(self.tweet.id))
+        self.assertEqual(response.data['likes_count'], 1)
+        self.assertEqual(response.data['has_liked'], True)
+        self.assertEqual(response.data['comments'][0]['likes_count'], 2)
+        self.assertEqual(response.data['comments'][0]['has_liked'], True)
+
+    def test_likes_in_newsfeeds_api(self):
+        self.create_newsfeed(self.trump, self.tweet)
+        self.create_like(self.trump, self.tweet)
+        response = self.trump_client.get(NEWSFEED_LIST_API)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['newsfeeds'][0]['tweet']['likes_count'], 1)
+        self.assertEqual(response.data['newsfeeds'][0]['tweet']['has_liked'], True)
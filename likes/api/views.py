@@ -0,0 +1,52 @@
+from likes.api.serializers import (
+    LikeSerializer,
+    LikeSerializerForCancel,
+    LikeSerializerForCreate,
+)
+from likes.models import Like
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from utils.decorators import query_budget, required_params
+
+
+class LikeViewSet(viewsets.GenericViewSet):
+    queryset = Like.objects.all()
+    permission_classes = [IsAuthenticated]
+    serializer_class = LikeSerializerForCreate
+
+    # the likes counts are buffered, the liked row is never updated here
+    @query_budget(max_queries=6)
+    @required_params(request_attr='data', params=['content_type', 'object_id'])
+    def create(self, request, *args, **kwargs):
+        serializer = LikeSerializerForCreate(
+            data=request.data,
+            context={'request': request},
+        )
+        if not serializer.is_valid():
+            return Response({
+                'message': 'Please check input',
+                'errors': serializer.errors,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        instance = serializer.save()
+        return Response(
+            LikeSerializer(instance).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(methods=['POST'], detail=False)
+    @query_budget(max_queries=6)
+    @required_params(request_attr='data', params=['content_type', 'object_id'])
+    def cancel(self, request, *args, **kwargs):
+        serializer = LikeSerializerForCancel(
+            data=request.data,
+            context={'request': request},
+        )
+        if not serializer.is_valid():
+            return Response({
+                'message': 'Please check input',
+                'errors': serializer.errors,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        serializer.cancel()
+        return Response({'success': True}, status=status.HTTP_200_OK)
@@ -0,0 +1,25 @@
+def incr_likes_count(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    # import inside the function to avoid the circular import
+    from likes.services import LikeService
+    from notifications.constants import LIKE
+    from notifications.services import NotificationService
+    from trends.services import TrendService
+    from tweets.models import Tweet
+    LikeService.incr_likes_count(instance, 1)
+    liked_model = LikeService.get_liked_model(instance)
+    NotificationService.notify(
+        LIKE,
+        instance.user_id,
+        target_model=liked_model,
+        target_id=instance.object_id,
+    )
+    if liked_model is Tweet:
+        TrendService.record_tweet_engagements([instance.object_id])
+
+
+def decr_likes_count(sender, instance, **kwargs):
+    from likes.services import LikeService
+    LikeService.incr_likes_count(instance, -1)
@@ -0,0 +1,39 @@
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from likes.listeners import decr_likes_count, incr_likes_count
+
+
+class Like(models.Model):
+    # a like of a tweet or of a comment
+    object_id = models.PositiveBigIntegerField()
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.SET_NULL,
+        null=True,
+    )
+    content_object = GenericForeignKey('content_type', 'object_id')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # a user likes an object at most once, the index also answers
+        # has_liked for a page of objects
+        unique_together = (('user', 'content_type', 'object_id'),)
+        # requirement: sort all likes of an object
+        index_together = (('content_type', 'object_id', 'created_at'),)
+
+    def __str__(self):
+        return '{} - {} liked {} {}'.format(
+            self.created_at,
+            self.user,
+            self.content_type,
+            self.object_id,
+        )
+
+
+# hook up with listeners to buffer the likes count of the liked object
+post_save.connect(incr_likes_count, sender=Like)
+post_delete.connect(decr_likes_count, sender=Like)
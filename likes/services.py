@@ -0,0 +1,90 @@
+from comments.models import Comment
+from comments.services import CommentService
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from likes.models import Like
+from tweets.models import Tweet
+from utils.buffered_counters import BufferedCounter
+from utils.memcached_helper import MemcachedHelper
+
+
+class LikeService(object):
+    # the likes counts are written behind, see utils.buffered_counters
+    counters = {
+        Tweet: BufferedCounter(Tweet, 'likes_count'),
+        Comment: BufferedCounter(Comment, 'likes_count'),
+    }
+
+    @classmethod
+    def get_liked_model(cls, like):
+        # get_for_id is cached by django, no query per like
+        return ContentType.objects.get_for_id(like.content_type_id).model_class()
+
+    @classmethod
+    def incr_likes_count(cls, like, delta):
+        cls.counters[cls.get_liked_model(like)].incr(like.object_id, delta)
+
+    @classmethod
+    def get_liked_ids(cls, user, objects):
+        """
+        returns the set of (model_class, object_id) liked by the user among
+        objects of any liked model, with a single query
+        """
+        if not user.is_authenticated or not objects:
+            return set()
+        ids_by_model = {}
+        for obj in objects:
+            ids_by_model.setdefault(obj.__class__, set()).add(obj.id)
+        content_types = ContentType.objects.get_for_models(*ids_by_model.keys())
+        condition = Q()
+        for model_class, object_ids in ids_by_model.items():
+            condition |= Q(
+                content_type=content_types[model_class],
+                object_id__in=object_ids,
+            )
+        models_by_content_type_id = {
+            content_type.id: model_class
+            for model_class, content_type in content_types.items()
+        }
+        return set(
+            (models_by_content_type_id[content_type_id], object_id)
+            for content_type_id, object_id in Like.objects.filter(
+                condition,
+                user_id=user.id,
+            ).values_list('content_type_id', 'object_id')
+        )
+
+    @classmethod
+    def hydrate_likes(cls, user, objects):
+        """
+        set likes_count_with_pending, the stored count plus the buffered
+        deltas, and has_liked on a page of tweets and / or comments, with
+        one redis round trip per model and at most one query
+        """
+        objects = list(objects)
+        liked_ids = cls.get_liked_ids(user, objects)
+        objects_by_model = {}
+        for obj in objects:
+            objects_by_model.setdefault(obj.__class__, []).append(obj)
+        for model_class, model_objects in objects_by_model.items():
+            counts = cls.counters[model_class].get_counts(model_objects)
+            for obj in model_objects:
+                obj.likes_count_with_pending = counts[obj.id]
+                obj.has_liked = (model_class, obj.id) in liked_ids
+        return objects
+
+    @classmethod
+    def flush_likes_counts(cls):
+        # returns the number of objects whose likes_count was updated
+        tweet_ids = cls.counters[Tweet].flush()
+        MemcachedHelper.invalidate_cached_objects(Tweet, tweet_ids)
+        comment_ids = cls.counters[Comment].flush()
+        # the comments are cached in the lists of their tweets
+        tweet_ids_of_comments = set(
+            Comment.objects.filter(id__in=comment_ids)
+            .values_list('tweet_id', flat=True)
+        ) - {None}
+        for tweet_id in tweet_ids_of_comments:
+            CommentService.invalidate_comments_preview(tweet_id)
+            CommentService.invalidate_cached_comments(tweet_id)
+        return len(tweet_ids) + len(comment_ids)
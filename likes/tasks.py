@@ -0,0 +1,11 @@
+from celery import shared_task
+from utils.time_constants import ONE_MINUTE
+
+
+@shared_task(time_limit=ONE_MINUTE)
+def flush_likes_counts_task():
+    # import inside the task to avoid the circular import with services
+    from likes.services import LikeService
+
+    flushed = LikeService.flush_likes_counts()
+    return '{} likes counts flushed'.format(flushed)
@@ -0,0 +1,166 @@
+from comments.models import Comment
+from contextlib import contextmanager
+from django.contrib.auth.models import AnonymousUser
+from django.db import DatabaseError, transaction
+from likes.models import Like
+from likes.services import LikeService
+from likes.tasks import flush_likes_counts_task
+from testing.testcases import TestCase
+from tweets.models import Tweet
+from tweets.services import TweetService
+from unittest import mock
+from utils.redis_client import RedisClient
+from utils.redis_helper import RedisHelper
+
+
+class LikeModelTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.tweet = self.create_tweet(self.alfredo)
+
+    def test_like(self):
+        self.create_like(self.alfredo, self.tweet)
+        # liking twice is a no-op
+        self.create_like(self.alfredo, self.tweet)
+        self.assertEqual(Like.objects.count(), 1)
+
+        like = Like.objects.first()
+        self.assertEqual(like.content_object, self.tweet)
+        self.assertEqual(like.user, self.alfredo)
+
+
+class LikeServiceTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.trump = self.create_user('trump')
+        self.tweet = self.create_tweet(self.alfredo)
+        self.comment = self.create_comment(self.trump, self.tweet)
+
+    def test_likes_are_buffered(self):
+        self.create_like(self.alfredo, self.tweet)
+        self.create_like(self.trump, self.tweet)
+        self.create_like(self.alfredo, self.comment)
+
+        # the rows are not updated until the buffer is flushed
+        self.assertEqual(Tweet.objects.get(id=self.tweet.id).likes_count, 0)
+        self.assertEqual(Comment.objects.get(id=self.comment.id).likes_count, 0)
+
+        # but the reads add the pending deltas
+        tweet = Tweet.objects.get(id=self.tweet.id)
+        comment = Comment.objects.get(id=self.comment.id)
+        LikeService.hydrate_likes(self.alfredo, [tweet, comment])
+        self.assertEqual(tweet.likes_count_with_pending, 2)
+        self.assertEqual(comment.likes_count_with_pending, 1)
+
+        # canceling a like buffers a negative delta
+        Like.objects.filter(user=self.trump).delete()
+        LikeService.hydrate_likes(self.alfredo, [tweet])
+        self.assertEqual(tweet.likes_count_with_pending, 1)
+
+    def test_hydrate_likes(self):
+        self.create_like(self.trump, self.tweet)
+        tweet = Tweet.objects.get(id=self.tweet.id)
+        comment = Comment.objects.get(id=self.comment.id)
+
+        # one query for the likes of the user over both models
+        with self.assertNumQueries(1):
+            LikeService.hydrate_likes(self.trump, [tweet, comment])
+        self.assertEqual(tweet.has_liked, True)
+        self.assertEqual(comment.has_liked, False)
+
+        LikeService.hydrate_likes(self.alfredo, [tweet, comment])
+        self.assertEqual(tweet.has_liked, False)
+
+        # no query for the anonymous users
+        with self.assertNumQueries(0):
+            LikeService.hydrate_likes(AnonymousUser(), [tweet, comment])
+        self.assertEqual(tweet.has_liked, False)
+        self.assertEqual(tweet.likes_count_with_pending, 1)
+
+    def test_flush_likes_counts(self):
+        self.create_like(self.alfredo, self.tweet)
+        self.create_like(self.trump, self.tweet)
+        self.create_like(self.alfredo, self.comment)
+        # cache the tweet with the stale count
+        self.assertEqual(TweetService.get_tweet_through_cache(self.tweet.id).likes_count, 0)
+
+        # one UPDATE per liked object whatever the number of likes, and the
+        # tweets of the comments to invalidate their cached lists
+        with self.assertNumQueries(7):
+            self.assertEqual(flush_likes_counts_task(), '2 likes counts flushed')
+        self.assertEqual(Tweet.objects.get(id=self.tweet.id).likes_count, 2)
+        self.assertEqual(Comment.objects.get(id=self.comment.id).likes_count, 1)
+        # the cached tweet is invalidated along with the buffer
+        tweet = TweetService.get_tweet_through_cache(self.tweet.id)
+        self.assertEqual(tweet.likes_count, 2)
+        LikeService.hydrate_likes(self.alfredo, [tweet])
+        self.assertEqual(tweet.likes_count_with_pending, 2)
+
+        # nothing left to flush
+        self.assertEqual(flush_likes_counts_task(), '0 likes counts flushed')
+
+    def test_failed_flush_is_retried(self):
+        counter = LikeService.counters[Tweet]
+        self.create_like(self.alfredo, self.tweet)
+        # a flush died after moving the buffer aside
+        conn = RedisClient.get_connection()
+        conn.rename(counter.buffer_key, counter.flushing_key)
+        self.create_like(self.trump, self.tweet)
+
+        # the deltas being flushed are still counted
+        tweet = Tweet.objects.get(id=self.tweet.id)
+        self.assertEqual(counter.get_counts([tweet]), {tweet.id: 2})
+
+        # the next flush applies the deltas left aside first
+        self.assertEqual(counter.flush(), [tweet.id])
+        self.assertEqual(Tweet.objects.get(id=tweet.id).likes_count, 1)
+        self.assertEqual(counter.flush(), [tweet.id])
+        self.assertEqual(Tweet.objects.get(id=tweet.id).likes_count, 2)
+
+    def test_concurrent_flushes(self):
+        counter = LikeService.counters[Tweet]
+        self.create_like(self.alfredo, self.tweet)
+        conn = RedisClient.get_connection()
+        conn.set(counter.lock_key, 1)
+        # another flush holds the lock
+        self.assertEqual(counter.flush(), [])
+        self.assertEqual(Tweet.objects.get(id=self.tweet.id).likes_count, 0)
+        conn.delete(counter.lock_key)
+        self.assertEqual(counter.flush(), [self.tweet.id])
+        self.assertEqual(Tweet.objects.get(id=self.tweet.id).likes_count, 1)
+
+    def test_lock_is_released_by_its_owner_only(self):
+        counter = LikeService.counters[Tweet]
+        token = RedisHelper.acquire_lock(counter.lock_key, 10)
+        self.assertIsNone(RedisHelper.acquire_lock(counter.lock_key, 10))
+        # the lock expired and another flush holds it now
+        conn = RedisClient.get_connection()
+        conn.set(counter.lock_key, 'another token')
+        self.assertEqual(RedisHelper.release_lock(counter.lock_key, token), False)
+        self.assertEqual(conn.get(counter.lock_key), b'another token')
+
+    def test_failed_commit_restores_the_deltas(self):
+        counter = LikeService.counters[Tweet]
+        self.create_like(self.alfredo, self.tweet)
+
+        atomic = transaction.atomic
+
+        @contextmanager
+        def failing_commit():
+            with atomic():
+                yield
+                raise DatabaseError('commit failed')
+        with mock.patch('utils.buffered_counters.transaction.atomic', failing_commit), \
+                self.assertRaises(DatabaseError):
+            counter.flush()
+        self.assertEqual(Tweet.objects.get(id=self.tweet.id).likes_count, 0)
+        tweet = Tweet.objects.get(id=self.tweet.id)
+        self.assertEqual(counter.get_counts([tweet]), {tweet.id: 1})
+
+        self.assertEqual(counter.flush(), [self.tweet.id])
+        self.assertEqual(Tweet.objects.get(id=self.tweet.id).likes_count, 1)
+        self.assertEqual(counter.flush(), [])
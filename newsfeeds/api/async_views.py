@@ -0,0 +1,35 @@
+from newsfeeds.api.views import (
+    paginate_celebrity_tweets,
+    paginate_newsfeeds,
+    serialize_newsfeeds_page,
+)
+from utils.asgi import async_view, run_sync
+from utils.decorators import query_budget
+from utils.paginations import EndlessPagination
+import asyncio
+
+
+@async_view(authenticated=True)
+@query_budget(max_queries=9)
+async def list_newsfeeds(request):
+    # the async NewsFeedViewSet.list, the fanned out newsfeeds and the
+    # tweets of the followed celebrities are read at the same time
+    newsfeeds_paginator = EndlessPagination()
+    tweets_paginator = EndlessPagination()
+    newsfeeds, tweets = await asyncio.gather(
+        run_sync(paginate_newsfeeds, newsfeeds_paginator, request),
+        run_sync(paginate_celebrity_tweets, tweets_paginator, request),
+    )
+    data, has_more = await run_sync(
+        serialize_newsfeeds_page,
+        request.user,
+        newsfeeds,
+        tweets,
+        newsfeeds_paginator.page_size,
+    )
+    newsfeeds_paginator.has_next_page = (
+        newsfeeds_paginator.has_next_page
+        or tweets_paginator.has_next_page
+        or has_more
+    )
+    return newsfeeds_paginator.get_paginated_response(data, key='newsfeeds')
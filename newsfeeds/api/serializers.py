@@ -4,8 +4,10 @@ from tweets.api.serializers import TweetSerializer
 
 
 class NewsFeedSerializer(serializers.ModelSerializer):
+    # the snowflake id as a string, it goes beyond the integers of javascript
+    id_str = serializers.CharField(source='id', read_only=True)
     tweet = TweetSerializer()
 
     class Meta:
         model = NewsFeed
-        fields = ('id', 'created_at', 'tweet')
+        fields = ('id', 'id_str', 'created_at', 'tweet')
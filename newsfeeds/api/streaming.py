@@ -0,0 +1,187 @@
+from django.core import signals
+from functools import wraps
+from likes.services import LikeService
+from newsfeeds.api.serializers import NewsFeedSerializer
+from newsfeeds.constants import (
+    NEWSFEED_POLL_TIMEOUT,
+    NEWSFEED_STREAM_KEEPALIVE,
+    NEWSFEEDS_CHANNEL_PATTERN,
+)
+from newsfeeds.services import NewsFeedService
+from urllib.parse import parse_qs
+from utils.asgi import (
+    NOT_AUTHENTICATED,
+    authenticate,
+    get_header,
+    run_sync,
+    send_json,
+    wait_for_disconnect,
+)
+from utils.paginations import parse_cursor
+from utils.pubsub import PubSub
+from utils.snowflake import EPOCH
+import asyncio
+import json
+
+
+def load_new_newsfeeds(user, since):
+    # the page of newsfeeds created after since, next_cursor is the
+    # since of the next read
+    newsfeeds, has_more = NewsFeedService.get_newsfeeds_since(user.id, since)
+    next_cursor = newsfeeds[0].created_at if newsfeeds else since
+    newsfeeds = NewsFeedService.hydrate_tweets(newsfeeds)
+    LikeService.hydrate_likes(user, [newsfeed.tweet for newsfeed in newsfeeds])
+    return {
+        'results': NewsFeedSerializer(newsfeeds, many=True).data,
+        'next_cursor': next_cursor.isoformat(),
+        'has_more': has_more,
+    }
+
+
+def get_stream_start(user_id):
+    # a stream without cursor skips the newsfeeds already there
+    newsfeeds = NewsFeedService.get_cached_newsfeeds(user_id)
+    return newsfeeds[0].created_at if newsfeeds else EPOCH
+
+
+async def send_new_newsfeeds(send, user, since):
+    # one event per page, the id of the event is its next_cursor so that an
+    # EventSource resumes from it with Last-Event-ID when it reconnects
+    page = await run_sync(load_new_newsfeeds, user, since)
+    if not page['results']:
+        return since
+    await send({
+        'type': 'http.response.body',
+        'body': 'id: {}\nevent: newsfeeds\ndata: {}\n\n'.format(
+            page['next_cursor'],
+            json.dumps(page),
+        ).encode(),
+        'more_body': True,
+    })
+    return parse_cursor(page['next_cursor'])
+
+
+async def wait_for_message(subscription, disconnected, timeout):
+    # returns the message, or None on timeout or once the client is gone
+    message = asyncio.ensure_future(subscription.get())
+    done, _ = await asyncio.wait(
+        {message, disconnected},
+        timeout=timeout,
+        return_when=asyncio.FIRST_COMPLETED,
+    )
+    if message not in done:
+        message.cancel()
+        return None
+    return message.result()
+
+
+def newsfeeds_endpoint(endpoint):
+    """
+    the raw ASGI app of an endpoint of the newsfeeds pushed to the client.
+    Django 3.1 runs the async views below the sync middlewares in a thread
+    shared by the requests and iterates the streaming responses
+    synchronously, so a connection held open would block the other
+    requests. the endpoints are served next to Django instead, see
+    utils.asgi, endpoint(user, since, send, subscription, disconnected)
+    runs once the user is authenticated and subscribed
+    """
+    @wraps(endpoint)
+    async def app(scope, receive, send):
+        await run_sync(signals.request_started.send, sender=app, scope=scope)
+        try:
+            user = await run_sync(authenticate, scope)
+            if not user.is_authenticated:
+                await send_json(send, 403, NOT_AUTHENTICATED)
+                return
+            query = parse_qs(scope['query_string'].decode('latin1'))
+            cursor = query.get('since_cursor', [None])[0] or get_header(scope, b'last-event-id')
+            since = None
+            if cursor is not None:
+                since = parse_cursor(cursor)
+                if since is None:
+                    await send_json(send, 400, {
+                        'message': 'since_cursor is not a datetime',
+                        'success': False,
+                    })
+                    return
+
+            # subscribe before reading, so a newsfeed fanned out in between
+            # is not missed
+            subscription = PubSub.subscribe(
+                NEWSFEEDS_CHANNEL_PATTERN.format(user_id=user.id),
+            )
+            disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+            try:
+                await endpoint(user, since, query, send, subscription, disconnected)
+            finally:
+                disconnected.cancel()
+                PubSub.unsubscribe(subscription)
+        finally:
+            await run_sync(signals.request_finished.send, sender=app)
+    return app
+
+
+@newsfeeds_endpoint
+async def stream_newsfeeds(user, since, query, send, subscription, disconnected):
+    """
+    GET /api/newsfeeds/stream/, a text/event-stream of the new newsfeeds of
+    the user. it starts after since_cursor or Last-Event-ID when given,
+    otherwise after the newsfeeds already there
+    """
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    if since is None:
+        since = await run_sync(get_stream_start, user.id)
+    else:
+        since = await send_new_newsfeeds(send, user, since)
+    while not disconnected.done():
+        message = await wait_for_message(
+            subscription,
+            disconnected,
+            NEWSFEED_STREAM_KEEPALIVE,
+        )
+        if message is not None:
+            # a single read catches up with every queued message
+            subscription.drain()
+            since = await send_new_newsfeeds(send, user, since)
+        elif not disconnected.done():
+            # the comment keeps the idle connection open through proxies
+            await send({
+                'type': 'http.response.body',
+                'body': b': keepalive\n\n',
+                'more_body': True,
+            })
+
+
+@newsfeeds_endpoint
+async def poll_newsfeeds(user, since, query, send, subscription, disconnected):
+    """
+    GET /api/newsfeeds/poll/?since_cursor=, the long-poll fallback of the
+    stream. it answers as soon as there are newsfeeds newer than
+    since_cursor, or with an empty page after timeout seconds. the client
+    polls again with the next_cursor of the response
+    """
+    if since is None:
+        await send_json(send, 400, {
+            'message': 'missing since_cursor in request',
+            'success': False,
+        })
+        return
+    try:
+        timeout = min(float(query['timeout'][0]), NEWSFEED_POLL_TIMEOUT)
+    except (KeyError, ValueError):
+        timeout = NEWSFEED_POLL_TIMEOUT
+
+    page = await run_sync(load_new_newsfeeds, user, since)
+    if not page['results']:
+        message = await wait_for_message(subscription, disconnected, timeout)
+        if message is not None:
+            page = await run_sync(load_new_newsfeeds, user, since)
+    await send_json(send, 200, page)
@@ -1,16 +1,37 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signals
+from django.db import close_old_connections
+from django.db import connection, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from newsfeeds.api.streaming import poll_newsfeeds, stream_newsfeeds
 from newsfeeds.models import NewsFeed
+from newsfeeds.services import NewsFeedService
+from newsfeeds.sharding import get_shard_alias
 from friendships.models import Friendship
-from rest_framework.test import APIClient
+from testing.clients import APIClient, AsgiClient
+from newsfeeds.tasks import fanout_newsfeeds_main_task
 from testing.testcases import TestCase
+from unittest import mock
+from utils.paginations import EndlessPagination
+from utils.pubsub import PubSub
+from utils.snowflake import EPOCH
+from urllib.parse import urlencode
+import asyncio
+import json
 
 NEWSFEEDS_URL = '/api/newsfeeds/'
 POST_TWEETS_URL = '/api/tweets/'
 FOLLOW_URL = '/api/friendships/{}/follow/'
+POLL_NEWSFEEDS_URL = '/api/newsfeeds/poll/'
+STREAM_NEWSFEEDS_URL = '/api/newsfeeds/stream/'
 
 
 class NewsFeedApiTest(TestCase):
 
     def setUp(self):
+        self.clear_cache()
         self.alfredo = self.create_user('alfredo')
         self.alfredo_client = APIClient()
         self.alfredo_client.force_authenticate(self.alfredo)
@@ -54,3 +75,454 @@ class NewsFeedApiTest(TestCase):
         self.assertEqual(len(response.data['newsfeeds']), 2)
         self.assertEqual(response.data['newsfeeds'][0]['tweet']['id'], posted_tweet_id)
 
+    def test_pagination(self):
+        page_size = EndlessPagination.page_size
+        followed_user = self.create_user('followed')
+        newsfeeds = []
+        for i in range(page_size * 2):
+            tweet = self.create_tweet(followed_user)
+            newsfeed = self.create_newsfeed(user=self.alfredo, tweet=tweet)
+            newsfeeds.append(newsfeed)
+        newsfeeds = newsfeeds[::-1]
+
+        # pull the first page
+        response = self.alfredo_client.get(NEWSFEEDS_URL)
+        self.assertEqual(response.data['has_next_page'], True)
+        self.assertEqual(len(response.data['newsfeeds']), page_size)
+        self.assertEqual(response.data['newsfeeds'][0]['id'], newsfeeds[0].id)
+        self.assertEqual(
+            response.data['newsfeeds'][page_size - 1]['id'],
+            newsfeeds[page_size - 1].id,
+        )
+
+        # pull the second page
+        response = self.alfredo_client.get(NEWSFEEDS_URL, {
+            'created_before': newsfeeds[page_size - 1].created_at,
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        results = response.data['newsfeeds']
+        self.assertEqual(len(results), page_size)
+        self.assertEqual(results[0]['id'], newsfeeds[page_size].id)
+        self.assertEqual(results[page_size - 1]['id'], newsfeeds[-1].id)
+
+        # pull latest newsfeeds
+        response = self.alfredo_client.get(NEWSFEEDS_URL, {
+            'created_after': newsfeeds[0].created_at,
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        self.assertEqual(len(response.data['newsfeeds']), 0)
+
+        tweet = self.create_tweet(followed_user)
+        new_newsfeed = self.create_newsfeed(user=self.alfredo, tweet=tweet)
+        response = self.alfredo_client.get(NEWSFEEDS_URL, {
+            'created_after': newsfeeds[0].created_at,
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        self.assertEqual(len(response.data['newsfeeds']), 1)
+        self.assertEqual(response.data['newsfeeds'][0]['id'], new_newsfeed.id)
+
+        # invalid cursor
+        response = self.alfredo_client.get(NEWSFEEDS_URL, {
+            'created_before': 'yesterday',
+        })
+        self.assertEqual(response.status_code, 400)
+        response = self.alfredo_client.get(NEWSFEEDS_URL, {
+            'created_before': '2030-13-01T00:00:00',
+        })
+        self.assertEqual(response.status_code, 400)
+
+        # a cursor without offset is in UTC
+        response = self.alfredo_client.get(NEWSFEEDS_URL, {
+            'created_before': newsfeeds[page_size - 1].created_at
+            .replace(tzinfo=None).isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['newsfeeds'][0]['id'], newsfeeds[page_size].id)
+
+    def test_pagination_beyond_cached_window(self):
+        list_limit = settings.REDIS_LIST_LENGTH_LIMIT
+        page_size = EndlessPagination.page_size
+        followed_user = self.create_user('followed')
+        newsfeeds = []
+        for i in range(list_limit + page_size):
+            tweet = self.create_tweet(followed_user)
+            newsfeeds.append(self.create_newsfeed(self.alfredo, tweet))
+        newsfeeds = newsfeeds[::-1]
+
+        # walk through every page, the last one is read from the database
+        results, created_before = [], None
+        while True:
+            params = {}
+            if created_before:
+                params['created_before'] = created_before
+            response = self.alfredo_client.get(NEWSFEEDS_URL, params)
+            results.extend(response.data['newsfeeds'])
+            if not response.data['has_next_page']:
+                break
+            created_before = response.data['newsfeeds'][-1]['created_at']
+        self.assertEqual([r['id'] for r in results], [f.id for f in newsfeeds])
+
+        # a new newsfeed is pushed into the cached list
+        tweet = self.create_tweet(followed_user)
+        new_newsfeed = self.create_newsfeed(self.alfredo, tweet)
+        response = self.alfredo_client.get(NEWSFEEDS_URL, {
+            'created_after': newsfeeds[0].created_at,
+        })
+        self.assertEqual(len(response.data['newsfeeds']), 1)
+        self.assertEqual(response.data['newsfeeds'][0]['id'], new_newsfeed.id)
+
+    @override_settings(CELEBRITY_FOLLOWERS_THRESHOLD=1)
+    def test_list_with_celebrity_tweets(self):
+        page_size = EndlessPagination.page_size
+        # trump is a celebrity with 2 followers, his tweets are not pushed
+        self.create_friendship(self.alfredo, self.trump)
+        self.create_friendship(self.create_user('fan'), self.trump)
+        pushed_tweet = self.create_tweet(self.trump)
+        self.create_newsfeed(self.alfredo, pushed_tweet)
+        newsfeeds = []
+        for i in range(page_size // 2 + 1):
+            tweet = self.create_tweet(self.trump)
+            newsfeeds.append(('pulled', tweet.id))
+            tweet = self.create_tweet(self.alfredo)
+            self.create_newsfeed(self.alfredo, tweet)
+            newsfeeds.append(('pushed', tweet.id))
+        newsfeeds = newsfeeds[::-1] + [('pushed', pushed_tweet.id)]
+
+        # the first page merges both sources in time order
+        response = self.alfredo_client.get(NEWSFEEDS_URL)
+        self.assertEqual(response.data['has_next_page'], True)
+        results = response.data['newsfeeds']
+        self.assertEqual(
+            [r['tweet']['id'] for r in results],
+            [tweet_id for _, tweet_id in newsfeeds[:page_size]],
+        )
+        self.assertEqual(
+            [r['id'] is None for r in results],
+            [source == 'pulled' for source, _ in newsfeeds[:page_size]],
+        )
+
+        # the pushed tweet is not duplicated by the pulled one
+        response = self.alfredo_client.get(NEWSFEEDS_URL, {
+            'created_before': results[-1]['created_at'],
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        self.assertEqual(
+            [r['tweet']['id'] for r in response.data['newsfeeds']],
+            [tweet_id for _, tweet_id in newsfeeds[page_size:]],
+        )
+
+        # users who do not follow the celebrity do not see the tweets
+        response = self.trump_client.get(NEWSFEEDS_URL)
+        self.assertEqual(len(response.data['newsfeeds']), 0)
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        def count_list_queries():
+            # warm up the cached newsfeeds and followers counts
+            self.alfredo_client.get(NEWSFEEDS_URL)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.alfredo_client.get(NEWSFEEDS_URL)
+            return len(response.data['newsfeeds']), len(ctx.captured_queries)
+
+        for i in range(2):
+            user = self.create_user('poster{}'.format(i))
+            self.create_newsfeed(self.alfredo, self.create_tweet(user))
+        results_count, small_page_queries = count_list_queries()
+        self.assertEqual(results_count, 2)
+
+        for i in range(EndlessPagination.page_size):
+            user = self.create_user('another_poster{}'.format(i))
+            self.create_newsfeed(self.alfredo, self.create_tweet(user))
+        results_count, full_page_queries = count_list_queries()
+        self.assertEqual(results_count, EndlessPagination.page_size)
+        self.assertEqual(small_page_queries, full_page_queries)
+
+
+NEWSFEED_SHARDS = ['default', 'newsfeeds_shard_1', 'newsfeeds_shard_2']
+
+
+@override_settings(NEWSFEED_SHARDS=NEWSFEED_SHARDS)
+class ShardedNewsFeedApiTest(TestCase):
+    databases = set(NEWSFEED_SHARDS)
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.alfredo_client = APIClient()
+        self.alfredo_client.force_authenticate(self.alfredo)
+
+    def test_list_reads_the_shard_of_the_user(self):
+        clients = {}
+        for i in range(6):
+            follower = self.create_user('follower{}'.format(i))
+            self.create_friendship(follower, self.alfredo)
+            clients[follower.id] = APIClient()
+            clients[follower.id].force_authenticate(follower)
+
+        response = self.alfredo_client.post(POST_TWEETS_URL, {
+            'content': 'Hello sharded world',
+        })
+        tweet_id = response.data['id']
+        for user_id, client in clients.items():
+            alias = get_shard_alias(user_id)
+            # the newsfeed page is read from the owning shard only
+            with CaptureQueriesContext(connections[alias]) as ctx:
+                response = client.get(NEWSFEEDS_URL)
+            self.assertEqual(len(ctx.captured_queries) > 0, True)
+            self.assertEqual(
+                [r['tweet']['id'] for r in response.data['newsfeeds']],
+                [tweet_id],
+            )
+            newsfeed = NewsFeed.objects.using(alias).get(user_id=user_id)
+            self.assertEqual(response.data['newsfeeds'][0]['id'], newsfeed.id)
+
+
+WIDE_COLUMN_BACKENDS = {
+    'friendships.Friendship': 'wide_column',
+    'newsfeeds.NewsFeed': 'wide_column',
+}
+
+
+@override_settings(MODEL_STORAGE_BACKENDS=WIDE_COLUMN_BACKENDS)
+class WideColumnNewsFeedApiTest(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.alfredo_client = APIClient()
+        self.alfredo_client.force_authenticate(self.alfredo)
+        self.trump = self.create_user('trump')
+        self.trump_client = APIClient()
+        self.trump_client.force_authenticate(self.trump)
+        self.alfredo_client.post(FOLLOW_URL.format(self.trump.id))
+
+    def test_list(self):
+        tweet_ids = []
+        for i in range(3):
+            response = self.trump_client.post(POST_TWEETS_URL, {
+                'content': 'tweet {}'.format(i),
+            })
+            tweet_ids.append(response.data['id'])
+        self.assertEqual(NewsFeed.objects.count(), 0)
+
+        response = self.alfredo_client.get(NEWSFEEDS_URL)
+        self.assertEqual(
+            [r['tweet']['id'] for r in response.data['newsfeeds']],
+            list(reversed(tweet_ids)),
+        )
+        # the ids are kept in the rows, the cursors are the created_at of
+        # the tweets
+        self.assertEqual(
+            [r['id'] for r in response.data['newsfeeds']],
+            [f.id for f in NewsFeedService.get_newsfeeds(self.alfredo.id)],
+        )
+        response = self.alfredo_client.get(NEWSFEEDS_URL, {
+            'created_before': response.data['newsfeeds'][0]['created_at'],
+        })
+        self.assertEqual(
+            [r['tweet']['id'] for r in response.data['newsfeeds']],
+            [tweet_ids[1], tweet_ids[0]],
+        )
+
+        # the page beyond the cached list is scanned from the table
+        NewsFeedService.invalidate_cached_newsfeeds(self.alfredo.id)
+        with self.settings(REDIS_LIST_LENGTH_LIMIT=1):
+            response = self.alfredo_client.get(NEWSFEEDS_URL, {
+                'created_before': response.data['newsfeeds'][0]['created_at'],
+            })
+        self.assertEqual(
+            [r['tweet']['id'] for r in response.data['newsfeeds']],
+            [tweet_ids[0]],
+        )
+
+
+
+
+class AsyncNewsFeedApiTest(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.alfredo_client = APIClient()
+        self.alfredo_client.force_authenticate(self.alfredo)
+        self.alfredo_asgi_client = AsgiClient()
+        self.alfredo_asgi_client.force_login(self.alfredo)
+        self.trump = self.create_user('trump')
+        self.create_friendship(self.alfredo, self.trump)
+
+    def test_list(self):
+        response = AsgiClient().get(NEWSFEEDS_URL)
+        self.assertEqual(response.status_code, 403)
+
+        tweets = [self.create_tweet(self.trump) for _ in range(12)]
+        for tweet in tweets:
+            fanout_newsfeeds_main_task(tweet.id, self.trump.id)
+        response = self.alfredo_asgi_client.get(NEWSFEEDS_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.alfredo_client.get(NEWSFEEDS_URL).json())
+        self.assertEqual(response.json()['has_next_page'], True)
+        params = {'created_before': response.json()['newsfeeds'][-1]['created_at']}
+        response = self.alfredo_asgi_client.get(NEWSFEEDS_URL, params)
+        self.assertEqual(
+            [r['tweet']['id'] for r in response.json()['newsfeeds']],
+            [tweets[1].id, tweets[0].id],
+        )
+        self.assertEqual(response.json()['has_next_page'], False)
+
+    @override_settings(CELEBRITY_FOLLOWERS_THRESHOLD=0)
+    def test_list_merges_celebrity_tweets(self):
+        newsfeed_tweet = self.create_tweet(self.trump)
+        self.create_newsfeed(self.alfredo, newsfeed_tweet)
+        # trump is a celebrity now, his tweets are pulled
+        tweet = self.create_tweet(self.trump)
+        response = self.alfredo_asgi_client.get(NEWSFEEDS_URL)
+        self.assertEqual(
+            [r['tweet']['id'] for r in response.json()['newsfeeds']],
+            [tweet.id, newsfeed_tweet.id],
+        )
+        self.assertEqual(response.json(), self.alfredo_client.get(NEWSFEEDS_URL).json())
+
+
+class NewsFeedPushTest(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.trump = self.create_user('trump')
+        self.create_friendship(self.alfredo, self.trump)
+        self.client.force_login(self.alfredo)
+        # like the test client, keep the connection of the test transaction
+        signals.request_started.disconnect(close_old_connections)
+        self.addCleanup(signals.request_started.connect, close_old_connections)
+
+    def post_tweet(self, content):
+        tweet = self.create_tweet(self.trump, content)
+        fanout_newsfeeds_main_task(tweet.id, self.trump.id)
+        return tweet
+
+    def start(self, app, path, params=None, headers=None, login=True):
+        # runs the ASGI app, its messages are sent to self.outbox
+        headers = list(headers or [])
+        if login:
+            cookie = '{}={}'.format(
+                settings.SESSION_COOKIE_NAME,
+                self.client.cookies[settings.SESSION_COOKIE_NAME].value,
+            )
+            headers.append((b'cookie', cookie.encode()))
+        scope = {
+            'type': 'http',
+            'path': path,
+            'query_string': urlencode(params or {}).encode(),
+            'headers': headers,
+        }
+        self.inbox = asyncio.Queue()
+        self.outbox = asyncio.Queue()
+        return asyncio.ensure_future(app(scope, self.inbox.get, self.outbox.put))
+
+    async def receive(self):
+        return await asyncio.wait_for(self.outbox.get(), 1)
+
+    async def poll(self, params=None, login=True):
+        # returns (status, data)
+        await asyncio.wait_for(
+            self.start(poll_newsfeeds, POLL_NEWSFEEDS_URL, params, login=login),
+            1,
+        )
+        start, body = await self.receive(), await self.receive()
+        return start['status'], json.loads(body['body'])
+
+    async def receive_event(self):
+        message = await self.receive()
+        fields = dict(
+            line.split(': ', 1)
+            for line in message['body'].decode().strip().split('\n')
+        )
+        fields['data'] = json.loads(fields['data'])
+        return fields
+
+    async def test_poll(self):
+        status, _ = await self.poll({'since_cursor': EPOCH.isoformat()}, login=False)
+        self.assertEqual(status, 403)
+        status, _ = await self.poll()
+        self.assertEqual(status, 400)
+        status, _ = await self.poll({'since_cursor': 'yesterday'})
+        self.assertEqual(status, 400)
+
+        # the newsfeeds already there are answered right away
+        tweet = await sync_to_async(self.post_tweet)('hello')
+        newsfeed = await sync_to_async(NewsFeed.objects.get)(user=self.alfredo, tweet=tweet)
+        status, data = await self.poll({'since_cursor': EPOCH.isoformat()})
+        self.assertEqual(status, 200)
+        self.assertEqual([r['tweet']['id'] for r in data['results']], [tweet.id])
+        self.assertEqual(data['next_cursor'], newsfeed.created_at.isoformat())
+        self.assertEqual(data['has_more'], False)
+
+        # a cursor without offset is in UTC
+        status, data = await self.poll({
+            'since_cursor': EPOCH.replace(tzinfo=None).isoformat(),
+        })
+        self.assertEqual(status, 200)
+        self.assertEqual([r['tweet']['id'] for r in data['results']], [tweet.id])
+
+        # nothing new, an empty page after the timeout
+        since_cursor = data['next_cursor']
+        status, data = await self.poll({'since_cursor': since_cursor, 'timeout': 0.01})
+        self.assertEqual(data['results'], [])
+        self.assertEqual(data['next_cursor'], since_cursor)
+
+        # the waiting poll answers once the fanout wrote the newsfeed
+        poll = self.start(poll_newsfeeds, POLL_NEWSFEEDS_URL, {'since_cursor': since_cursor})
+        while not PubSub.subscriptions:
+            await asyncio.sleep(0.01)
+        tweet = await sync_to_async(self.post_tweet)('world')
+        await asyncio.wait_for(poll, 1)
+        await self.receive()
+        data = json.loads((await self.receive())['body'])
+        self.assertEqual([r['tweet']['id'] for r in data['results']], [tweet.id])
+        self.assertEqual(PubSub.subscriptions, {})
+
+    async def test_stream(self):
+        old_tweet = await sync_to_async(self.post_tweet)('old')
+        stream = self.start(stream_newsfeeds, STREAM_NEWSFEEDS_URL)
+        message = await self.receive()
+        self.assertEqual(message['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), message['headers'])
+
+        # the newsfeeds already there are skipped, the new ones are pushed
+        tweet = await sync_to_async(self.post_tweet)('new')
+        event = await self.receive_event()
+        self.assertEqual(event['event'], 'newsfeeds')
+        self.assertEqual([r['tweet']['id'] for r in event['data']['results']], [tweet.id])
+        self.assertEqual(event['id'], event['data']['next_cursor'])
+
+        await self.inbox.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(stream, 1)
+        self.assertEqual(PubSub.subscriptions, {})
+
+        # a reconnecting client resumes from Last-Event-ID
+        stream = self.start(stream_newsfeeds, STREAM_NEWSFEEDS_URL, headers=[
+            (b'last-event-id', EPOCH.isoformat().encode()),
+        ])
+        await self.receive()
+        event = await self.receive_event()
+        self.assertEqual(
+            [r['tweet']['id'] for r in event['data']['results']],
+            [tweet.id, old_tweet.id],
+        )
+        await self.inbox.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(stream, 1)
+
+    async def test_stream_keepalive(self):
+        with mock.patch('newsfeeds.api.streaming.NEWSFEED_STREAM_KEEPALIVE', 0.01):
+            stream = self.start(stream_newsfeeds, STREAM_NEWSFEEDS_URL)
+            await self.receive()
+            message = await self.receive()
+            self.assertEqual(message['body'], b': keepalive\n\n')
+            await self.inbox.put({'type': 'http.disconnect'})
+            await asyncio.wait_for(stream, 1)
+
+    async def test_stream_requires_login(self):
+        stream = self.start(stream_newsfeeds, STREAM_NEWSFEEDS_URL, login=False)
+        await asyncio.wait_for(stream, 1)
+        message = await self.receive()
+        self.assertEqual(message['status'], 403)
+        self.assertEqual(PubSub.subscriptions, {})
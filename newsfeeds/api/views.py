@@ -1,19 +1,62 @@
-from rest_framework import viewsets, status
+from functools import partial
+from likes.services import LikeService
+from rest_framework import viewsets
 from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.response import Response
-from newsfeeds.models import NewsFeed
 from newsfeeds.api.serializers import NewsFeedSerializer
+from newsfeeds.services import NewsFeedService
+from utils.decorators import query_budget
+from utils.paginations import EndlessPagination
+
+
+def paginate_newsfeeds(paginator, request):
+    cached_newsfeeds = NewsFeedService.get_cached_newsfeeds(request.user.id)
+    newsfeeds = paginator.paginate_cached_list(cached_newsfeeds, request)
+    # the page goes beyond the cached window, read it from the storage
+    if newsfeeds is None:
+        newsfeeds = paginator.paginate_by_cursors(
+            partial(NewsFeedService.get_newsfeeds, request.user.id),
+            request,
+        )
+    return newsfeeds
+
+
+def paginate_celebrity_tweets(paginator, request):
+    return paginator.paginate_queryset(
+        NewsFeedService.get_celebrity_tweets(request.user.id),
+        request,
+    )
+
+
+def serialize_newsfeeds_page(user, newsfeeds, tweets, page_size):
+    """
+    returns (data, has_more), the page of newsfeeds merged with the page of
+    celebrity tweets. both pages are read with the same cursor, so the
+    merged page stays in order, anything cut off here comes back with the
+    next cursor
+    """
+    newsfeeds = NewsFeedService.merge_celebrity_tweets(user.id, newsfeeds, tweets)
+    has_more = len(newsfeeds) > page_size
+    newsfeeds = NewsFeedService.hydrate_tweets(newsfeeds[:page_size])
+    LikeService.hydrate_likes(user, [newsfeed.tweet for newsfeed in newsfeeds])
+    return NewsFeedSerializer(newsfeeds, many=True).data, has_more
 
 
 class NewsFeedViewSet(viewsets.GenericViewSet):
     permission_classes = [IsAuthenticated]
+    pagination_class = EndlessPagination
 
-    def get_queryset(self):
-        return NewsFeed.objects.filter(user=self.request.user)
-
+    @query_budget(max_queries=7)
     def list(self, request):
-        serializer = NewsFeedSerializer(self.get_queryset(), many=True)
-        return Response({
-            'newsfeeds': serializer.data,
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        newsfeeds = paginate_newsfeeds(self.paginator, request)
+        has_next_page = self.paginator.has_next_page
+        tweets = paginate_celebrity_tweets(self.paginator, request)
+        has_next_page = has_next_page or self.paginator.has_next_page
+        data, has_more = serialize_newsfeeds_page(
+            request.user,
+            newsfeeds,
+            tweets,
+            self.paginator.page_size,
+        )
+        self.paginator.has_next_page = has_next_page or has_more
+        return self.paginator.get_paginated_response(data, key='newsfeeds')
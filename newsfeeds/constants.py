@@ -0,0 +1,30 @@
+from utils.time_constants import ONE_DAY
+
+# number of followers handled by one fanout batch task
+# each batch is inserted with a single bulk_create
+NEWSFEED_BATCH_SIZE = 1000
+# the users whose cached newsfeeds got a tweet are remembered this long, so
+# that a retried fanout batch does not push it twice, in seconds
+NEWSFEED_PUSHED_EXPIRE_TIME = ONE_DAY
+
+# number of the newest tweets of a followee merged into the newsfeed of a
+# new follower
+NEWSFEED_BACKFILL_SIZE = 20
+# number of tweets of an unfollowed user whose newsfeeds are deleted by one
+# cleanup batch, each batch is a task of its own
+NEWSFEED_CLEANUP_BATCH_SIZE = 500
+# celery rate limits per worker, so that a mass follow or unfollow does not
+# hold the newsfeeds tables
+NEWSFEED_BACKFILL_RATE_LIMIT = '20/s'
+NEWSFEED_CLEANUP_RATE_LIMIT = '20/s'
+
+# the channel of the new newsfeeds of a user, see utils.pubsub
+NEWSFEEDS_CHANNEL_PATTERN = 'newsfeeds:{user_id}'
+# at most this many new newsfeeds are sent per push or poll, a client which
+# missed more reloads the newsfeeds api
+NEWSFEED_PUSH_LIMIT = 20
+# the streams send a comment line when idle, so that the proxies keep them
+# open, in seconds
+NEWSFEED_STREAM_KEEPALIVE = 15
+# the longest a long-poll waits for new newsfeeds, in seconds
+NEWSFEED_POLL_TIMEOUT = 30
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from newsfeeds.models import NewsFeed
+from newsfeeds.storage import WideColumnNewsFeedStorage
+from tweets.services import TweetService
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the newsfeeds of every shard into the wide column table, '
+        'before MODEL_STORAGE_BACKENDS switches newsfeeds.NewsFeed to '
+        '"wide_column". Rows are overwritten, the copy can be run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='number of newsfeeds copied per batch',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for alias in settings.NEWSFEED_SHARDS:
+            if alias not in settings.DATABASES:
+                raise CommandError('unknown database "{}"'.format(alias))
+            total += self.copy_shard(alias, options['batch_size'])
+        self.stdout.write('{} newsfeeds copied'.format(total))
+
+    def copy_shard(self, alias, batch_size):
+        copied = 0
+        last_pk = None
+        while True:
+            queryset = NewsFeed.objects.using(alias).filter(
+                user_id__isnull=False,
+            ).order_by('pk')
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            batch = list(queryset[:batch_size])
+            if not batch:
+                return copied
+            last_pk = batch[-1].pk
+
+            # the row keys hold the created_at of the tweets, the newsfeeds
+            # of deleted tweets are skipped. the ids are kept
+            tweets = TweetService.get_tweets_through_cache(
+                list(set(newsfeed.tweet_id for newsfeed in batch)),
+            )
+            rows = [
+                (
+                    WideColumnNewsFeedStorage.get_row_key(
+                        newsfeed.user_id,
+                        tweets[newsfeed.tweet_id],
+                    ),
+                    {'id': newsfeed.id, 'tweet_id': newsfeed.tweet_id},
+                )
+                for newsfeed in batch
+                if newsfeed.tweet_id in tweets
+            ]
+            WideColumnNewsFeedStorage.get_table().put_many(rows)
+            copied += len(rows)
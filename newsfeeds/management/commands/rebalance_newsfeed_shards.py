@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from newsfeeds.models import NewsFeed
+from newsfeeds.services import NewsFeedService
+from newsfeeds.sharding import get_shard_alias
+
+
+class Command(BaseCommand):
+    help = (
+        'Move the newsfeeds which are not on the shard of their user, after '
+        'NEWSFEED_SHARDS changed. Rows are copied to their shard before they '
+        'are deleted, an interrupted run is resumed by running it again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='aliases',
+            nargs='+',
+            help='databases to scan, every alias of DATABASES by default',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='number of newsfeeds scanned per batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='only count the newsfeeds to move',
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or list(settings.DATABASES.keys())
+        for alias in aliases:
+            if alias not in settings.DATABASES:
+                raise CommandError('unknown database "{}"'.format(alias))
+
+        total = 0
+        for alias in aliases:
+            moved = self.rebalance_shard(
+                alias,
+                options['batch_size'],
+                options['dry_run'],
+            )
+            for target_alias, count in sorted(moved.items()):
+                self.stdout.write('{} newsfeeds {} from {} to {}'.format(
+                    count,
+                    'to move' if options['dry_run'] else 'moved',
+                    alias,
+                    target_alias,
+                ))
+                total += count
+        self.stdout.write('{} newsfeeds {} in total'.format(
+            total,
+            'to move' if options['dry_run'] else 'moved',
+        ))
+
+    def rebalance_shard(self, alias, batch_size, dry_run):
+        # returns {target_alias: newsfeeds_count}
+        moved = {}
+        last_pk = None
+        while True:
+            # walk the table by primary key range, no OFFSET is issued
+            queryset = NewsFeed.objects.using(alias).order_by('pk')
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            batch = list(queryset[:batch_size])
+            if not batch:
+                return moved
+            last_pk = batch[-1].pk
+
+            groups = {}
+            for newsfeed in batch:
+                if newsfeed.user_id is None:
+                    continue
+                target_alias = get_shard_alias(newsfeed.user_id)
+                if target_alias != alias:
+                    groups.setdefault(target_alias, []).append(newsfeed)
+            for target_alias, newsfeeds in groups.items():
+                if not dry_run:
+                    self.move_newsfeeds(newsfeeds, alias, target_alias)
+                moved[target_alias] = moved.get(target_alias, 0) + len(newsfeeds)
+
+    def move_newsfeeds(self, newsfeeds, alias, target_alias):
+        # the ids are unique across the shards and are kept. the rows copied
+        # by an interrupted run are ignored as conflicts
+        NewsFeed.objects.using(target_alias).bulk_create(
+            [
+                NewsFeed(
+                    id=newsfeed.id,
+                    user_id=newsfeed.user_id,
+                    tweet_id=newsfeed.tweet_id,
+                    created_at=newsfeed.created_at,
+                )
+                for newsfeed in newsfeeds
+            ],
+            ignore_conflicts=True,
+        )
+        NewsFeed.objects.using(alias).filter(
+            pk__in=[newsfeed.pk for newsfeed in newsfeeds],
+        ).delete()
+        # reload the cached lists from the new shard
+        for user_id in set(newsfeed.user_id for newsfeed in newsfeeds):
+            NewsFeedService.invalidate_cached_newsfeeds(user_id)
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tweets', '0003_tweet_comments_count'),
+        ('newsfeeds', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='newsfeed',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='newsfeed',
+            name='tweet',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='tweets.tweet'),
+        ),
+        migrations.AlterField(
+            model_name='newsfeed',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
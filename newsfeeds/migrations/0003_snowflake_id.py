@@ -0,0 +1,19 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:25
+
+from django.db import migrations, models
+import utils.snowflake
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsfeeds', '0002_shard_newsfeeds'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='newsfeed',
+            name='id',
+            field=models.BigIntegerField(default=utils.snowflake.generate_id, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
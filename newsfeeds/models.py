@@ -1,14 +1,48 @@
-from django.db import models
 from django.contrib.auth.models import User
+from django.db import models
+from django.db.models.signals import post_save
+from django.utils import timezone
+from newsfeeds.listeners import push_newsfeed_to_cache
 from tweets.models import Tweet
+from utils.snowflake import generate_id
+
+
+class NewsFeedQuerySet(models.QuerySet):
+
+    def create(self, **kwargs):
+        # a queryset has no instance for the router to pick the shard with,
+        # unless using() chose a database let save() route by the user
+        if self._db is not None:
+            return super(NewsFeedQuerySet, self).create(**kwargs)
+        newsfeed = self.model(**kwargs)
+        newsfeed.save(force_insert=True)
+        return newsfeed
 
 
 class NewsFeed(models.Model):
+    # time ordered and unique across the shards, see utils.snowflake
+    id = models.BigIntegerField(primary_key=True, default=generate_id, editable=False)
     # note that user is not the user posting Tweet
     # but the user who can see the Tweet
-    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
-    tweet = models.ForeignKey(Tweet, on_delete=models.SET_NULL, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # newsfeeds are sharded away from the users and tweets, so there is no
+    # database constraint and no cascade, readers skip deleted tweets
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        null=True,
+        db_constraint=False,
+    )
+    tweet = models.ForeignKey(
+        Tweet,
+        on_delete=models.DO_NOTHING,
+        null=True,
+        db_constraint=False,
+    )
+    # a default instead of auto_now_add, so that moving rows between shards
+    # keeps their created_at
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = NewsFeedQuerySet.as_manager()
 
     class Meta:
         index_together = (('user', 'created_at'),)
@@ -17,3 +51,7 @@ class NewsFeed(models.Model):
 
     def __str__(self):
         return f'{self.created_at} inbox of {self.user}: {self.tweet}'
+
+
+# bulk_create does not send post_save, fanout batches push to cache by hand
+post_save.connect(push_newsfeed_to_cache, sender=NewsFeed)
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from newsfeeds.sharding import get_shard_alias
+
+
+def is_newsfeed_model(model):
+    return model._meta.app_label == 'newsfeeds' and model._meta.model_name == 'newsfeed'
+
+
+class NewsFeedShardRouter:
+    """
+    NewsFeed rows are spread over the NEWSFEED_SHARDS aliases by user_id,
+    every other model lives on the default database, the extra databases
+    only hold the newsfeeds tables.
+    - saving a NewsFeed instance goes to the shard of its user
+    - querysets have no instance to route by, use NewsFeed.objects.using()
+      with the alias of newsfeeds.sharding.get_shard_alias(user_id)
+    """
+
+    def _db_for(self, model, **hints):
+        instance = hints.get('instance')
+        if is_newsfeed_model(model):
+            user_id = getattr(instance, 'user_id', None)
+            if user_id is not None:
+                return get_shard_alias(user_id)
+            return None
+        # the users and tweets of a newsfeed read from a shard are still
+        # on the default database
+        if instance is not None and is_newsfeed_model(instance.__class__):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # NewsFeed references users and tweets across databases, without
+        # database constraints
+        if is_newsfeed_model(obj1.__class__) or is_newsfeed_model(obj2.__class__):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db in settings.DATABASE_REPLICAS:
+            return None
+        # the extra databases are newsfeed shards, whether they are in
+        # NEWSFEED_SHARDS yet or still being drained by the rebalancing
+        return app_label == 'newsfeeds'
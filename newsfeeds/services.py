@@ -1,13 +1,260 @@
+from accounts.services import UserService
+from django.conf import settings
+from django.db import transaction
 from friendships.services import FriendshipService
+from newsfeeds.constants import (
+    NEWSFEED_BACKFILL_SIZE,
+    NEWSFEED_CLEANUP_BATCH_SIZE,
+    NEWSFEED_PUSH_LIMIT,
+    NEWSFEED_PUSHED_EXPIRE_TIME,
+    NEWSFEEDS_CHANNEL_PATTERN,
+)
 from newsfeeds.models import NewsFeed
+from newsfeeds.storage import get_newsfeed_storage
+from newsfeeds.tasks import (
+    backfill_newsfeeds_task,
+    cleanup_newsfeeds_task,
+    fanout_newsfeeds_main_task,
+)
+from tweets.models import Tweet
+from tweets.services import TweetService
+from twitter.cache import NEWSFEED_PUSHED_PATTERN, USER_NEWSFEEDS_PATTERN
+from utils.pubsub import PubSub
+from utils.redis_helper import RedisHelper
+
 
 class NewsFeedService(object):
 
     @classmethod
     def fanout_to_followers(cls, tweet):
+        # only one job is enqueued during the request, the followers are
+        # split into batches and inserted by the celery workers
+        fanout_newsfeeds_main_task.delay(tweet.id, tweet.user_id)
+
+    @classmethod
+    def backfill_newsfeeds_on_follow(cls, user_id, followee_ids):
+        # enqueue once the friendships are committed, so that the workers
+        # see them
+        for followee_id in followee_ids:
+            transaction.on_commit(
+                lambda followee_id=followee_id:
+                    backfill_newsfeeds_task.delay(user_id, followee_id),
+            )
+
+    @classmethod
+    def cleanup_newsfeeds_on_unfollow(cls, user_id, followee_ids):
+        for followee_id in followee_ids:
+            transaction.on_commit(
+                lambda followee_id=followee_id:
+                    cleanup_newsfeeds_task.delay(user_id, followee_id),
+            )
+
+    @classmethod
+    def backfill_newsfeeds(cls, user_id, followee_id):
+        """
+        merge the newest tweets of a followee into the newsfeeds of a new
+        follower, read over the (user, created_at) index of Tweet. rerunning
+        it changes nothing, returns the number of tweets merged
+        """
+        # unfollowed meanwhile, or the tweets are pulled from a celebrity
+        if followee_id not in FriendshipService.get_following_ids(user_id):
+            return 0
+        if cls.get_celebrity_ids([followee_id]):
+            return 0
+        tweets = list(
+            Tweet.objects.filter(user_id=followee_id)
+            .order_by('-created_at')
+            .only('id', 'created_at')[:NEWSFEED_BACKFILL_SIZE]
+        )
+        if not tweets:
+            return 0
+        get_newsfeed_storage().add_tweets(user_id, tweets)
+        # the tweets land in the middle of the cached list, reload it
+        cls.invalidate_cached_newsfeeds(user_id)
+        return len(tweets)
+
+    @classmethod
+    def cleanup_newsfeeds(cls, user_id, followee_id, before_id=None):
+        """
+        delete the newsfeeds of one batch of the tweets of an unfollowed user
+        with an id below before_id, newest first. returns the cursor of the
+        next batch, None once every tweet is done. the snowflake ids are
+        unique, unlike created_at a batch never ends in the middle of the
+        tweets of a timestamp
+        """
+        # followed again meanwhile, keep the newsfeeds
+        if followee_id in FriendshipService.get_following_ids(user_id):
+            return None
+        tweets = Tweet.objects.filter(user_id=followee_id)
+        if before_id is not None:
+            tweets = tweets.filter(id__lt=before_id)
+        tweets = list(
+            tweets.order_by('-id')
+            .only('id', 'created_at')[:NEWSFEED_CLEANUP_BATCH_SIZE]
+        )
+        if not tweets:
+            return None
+        get_newsfeed_storage().remove_tweets(user_id, tweets)
+        cls.invalidate_cached_newsfeeds(user_id)
+        if len(tweets) < NEWSFEED_CLEANUP_BATCH_SIZE:
+            return None
+        return tweets[-1].id
+
+    @classmethod
+    def get_newsfeeds(cls, user_id, created_before=None, created_after=None):
+        # a lazy newest first sequence from the storage of NewsFeed, which
+        # can be sliced like a queryset
+        return get_newsfeed_storage().get_newsfeeds(
+            user_id,
+            created_before=created_before,
+            created_after=created_after,
+        )
+
+    @classmethod
+    def create_newsfeeds(cls, tweet_id, user_ids):
+        # idempotent, a retried batch does not duplicate the newsfeeds
+        get_newsfeed_storage().create_newsfeeds(tweet_id, user_ids)
+
+    @classmethod
+    def get_cached_newsfeeds(cls, user_id):
+        key = USER_NEWSFEEDS_PATTERN.format(user_id=user_id)
+        return RedisHelper.load_objects(key, cls.get_newsfeeds(user_id))
+
+    @classmethod
+    def invalidate_cached_newsfeeds(cls, user_id):
+        key = USER_NEWSFEEDS_PATTERN.format(user_id=user_id)
+        RedisHelper.invalidate_key(key)
+
+    @classmethod
+    def push_newsfeed_to_cache(cls, newsfeed):
+        key = USER_NEWSFEEDS_PATTERN.format(user_id=newsfeed.user_id)
+        RedisHelper.push_object(key, newsfeed)
+
+    @classmethod
+    def push_tweet_to_cached_newsfeeds(cls, tweet_id, user_ids):
+        """
+        the batch inserts send no post_save, load back the newsfeeds of the
+        users whose lists are cached. idempotent, a retried batch skips the
+        users handled by the first try
+        """
+        keys = [
+            USER_NEWSFEEDS_PATTERN.format(user_id=user_id)
+            for user_id in user_ids
+        ]
+        cached_keys = set(RedisHelper.filter_cached_keys(keys))
+        cached_user_ids = [
+            user_id
+            for user_id, key in zip(user_ids, keys)
+            if key in cached_keys
+        ]
+        newsfeeds = []
+        if cached_user_ids:
+            newsfeeds = get_newsfeed_storage().get_tweet_newsfeeds(
+                tweet_id,
+                cached_user_ids,
+            )
+        # the lists which are not cached load the tweet on their next read,
+        # they are done too
+        newsfeeds_by_key = dict.fromkeys(keys)
+        for newsfeed in newsfeeds:
+            key = USER_NEWSFEEDS_PATTERN.format(user_id=newsfeed.user_id)
+            newsfeeds_by_key[key] = newsfeed
+        RedisHelper.push_objects_once(
+            NEWSFEED_PUSHED_PATTERN.format(tweet_id=tweet_id),
+            newsfeeds_by_key,
+            NEWSFEED_PUSHED_EXPIRE_TIME,
+        )
+
+    @classmethod
+    def publish_new_newsfeeds(cls, tweet_id, user_ids):
+        # tell the streaming clients of the users to read their new
+        # newsfeeds, the message carries no newsfeed so that a lost or
+        # coalesced message is caught up by the next read
+        PubSub.publish_many(
+            [NEWSFEEDS_CHANNEL_PATTERN.format(user_id=user_id) for user_id in user_ids],
+            {'tweet_id': tweet_id},
+        )
+
+    @classmethod
+    def get_newsfeeds_since(cls, user_id, since):
+        """
+        returns (newsfeeds, has_more), the NEWSFEED_PUSH_LIMIT newest
+        newsfeeds created after since, newest first. they are read from the
+        cached list, the storage is only read when every cached newsfeed is
+        newer than since
+        """
+        cached_newsfeeds = cls.get_cached_newsfeeds(user_id)
+        newsfeeds = [
+            newsfeed
+            for newsfeed in cached_newsfeeds
+            if newsfeed.created_at > since
+        ]
+        if len(cached_newsfeeds) >= settings.REDIS_LIST_LENGTH_LIMIT and \
+                len(newsfeeds) == len(cached_newsfeeds):
+            newsfeeds = list(
+                cls.get_newsfeeds(user_id, created_after=since)[:NEWSFEED_PUSH_LIMIT + 1]
+            )
+        has_more = len(newsfeeds) > NEWSFEED_PUSH_LIMIT
+        return newsfeeds[:NEWSFEED_PUSH_LIMIT], has_more
+
+    @classmethod
+    def get_celebrity_ids(cls, user_ids):
+        followers_counts = FriendshipService.get_followers_counts(user_ids)
+        return [
+            user_id
+            for user_id in user_ids
+            if followers_counts[user_id] > settings.CELEBRITY_FOLLOWERS_THRESHOLD
+        ]
+
+    @classmethod
+    def get_celebrity_tweets(cls, user_id):
+        # tweets of the celebrities are not fanned out, so the followers
+        # pull them over the (user, created_at) index of Tweet instead
+        following_ids = FriendshipService.get_following_ids(user_id)
+        celebrity_ids = cls.get_celebrity_ids(following_ids)
+        return Tweet.objects.filter(user_id__in=celebrity_ids)
+
+    @classmethod
+    def merge_celebrity_tweets(cls, user_id, newsfeeds, tweets):
+        """
+        merge the pulled tweets into the newsfeeds, newest first. a tweet may
+        have been pushed before its author became a celebrity, keep the pushed
+        newsfeed in that case. pulled tweets are wrapped in unsaved newsfeeds.
+        """
+        tweet_ids = set(newsfeed.tweet_id for newsfeed in newsfeeds)
+        merged_newsfeeds = list(newsfeeds)
+        for tweet in tweets:
+            if tweet.id in tweet_ids:
+                continue
+            merged_newsfeeds.append(NewsFeed(
+                id=None,
+                user_id=user_id,
+                tweet=tweet,
+                created_at=tweet.created_at,
+            ))
+        merged_newsfeeds.sort(key=lambda newsfeed: newsfeed.created_at, reverse=True)
+        return merged_newsfeeds
+
+    @classmethod
+    def hydrate_tweets(cls, newsfeeds):
+        """
+        load the tweets of a page of newsfeeds and their users in one batch
+        each, so that the query count does not grow with the page size
+        """
+        missing_tweet_ids = [
+            newsfeed.tweet_id
+            for newsfeed in newsfeeds
+            if not NewsFeed.tweet.is_cached(newsfeed)
+        ]
+        tweets = TweetService.get_tweets_through_cache(missing_tweet_ids)
+        for newsfeed in newsfeeds:
+            if newsfeed.tweet_id in tweets:
+                newsfeed.tweet = tweets[newsfeed.tweet_id]
+        # there is no cascade across the shards, skip the deleted tweets
         newsfeeds = [
-            NewsFeed(user=follower, tweet=tweet)
-            for follower in FriendshipService.get_followers(tweet.user)
+            newsfeed
+            for newsfeed in newsfeeds
+            if NewsFeed.tweet.is_cached(newsfeed) and newsfeed.tweet is not None
         ]
-        newsfeeds.append(NewsFeed(user=tweet.user, tweet=tweet))
-        NewsFeed.objects.bulk_create(newsfeeds)
+        UserService.hydrate_users([newsfeed.tweet for newsfeed in newsfeeds])
+        return newsfeeds
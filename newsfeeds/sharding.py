@@ -0,0 +1,21 @@
+from django.conf import settings
+from utils.sharding import jump_consistent_hash
+
+
+def get_shard_aliases():
+    return list(settings.NEWSFEED_SHARDS)
+
+
+def get_shard_alias(user_id):
+    # all the newsfeeds of a user live on one shard, so that a newsfeed
+    # page is read from a single database
+    aliases = get_shard_aliases()
+    return aliases[jump_consistent_hash(int(user_id), len(aliases))]
+
+
+def group_by_shard(user_ids):
+    # returns {alias: [user_id]}, the order of user_ids is kept
+    groups = {}
+    for user_id in user_ids:
+        groups.setdefault(get_shard_alias(user_id), []).append(user_id)
+    return groups
@@ -0,0 +1,174 @@
+from newsfeeds.models import NewsFeed
+from newsfeeds.sharding import get_shard_alias, group_by_shard
+from tweets.services import TweetService
+from utils.storage import WIDE_COLUMN, get_storage_backend
+from utils.wide_column import (
+    Scan,
+    WideColumnClient,
+    from_reverse_timestamp,
+    make_row_key,
+    parse_row_key,
+    reverse_timestamp,
+)
+from utils.snowflake import generate_id
+
+
+class RelationalNewsFeedStorage(object):
+    """
+    NewsFeed rows in the sharded relational databases, read through the
+    (user, created_at) index of the shard of the user
+    """
+
+    @classmethod
+    def get_newsfeeds(cls, user_id, created_before=None, created_after=None):
+        # a lazy newest first queryset, slice it to read a page
+        alias = get_shard_alias(user_id)
+        queryset = NewsFeed.objects.using(alias).filter(user_id=user_id)
+        if created_before is not None:
+            queryset = queryset.filter(created_at__lt=created_before)
+        if created_after is not None:
+            queryset = queryset.filter(created_at__gt=created_after)
+        return queryset.order_by('-created_at')
+
+    @classmethod
+    def create_newsfeeds(cls, tweet_id, user_ids):
+        # one bulk insert per shard. (user, tweet) is unique, ignore conflicts
+        # so that a retried batch does not fail on the rows it inserted before
+        for alias, shard_user_ids in group_by_shard(user_ids).items():
+            NewsFeed.objects.using(alias).bulk_create(
+                [
+                    NewsFeed(user_id=user_id, tweet_id=tweet_id)
+                    for user_id in shard_user_ids
+                ],
+                ignore_conflicts=True,
+            )
+
+    @classmethod
+    def add_tweets(cls, user_id, tweets):
+        # the newsfeeds of older tweets take the created_at of the tweets,
+        # so that they are merged in order. existing rows are ignored
+        NewsFeed.objects.using(get_shard_alias(user_id)).bulk_create(
+            [
+                NewsFeed(user_id=user_id, tweet_id=tweet.id, created_at=tweet.created_at)
+                for tweet in tweets
+            ],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def remove_tweets(cls, user_id, tweets):
+        NewsFeed.objects.using(get_shard_alias(user_id)).filter(
+            user_id=user_id,
+            tweet_id__in=[tweet.id for tweet in tweets],
+        ).delete()
+
+    @classmethod
+    def get_tweet_newsfeeds(cls, tweet_id, user_ids):
+        # a retried batch ignores the rows which exist already, the ids of
+        # those rows are not the ids generated for the batch, load them back
+        newsfeeds = []
+        for alias, shard_user_ids in group_by_shard(user_ids).items():
+            newsfeeds.extend(NewsFeed.objects.using(alias).filter(
+                tweet_id=tweet_id,
+                user_id__in=shard_user_ids,
+            ))
+        return newsfeeds
+
+
+class WideColumnNewsFeedStorage(object):
+    """
+    newsfeeds in the wide column table 'newsfeeds', the row key is
+    user_id + reversed created_at + tweet_id so that the newsfeeds of a user
+    are one newest first range. a newsfeed takes the created_at of its tweet,
+    which makes a retried fanout find the same rows and skip them. the id is
+    kept in the columns, the rows are returned as unsaved NewsFeed objects.
+    """
+    TABLE_NAME = 'newsfeeds'
+
+    @classmethod
+    def get_table(cls):
+        return WideColumnClient.get_table(cls.TABLE_NAME)
+
+    @classmethod
+    def get_row_key(cls, user_id, tweet):
+        return make_row_key(user_id, reverse_timestamp(tweet.created_at), tweet.id)
+
+    @classmethod
+    def to_newsfeed(cls, row_key, columns):
+        user_id, reversed_created_at, tweet_id = parse_row_key(row_key)
+        return NewsFeed(
+            id=columns.get('id'),
+            user_id=user_id,
+            tweet_id=tweet_id,
+            created_at=from_reverse_timestamp(reversed_created_at),
+        )
+
+    @classmethod
+    def get_newsfeeds(cls, user_id, created_before=None, created_after=None):
+        # a lazy newest first scan, slice it to read a page
+        user_id = int(user_id)
+        row_start = make_row_key(user_id)
+        row_stop = make_row_key(user_id + 1)
+        if created_before is not None:
+            row_start = make_row_key(user_id, reverse_timestamp(created_before) + 1)
+        if created_after is not None:
+            row_stop = make_row_key(user_id, reverse_timestamp(created_after))
+        return Scan(cls.get_table(), row_start, row_stop, cls.to_newsfeed)
+
+    @classmethod
+    def create_newsfeeds(cls, tweet_id, user_ids):
+        tweet = TweetService.get_tweet_through_cache(tweet_id)
+        if tweet is None:
+            return
+        cls.put_newsfeeds(tweet, user_ids)
+
+    @classmethod
+    def put_missing_rows(cls, row_keys, tweet_ids):
+        # existing rows keep their ids, an id is only generated for the rows
+        # which are written
+        existing_row_keys = cls.get_table().rows(row_keys).keys()
+        cls.get_table().put_many([
+            (row_key, {'id': generate_id(), 'tweet_id': tweet_id})
+            for row_key, tweet_id in zip(row_keys, tweet_ids)
+            if row_key not in existing_row_keys
+        ])
+
+    @classmethod
+    def put_newsfeeds(cls, tweet, user_ids):
+        cls.put_missing_rows(
+            [cls.get_row_key(user_id, tweet) for user_id in user_ids],
+            [tweet.id] * len(user_ids),
+        )
+
+    @classmethod
+    def add_tweets(cls, user_id, tweets):
+        cls.put_missing_rows(
+            [cls.get_row_key(user_id, tweet) for tweet in tweets],
+            [tweet.id for tweet in tweets],
+        )
+
+    @classmethod
+    def remove_tweets(cls, user_id, tweets):
+        cls.get_table().delete_many([
+            cls.get_row_key(user_id, tweet)
+            for tweet in tweets
+        ])
+
+    @classmethod
+    def get_tweet_newsfeeds(cls, tweet_id, user_ids):
+        tweet = TweetService.get_tweet_through_cache(tweet_id)
+        if tweet is None:
+            return []
+        row_keys = [cls.get_row_key(user_id, tweet) for user_id in user_ids]
+        rows = cls.get_table().rows(row_keys)
+        return [
+            cls.to_newsfeed(row_key, rows[row_key])
+            for row_key in row_keys
+            if row_key in rows
+        ]
+
+
+def get_newsfeed_storage():
+    if get_storage_backend('newsfeeds.NewsFeed') == WIDE_COLUMN:
+        return WideColumnNewsFeedStorage
+    return RelationalNewsFeedStorage
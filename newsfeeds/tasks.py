@@ -0,0 +1,91 @@
+from celery import shared_task
+from friendships.services import FriendshipService
+from newsfeeds.constants import (
+    NEWSFEED_BACKFILL_RATE_LIMIT,
+    NEWSFEED_BATCH_SIZE,
+    NEWSFEED_CLEANUP_RATE_LIMIT,
+)
+from newsfeeds.sharding import group_by_shard
+from utils.time_constants import ONE_HOUR
+
+
+@shared_task(
+    time_limit=ONE_HOUR,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+)
+def fanout_newsfeeds_batch_task(tweet_id, follower_ids):
+    # import inside the task to avoid the circular import with services
+    from newsfeeds.services import NewsFeedService
+
+    NewsFeedService.create_newsfeeds(tweet_id, follower_ids)
+    NewsFeedService.push_tweet_to_cached_newsfeeds(tweet_id, follower_ids)
+    NewsFeedService.publish_new_newsfeeds(tweet_id, follower_ids)
+    return '{} newsfeeds created'.format(len(follower_ids))
+
+
+@shared_task(time_limit=ONE_HOUR)
+def fanout_newsfeeds_main_task(tweet_id, tweet_user_id):
+    # import inside the task to avoid the circular import with services
+    from newsfeeds.services import NewsFeedService
+
+    # create the newsfeed of the author first, so they see the tweet asap
+    NewsFeedService.create_newsfeeds(tweet_id, [tweet_user_id])
+    NewsFeedService.push_tweet_to_cached_newsfeeds(tweet_id, [tweet_user_id])
+    NewsFeedService.publish_new_newsfeeds(tweet_id, [tweet_user_id])
+
+    # the followers of a celebrity pull the tweet when reading newsfeeds
+    if NewsFeedService.get_celebrity_ids([tweet_user_id]):
+        return 'fanout skipped, the followers of {} pull the tweet.'.format(
+            tweet_user_id,
+        )
+
+    # split the sorted follower ids of each shard into id ranges of
+    # NEWSFEED_BATCH_SIZE, one batch task inserts each range into its shard,
+    # no User object is ever loaded
+    follower_ids = sorted(FriendshipService.get_follower_ids(tweet_user_id))
+    batches_count = 0
+    for shard_follower_ids in group_by_shard(follower_ids).values():
+        for index in range(0, len(shard_follower_ids), NEWSFEED_BATCH_SIZE):
+            batch_ids = shard_follower_ids[index:index + NEWSFEED_BATCH_SIZE]
+            fanout_newsfeeds_batch_task.delay(tweet_id, batch_ids)
+            batches_count += 1
+
+    return '{} newsfeeds going to fanout, {} batches created.'.format(
+        len(follower_ids),
+        batches_count,
+    )
+
+
+@shared_task(
+    time_limit=ONE_HOUR,
+    rate_limit=NEWSFEED_BACKFILL_RATE_LIMIT,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+)
+def backfill_newsfeeds_task(user_id, followee_id):
+    from newsfeeds.services import NewsFeedService
+
+    newsfeeds_count = NewsFeedService.backfill_newsfeeds(user_id, followee_id)
+    return '{} newsfeeds backfilled'.format(newsfeeds_count)
+
+
+@shared_task(
+    time_limit=ONE_HOUR,
+    rate_limit=NEWSFEED_CLEANUP_RATE_LIMIT,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+)
+def cleanup_newsfeeds_task(user_id, followee_id, before_id=None):
+    from newsfeeds.services import NewsFeedService
+
+    # one bounded batch per task, the next batch is enqueued with the id of
+    # the oldest tweet of this one as its cursor
+    cursor = NewsFeedService.cleanup_newsfeeds(user_id, followee_id, before_id)
+    if cursor is None:
+        return 'newsfeeds of {} cleaned up'.format(followee_id)
+    cleanup_newsfeeds_task.delay(user_id, followee_id, cursor)
+    return 'newsfeeds of {} cleaned up before tweet {}'.format(followee_id, cursor)
@@ -0,0 +1,586 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from io import StringIO
+from friendships.models import Friendship
+from friendships.services import FriendshipService
+from newsfeeds.constants import NEWSFEEDS_CHANNEL_PATTERN
+from newsfeeds.models import NewsFeed
+from newsfeeds.services import NewsFeedService
+from newsfeeds.sharding import get_shard_alias, group_by_shard
+from newsfeeds.tasks import (
+    backfill_newsfeeds_task,
+    cleanup_newsfeeds_task,
+    fanout_newsfeeds_batch_task,
+    fanout_newsfeeds_main_task,
+)
+from testing.testcases import TestCase
+from tweets.models import Tweet
+from twitter.cache import USER_NEWSFEEDS_PATTERN
+from unittest import mock
+from utils.pubsub import PubSub
+from utils.redis_client import RedisClient
+from utils.sharding import jump_consistent_hash
+
+
+class NewsFeedTaskTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.trump = self.create_user('trump')
+
+    def test_fanout_main_task(self):
+        # no follower: only the author receives the newsfeed
+        tweet = self.create_tweet(self.alfredo, 'tweet 1')
+        msg = fanout_newsfeeds_main_task(tweet.id, self.alfredo.id)
+        self.assertEqual(msg, '0 newsfeeds going to fanout, 0 batches created.')
+        self.assertEqual(NewsFeed.objects.filter(tweet=tweet).count(), 1)
+
+        # followers are fanned out in batches
+        self.create_friendship(self.trump, self.alfredo)
+        for i in range(4):
+            user = self.create_user('follower{}'.format(i))
+            self.create_friendship(user, self.alfredo)
+        tweet = self.create_tweet(self.alfredo, 'tweet 2')
+        with mock.patch('newsfeeds.tasks.NEWSFEED_BATCH_SIZE', 2):
+            msg = fanout_newsfeeds_main_task(tweet.id, self.alfredo.id)
+        self.assertEqual(msg, '5 newsfeeds going to fanout, 3 batches created.')
+        self.assertEqual(NewsFeed.objects.filter(tweet=tweet).count(), 6)
+        self.assertEqual(
+            NewsFeed.objects.filter(user=self.trump, tweet=tweet).exists(),
+            True,
+        )
+
+        # the followers of other users are not affected
+        tweet = self.create_tweet(self.trump, 'tweet 3')
+        msg = fanout_newsfeeds_main_task(tweet.id, self.trump.id)
+        self.assertEqual(msg, '0 newsfeeds going to fanout, 0 batches created.')
+        self.assertEqual(NewsFeed.objects.filter(tweet=tweet).count(), 1)
+
+    def test_fanout_batch_task_is_idempotent(self):
+        tweet = self.create_tweet(self.alfredo)
+        self.create_newsfeed(self.trump, tweet)
+        # a retried batch may contain rows which were already inserted
+        msg = fanout_newsfeeds_batch_task(tweet.id, [self.trump.id])
+        self.assertEqual(msg, '1 newsfeeds created')
+        self.assertEqual(NewsFeed.objects.filter(tweet=tweet).count(), 1)
+
+    def test_fanout_batch_task_retry(self):
+        tweet = self.create_tweet(self.alfredo)
+        create_newsfeeds = NewsFeedService.create_newsfeeds
+        calls = []
+
+        def flaky_create_newsfeeds(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError('database went away')
+            return create_newsfeeds(*args, **kwargs)
+
+        with mock.patch.object(
+            NewsFeedService,
+            'create_newsfeeds',
+            side_effect=flaky_create_newsfeeds,
+        ):
+            # workers retry failed batches, apply() emulates it in process
+            fanout_newsfeeds_batch_task.apply(
+                args=(tweet.id, [self.trump.id]),
+                throw=False,
+            )
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(
+            NewsFeed.objects.filter(user=self.trump, tweet=tweet).exists(),
+            True,
+        )
+
+    def run_on_commit(self):
+        # TestCase never commits, run the on_commit callbacks right away
+        return mock.patch(
+            'newsfeeds.services.transaction.on_commit',
+            side_effect=lambda func: func(),
+        )
+
+    def test_backfill_on_follow(self):
+        tweets = [self.create_tweet(self.alfredo) for _ in range(3)]
+        with self.run_on_commit():
+            self.create_friendship(self.trump, self.alfredo)
+        newsfeeds = NewsFeedService.get_newsfeeds(self.trump.id)
+        self.assertEqual(
+            [(f.tweet_id, f.created_at) for f in newsfeeds],
+            [(t.id, t.created_at) for t in reversed(tweets)],
+        )
+
+        # only the newest tweets are merged, rerunning changes nothing
+        with mock.patch('newsfeeds.services.NEWSFEED_BACKFILL_SIZE', 2):
+            msg = backfill_newsfeeds_task(self.trump.id, self.alfredo.id)
+        self.assertEqual(msg, '2 newsfeeds backfilled')
+        self.assertEqual(NewsFeed.objects.filter(user=self.trump).count(), 3)
+
+        # the followers of a celebrity pull the tweets instead, users who
+        # unfollowed meanwhile are skipped
+        with override_settings(CELEBRITY_FOLLOWERS_THRESHOLD=0):
+            msg = backfill_newsfeeds_task(self.trump.id, self.alfredo.id)
+        self.assertEqual(msg, '0 newsfeeds backfilled')
+        msg = backfill_newsfeeds_task(self.alfredo.id, self.trump.id)
+        self.assertEqual(msg, '0 newsfeeds backfilled')
+
+    def test_cleanup_on_unfollow(self):
+        self.create_friendship(self.trump, self.alfredo)
+        tweets = [self.create_tweet(self.alfredo) for _ in range(5)]
+        # the batches do not skip the tweets of the same timestamp
+        Tweet.objects.filter(user=self.alfredo).update(created_at=tweets[0].created_at)
+        other_tweet = self.create_tweet(self.create_user('other'))
+        for tweet in tweets + [other_tweet]:
+            self.create_newsfeed(self.trump, tweet)
+        # a cached list is reloaded after the cleanup
+        NewsFeedService.get_cached_newsfeeds(self.trump.id)
+
+        # the tweets are deleted in batches, each task enqueues the next
+        with self.run_on_commit(), \
+                mock.patch('newsfeeds.services.NEWSFEED_CLEANUP_BATCH_SIZE', 2), \
+                mock.patch.object(
+                    cleanup_newsfeeds_task,
+                    'delay',
+                    wraps=cleanup_newsfeeds_task.delay,
+                ) as delay:
+            Friendship.objects.filter(from_user=self.trump, to_user=self.alfredo).delete()
+        self.assertEqual(delay.call_count, 3)
+        self.assertEqual(
+            [f.tweet_id for f in NewsFeedService.get_cached_newsfeeds(self.trump.id)],
+            [other_tweet.id],
+        )
+
+        # a user followed again keeps the newsfeeds
+        self.create_friendship(self.trump, self.alfredo)
+        self.create_newsfeed(self.trump, tweets[0])
+        cleanup_newsfeeds_task(self.trump.id, self.alfredo.id)
+        self.assertEqual(
+            NewsFeed.objects.filter(user=self.trump, tweet=tweets[0]).exists(),
+            True,
+        )
+
+    def test_bulk_follow_and_unfollow(self):
+        users = [self.create_user('user{}'.format(i)) for i in range(3)]
+        tweets = [self.create_tweet(user) for user in users]
+        user_ids = [user.id for user in users]
+        with self.run_on_commit():
+            FriendshipService.bulk_follow(self.trump.id, user_ids)
+            self.assertSetEqual(
+                set(f.tweet_id for f in NewsFeedService.get_newsfeeds(self.trump.id)),
+                set(tweet.id for tweet in tweets),
+            )
+            FriendshipService.bulk_unfollow(self.trump.id, user_ids[:2])
+            self.assertEqual(
+                [f.tweet_id for f in NewsFeedService.get_newsfeeds(self.trump.id)],
+                [tweets[2].id],
+            )
+
+
+class NewsFeedServiceTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.trump = self.create_user('trump')
+
+    def test_get_cached_newsfeeds(self):
+        newsfeed_ids = []
+        for i in range(3):
+            tweet = self.create_tweet(self.trump)
+            newsfeed = self.create_newsfeed(self.alfredo, tweet)
+            newsfeed_ids.append(newsfeed.id)
+        newsfeed_ids = newsfeed_ids[::-1]
+
+        # cache miss
+        newsfeeds = NewsFeedService.get_cached_newsfeeds(self.alfredo.id)
+        self.assertEqual([f.id for f in newsfeeds], newsfeed_ids)
+
+        # cache hit
+        newsfeeds = NewsFeedService.get_cached_newsfeeds(self.alfredo.id)
+        self.assertEqual([f.id for f in newsfeeds], newsfeed_ids)
+
+        # cache updated
+        tweet = self.create_tweet(self.alfredo)
+        new_newsfeed = self.create_newsfeed(self.alfredo, tweet)
+        newsfeeds = NewsFeedService.get_cached_newsfeeds(self.alfredo.id)
+        newsfeed_ids.insert(0, new_newsfeed.id)
+        self.assertEqual([f.id for f in newsfeeds], newsfeed_ids)
+
+    def test_push_newsfeed_to_cache_is_lazy(self):
+        key = USER_NEWSFEEDS_PATTERN.format(user_id=self.alfredo.id)
+        conn = RedisClient.get_connection()
+
+        # the list is not created by a push, it is loaded on the first read
+        tweet = self.create_tweet(self.trump)
+        newsfeed = self.create_newsfeed(self.alfredo, tweet)
+        self.assertEqual(conn.exists(key), False)
+        newsfeeds = NewsFeedService.get_cached_newsfeeds(self.alfredo.id)
+        self.assertEqual([f.id for f in newsfeeds], [newsfeed.id])
+        self.assertEqual(conn.llen(key), 1)
+
+    def test_cached_newsfeeds_are_capped(self):
+        for i in range(settings.REDIS_LIST_LENGTH_LIMIT + 2):
+            tweet = self.create_tweet(self.trump)
+            self.create_newsfeed(self.alfredo, tweet)
+        key = USER_NEWSFEEDS_PATTERN.format(user_id=self.alfredo.id)
+        conn = RedisClient.get_connection()
+
+        newsfeeds = NewsFeedService.get_cached_newsfeeds(self.alfredo.id)
+        self.assertEqual(len(newsfeeds), settings.REDIS_LIST_LENGTH_LIMIT)
+        tweet = self.create_tweet(self.trump)
+        newsfeed = self.create_newsfeed(self.alfredo, tweet)
+        self.assertEqual(conn.llen(key), settings.REDIS_LIST_LENGTH_LIMIT)
+        newsfeeds = NewsFeedService.get_cached_newsfeeds(self.alfredo.id)
+        self.assertEqual(newsfeeds[0].id, newsfeed.id)
+
+    def test_fanout_pushes_to_cached_newsfeeds(self):
+        self.create_friendship(self.trump, self.alfredo)
+        # only trump has a cached newsfeed list
+        NewsFeedService.get_cached_newsfeeds(self.trump.id)
+        tweet = self.create_tweet(self.alfredo)
+        fanout_newsfeeds_main_task(tweet.id, self.alfredo.id)
+
+        newsfeeds = NewsFeedService.get_cached_newsfeeds(self.trump.id)
+        self.assertEqual(len(newsfeeds), 1)
+        self.assertEqual(newsfeeds[0].tweet_id, tweet.id)
+        self.assertEqual(
+            newsfeeds[0].id,
+            NewsFeed.objects.get(user=self.trump, tweet=tweet).id,
+        )
+        newsfeeds = NewsFeedService.get_cached_newsfeeds(self.alfredo.id)
+        self.assertEqual([f.tweet_id for f in newsfeeds], [tweet.id])
+
+    def test_retried_fanout_batch_pushes_once(self):
+        lisa = self.create_user('lisa')
+        NewsFeedService.get_cached_newsfeeds(self.trump.id)
+        tweet = self.create_tweet(self.alfredo)
+        # the batch failed once its newsfeeds were pushed
+        with mock.patch.object(
+            NewsFeedService,
+            'publish_new_newsfeeds',
+            side_effect=Exception('redis is down'),
+        ), self.assertRaises(Exception):
+            fanout_newsfeeds_batch_task.run(tweet.id, [self.trump.id, lisa.id])
+        # the newsfeeds of lisa are loaded before the retry
+        NewsFeedService.get_cached_newsfeeds(lisa.id)
+
+        fanout_newsfeeds_batch_task.run(tweet.id, [self.trump.id, lisa.id])
+        for user in [self.trump, lisa]:
+            newsfeeds = NewsFeedService.get_cached_newsfeeds(user.id)
+            self.assertEqual([f.tweet_id for f in newsfeeds], [tweet.id])
+
+    @override_settings(CELEBRITY_FOLLOWERS_THRESHOLD=1)
+    def test_fanout_skips_celebrity(self):
+        self.create_friendship(self.trump, self.alfredo)
+        tweet = self.create_tweet(self.alfredo)
+        msg = fanout_newsfeeds_main_task(tweet.id, self.alfredo.id)
+        self.assertEqual(msg, '1 newsfeeds going to fanout, 1 batches created.')
+
+        # alfredo becomes a celebrity, only the author receives the newsfeed
+        user = self.create_user('follower')
+        self.create_friendship(user, self.alfredo)
+        tweet = self.create_tweet(self.alfredo)
+        msg = fanout_newsfeeds_main_task(tweet.id, self.alfredo.id)
+        self.assertEqual(
+            msg,
+            'fanout skipped, the followers of {} pull the tweet.'.format(
+                self.alfredo.id,
+            ),
+        )
+        self.assertEqual(NewsFeed.objects.filter(tweet=tweet).count(), 1)
+        self.assertEqual(
+            NewsFeed.objects.filter(user=self.alfredo, tweet=tweet).exists(),
+            True,
+        )
+
+        # the followers count is refreshed on unfollow
+        Friendship.objects.filter(from_user=user).delete()
+        tweet = self.create_tweet(self.alfredo)
+        msg = fanout_newsfeeds_main_task(tweet.id, self.alfredo.id)
+        self.assertEqual(msg, '1 newsfeeds going to fanout, 1 batches created.')
+
+    def test_get_newsfeeds_since(self):
+        tweets = [self.create_tweet(self.trump) for i in range(3)]
+        newsfeeds = [self.create_newsfeed(self.alfredo, tweet) for tweet in tweets]
+
+        result, has_more = NewsFeedService.get_newsfeeds_since(
+            self.alfredo.id,
+            newsfeeds[0].created_at,
+        )
+        self.assertEqual([f.id for f in result], [newsfeeds[2].id, newsfeeds[1].id])
+        self.assertEqual(has_more, False)
+        result, has_more = NewsFeedService.get_newsfeeds_since(
+            self.alfredo.id,
+            newsfeeds[2].created_at,
+        )
+        self.assertEqual(result, [])
+
+        # the newest NEWSFEED_PUSH_LIMIT are returned
+        with mock.patch('newsfeeds.services.NEWSFEED_PUSH_LIMIT', 1):
+            result, has_more = NewsFeedService.get_newsfeeds_since(
+                self.alfredo.id,
+                newsfeeds[0].created_at,
+            )
+        self.assertEqual([f.id for f in result], [newsfeeds[2].id])
+        self.assertEqual(has_more, True)
+
+        # the cached list is full and newer than since, read the storage
+        NewsFeedService.invalidate_cached_newsfeeds(self.alfredo.id)
+        with self.settings(REDIS_LIST_LENGTH_LIMIT=1):
+            result, has_more = NewsFeedService.get_newsfeeds_since(
+                self.alfredo.id,
+                newsfeeds[0].created_at,
+            )
+        self.assertEqual([f.id for f in result], [newsfeeds[2].id, newsfeeds[1].id])
+
+    async def test_fanout_publishes_new_newsfeeds(self):
+        await sync_to_async(self.create_friendship)(self.alfredo, self.trump)
+        alfredo_subscription = PubSub.subscribe(
+            NEWSFEEDS_CHANNEL_PATTERN.format(user_id=self.alfredo.id),
+        )
+        trump_subscription = PubSub.subscribe(
+            NEWSFEEDS_CHANNEL_PATTERN.format(user_id=self.trump.id),
+        )
+        try:
+            tweet = await sync_to_async(self.create_tweet)(self.trump)
+            await sync_to_async(fanout_newsfeeds_main_task)(tweet.id, self.trump.id)
+            # the follower and the author are told
+            self.assertEqual(await alfredo_subscription.get(1), {'tweet_id': tweet.id})
+            self.assertEqual(await trump_subscription.get(1), {'tweet_id': tweet.id})
+        finally:
+            PubSub.unsubscribe(alfredo_subscription)
+            PubSub.unsubscribe(trump_subscription)
+        self.assertEqual(PubSub.subscriptions, {})
+
+
+NEWSFEED_SHARDS = ['default', 'newsfeeds_shard_1', 'newsfeeds_shard_2']
+
+
+@override_settings(NEWSFEED_SHARDS=NEWSFEED_SHARDS)
+class NewsFeedShardingTests(TestCase):
+    databases = set(NEWSFEED_SHARDS)
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.followers = [
+            self.create_user('follower{}'.format(i))
+            for i in range(10)
+        ]
+        for follower in self.followers:
+            self.create_friendship(follower, self.alfredo)
+
+    def get_newsfeed_aliases(self, user_id, tweet_id):
+        return [
+            alias
+            for alias in NEWSFEED_SHARDS
+            if NewsFeed.objects.using(alias).filter(
+                user_id=user_id,
+                tweet_id=tweet_id,
+            ).exists()
+        ]
+
+    def test_jump_consistent_hash(self):
+        for key in range(1000):
+            self.assertEqual(jump_consistent_hash(key, 1), 0)
+            bucket = jump_consistent_hash(key, 2)
+            self.assertEqual(bucket, jump_consistent_hash(key, 2))
+            # a new bucket only takes keys, the other keys do not move
+            new_bucket = jump_consistent_hash(key, 3)
+            self.assertIn(new_bucket, (bucket, 2))
+
+    def test_fanout_writes_to_the_shard_of_each_follower(self):
+        tweet = self.create_tweet(self.alfredo)
+        with mock.patch('newsfeeds.tasks.NEWSFEED_BATCH_SIZE', 2):
+            msg = fanout_newsfeeds_main_task(tweet.id, self.alfredo.id)
+        groups = group_by_shard([follower.id for follower in self.followers])
+        self.assertEqual(len(groups) > 1, True)
+        batches_count = sum((len(ids) + 1) // 2 for ids in groups.values())
+        self.assertEqual(
+            msg,
+            '10 newsfeeds going to fanout, {} batches created.'.format(
+                batches_count,
+            ),
+        )
+        for user in [self.alfredo] + self.followers:
+            self.assertEqual(
+                self.get_newsfeed_aliases(user.id, tweet.id),
+                [get_shard_alias(user.id)],
+            )
+
+    def test_saved_newsfeeds_are_routed_by_user(self):
+        tweet = self.create_tweet(self.alfredo)
+        for follower in self.followers:
+            newsfeed = self.create_newsfeed(follower, tweet)
+            self.assertEqual(newsfeed._state.db, get_shard_alias(follower.id))
+            newsfeeds = NewsFeedService.get_newsfeeds(follower.id)
+            self.assertEqual([f.id for f in newsfeeds], [newsfeed.id])
+
+    def test_rebalance_newsfeed_shards(self):
+        tweets = [self.create_tweet(self.alfredo) for _ in range(2)]
+        # every newsfeed starts on the default database
+        with override_settings(NEWSFEED_SHARDS=['default']):
+            for tweet in tweets:
+                for follower in self.followers:
+                    self.create_newsfeed(follower, tweet)
+        created_at = {
+            (newsfeed.user_id, newsfeed.tweet_id): (newsfeed.id, newsfeed.created_at)
+            for newsfeed in NewsFeed.objects.using('default').all()
+        }
+        # a cached list holds the ids of the default database
+        NewsFeedService.get_cached_newsfeeds(self.followers[0].id)
+
+        stdout = StringIO()
+        call_command('rebalance_newsfeed_shards', '--dry-run', stdout=stdout)
+        self.assertEqual(NewsFeed.objects.using('default').count(), 20)
+
+        stdout = StringIO()
+        call_command('rebalance_newsfeed_shards', batch_size=3, stdout=stdout)
+        moved_count = sum(
+            1
+            for follower in self.followers
+            if get_shard_alias(follower.id) != 'default'
+        ) * len(tweets)
+        self.assertIn(
+            '{} newsfeeds moved in total'.format(moved_count),
+            stdout.getvalue(),
+        )
+        for tweet in tweets:
+            for follower in self.followers:
+                self.assertEqual(
+                    self.get_newsfeed_aliases(follower.id, tweet.id),
+                    [get_shard_alias(follower.id)],
+                )
+        for alias in NEWSFEED_SHARDS:
+            for newsfeed in NewsFeed.objects.using(alias).all():
+                # the ids are unique across the shards, they are kept
+                self.assertEqual(
+                    (newsfeed.id, newsfeed.created_at),
+                    created_at[(newsfeed.user_id, newsfeed.tweet_id)],
+                )
+
+        # the cached list is reloaded from the new shard
+        follower = self.followers[0]
+        newsfeeds = NewsFeedService.get_cached_newsfeeds(follower.id)
+        self.assertEqual(
+            sorted(f.id for f in newsfeeds),
+            sorted(f.id for f in NewsFeedService.get_newsfeeds(follower.id)),
+        )
+
+        # running it again moves nothing
+        stdout = StringIO()
+        call_command('rebalance_newsfeed_shards', stdout=stdout)
+        self.assertIn('0 newsfeeds moved in total', stdout.getvalue())
+
+
+WIDE_COLUMN_BACKENDS = {'newsfeeds.NewsFeed': 'wide_column'}
+
+
+@override_settings(MODEL_STORAGE_BACKENDS=WIDE_COLUMN_BACKENDS)
+class WideColumnNewsFeedTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.followers = [
+            self.create_user('follower{}'.format(i))
+            for i in range(3)
+        ]
+        for follower in self.followers:
+            self.create_friendship(follower, self.alfredo)
+
+    def test_fanout_and_scan(self):
+        tweets = [self.create_tweet(self.alfredo) for _ in range(3)]
+        for tweet in tweets:
+            fanout_newsfeeds_main_task(tweet.id, self.alfredo.id)
+        # nothing is written to the relational table
+        self.assertEqual(NewsFeed.objects.count(), 0)
+
+        for user in [self.alfredo] + self.followers:
+            newsfeeds = list(NewsFeedService.get_newsfeeds(user.id))
+            self.assertEqual(
+                [newsfeed.tweet_id for newsfeed in newsfeeds],
+                [tweet.id for tweet in reversed(tweets)],
+            )
+            self.assertEqual(newsfeeds[0].created_at, tweets[2].created_at)
+
+        # a retried fanout skips the rows which exist, they keep their ids
+        user_id = self.followers[0].id
+        newsfeed_ids = [f.id for f in NewsFeedService.get_newsfeeds(user_id)[:10]]
+        with mock.patch('newsfeeds.storage.generate_id') as generate_id:
+            fanout_newsfeeds_main_task(tweets[0].id, self.alfredo.id)
+        self.assertEqual(generate_id.call_count, 0)
+        self.assertEqual(
+            [f.id for f in NewsFeedService.get_newsfeeds(user_id)[:10]],
+            newsfeed_ids,
+        )
+
+        # the cursors bound the scan
+        newsfeeds = NewsFeedService.get_newsfeeds(
+            user_id,
+            created_before=tweets[2].created_at,
+        )
+        self.assertEqual(
+            [newsfeed.tweet_id for newsfeed in newsfeeds[:1]],
+            [tweets[1].id],
+        )
+        newsfeeds = NewsFeedService.get_newsfeeds(
+            user_id,
+            created_after=tweets[0].created_at,
+        )
+        self.assertEqual(
+            [newsfeed.tweet_id for newsfeed in newsfeeds],
+            [tweets[2].id, tweets[1].id],
+        )
+
+    def test_cached_newsfeeds(self):
+        user_id = self.followers[0].id
+        tweet = self.create_tweet(self.alfredo)
+        fanout_newsfeeds_main_task(tweet.id, self.alfredo.id)
+        newsfeeds = NewsFeedService.get_cached_newsfeeds(user_id)
+        self.assertEqual([f.tweet_id for f in newsfeeds], [tweet.id])
+
+        # the fanout pushes the new rows to the cached list
+        new_tweet = self.create_tweet(self.alfredo)
+        fanout_newsfeeds_main_task(new_tweet.id, self.alfredo.id)
+        newsfeeds = NewsFeedService.get_cached_newsfeeds(user_id)
+        self.assertEqual(
+            [f.tweet_id for f in newsfeeds],
+            [new_tweet.id, tweet.id],
+        )
+
+    def test_copy_newsfeeds_to_wide_column(self):
+        tweets = [self.create_tweet(self.alfredo) for _ in range(2)]
+        with override_settings(MODEL_STORAGE_BACKENDS={}):
+            for tweet in tweets:
+                fanout_newsfeeds_main_task(tweet.id, self.alfredo.id)
+        self.assertEqual(NewsFeed.objects.count(), 8)
+        self.assertEqual(list(NewsFeedService.get_newsfeeds(self.alfredo.id)), [])
+
+        stdout = StringIO()
+        call_command('copy_newsfeeds_to_wide_column', batch_size=3, stdout=stdout)
+        self.assertIn('8 newsfeeds copied', stdout.getvalue())
+        for user in [self.alfredo] + self.followers:
+            self.assertEqual(
+                [f.tweet_id for f in NewsFeedService.get_newsfeeds(user.id)],
+                [tweet.id for tweet in reversed(tweets)],
+            )
+
+    def test_backfill_and_cleanup(self):
+        user = self.create_user('user')
+        tweets = [self.create_tweet(self.alfredo) for _ in range(3)]
+        self.create_friendship(user, self.alfredo)
+        backfill_newsfeeds_task(user.id, self.alfredo.id)
+        ids = [f.id for f in NewsFeedService.get_newsfeeds(user.id)]
+        self.assertEqual(
+            [f.tweet_id for f in NewsFeedService.get_newsfeeds(user.id)],
+            [tweet.id for tweet in reversed(tweets)],
+        )
+        # the rows merged before keep their ids
+        backfill_newsfeeds_task(user.id, self.alfredo.id)
+        self.assertEqual([f.id for f in NewsFeedService.get_newsfeeds(user.id)], ids)
+
+        Friendship.objects.filter(from_user=user).delete()
+        cleanup_newsfeeds_task(user.id, self.alfredo.id)
+        self.assertEqual(list(NewsFeedService.get_newsfeeds(user.id)), [])
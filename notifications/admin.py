@@ -0,0 +1,18 @@
+from django.contrib import admin
+from notifications.models import Notification
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = (
+        'recipient',
+        'verb',
+        'actor',
+        'actors_count',
+        'target_content_type',
+        'target_object_id',
+        'unread',
+        'created_at',
+    )
+    list_filter = ('verb', 'unread')
+    date_hierarchy = 'created_at'
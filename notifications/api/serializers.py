@@ -0,0 +1,51 @@
+from accounts.api.serializers import UserSerializerForNotification
+from django.contrib.contenttypes.models import ContentType
+from notifications.models import Notification
+from rest_framework import serializers
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    # the view hydrates the actors with UserService.hydrate_users
+    actor = UserSerializerForNotification()
+    target_type = serializers.SerializerMethodField()
+    # the snowflake id of a tweet or a comment goes beyond the integers of
+    # javascript
+    target_object_id_str = serializers.CharField(
+        source='target_object_id',
+        read_only=True,
+    )
+
+    class Meta:
+        model = Notification
+        fields = (
+            'id',
+            'verb',
+            'actor',
+            'actors_count',
+            'target_type',
+            'target_object_id',
+            'target_object_id_str',
+            'unread',
+            'created_at',
+        )
+
+    def get_target_type(self, obj):
+        if obj.target_content_type_id is None:
+            return None
+        # get_for_id is cached by django, no query per notification
+        return ContentType.objects.get_for_id(obj.target_content_type_id).model
+
+
+class NotificationSerializerForUpdate(serializers.ModelSerializer):
+    # only the unread notifications can be marked as read, a read
+    # notification is never marked unread again
+    unread = serializers.BooleanField()
+
+    class Meta:
+        model = Notification
+        fields = ('unread',)
+
+    def validate_unread(self, value):
+        if value:
+            raise serializers.ValidationError('a notification can only be marked as read')
+        return value
@@ -0,0 +1,129 @@
+from notifications.models import Notification
+from notifications.services import NotificationService
+from testing.clients import APIClient
+from testing.testcases import TestCase
+
+NOTIFICATION_URL = '/api/notifications/'
+NOTIFICATION_DETAIL_URL = '/api/notifications/{}/'
+UNREAD_COUNT_URL = '/api/notifications/unread-count/'
+MARK_ALL_AS_READ_URL = '/api/notifications/mark-all-as-read/'
+COMMENT_URL = '/api/comments/'
+FOLLOW_URL = '/api/friendships/{}/follow/'
+BULK_FOLLOW_URL = '/api/friendships/bulk_follow/'
+LIKE_URL = '/api/likes/'
+
+
+class NotificationApiTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.alfredo_client = APIClient()
+        self.alfredo_client.force_authenticate(self.alfredo)
+
+        self.trump = self.create_user('trump')
+        self.trump_client = APIClient()
+        self.trump_client.force_authenticate(self.trump)
+
+        self.tweet = self.create_tweet(self.alfredo)
+
+    def test_api_notifies(self):
+        self.trump_client.post(FOLLOW_URL.format(self.alfredo.id))
+        self.trump_client.post(COMMENT_URL, {
+            'tweet_id': self.tweet.id,
+            'content': 'a comment',
+        })
+        self.trump_client.post(LIKE_URL, {
+            'content_type': 'tweet',
+            'object_id': self.tweet.id,
+        })
+        lisa = self.create_user('lisa')
+        lisa_client = APIClient()
+        lisa_client.force_authenticate(lisa)
+        lisa_client.post(
+            BULK_FOLLOW_URL,
+            {'user_ids': [self.alfredo.id, self.trump.id]},
+            format='json',
+        )
+        # nothing is written until the worker runs
+        self.assertEqual(Notification.objects.count(), 0)
+        NotificationService.write_notifications()
+
+        response = self.alfredo_client.get(NOTIFICATION_URL)
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(
+            [(result['verb'], result['actors_count']) for result in results],
+            [('follow', 2), ('like', 1), ('comment', 1)],
+        )
+        self.assertEqual(results[0]['actor']['id'], lisa.id)
+        self.assertEqual(results[1]['target_type'], 'tweet')
+        self.assertEqual(results[1]['target_object_id'], self.tweet.id)
+        self.assertEqual(results[0]['target_type'], None)
+
+        response = self.trump_client.get(NOTIFICATION_URL)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_list(self):
+        self.create_friendship(self.trump, self.alfredo)
+        self.create_comment(self.trump, self.tweet)
+        NotificationService.write_notifications()
+
+        # login required
+        response = self.anonymous_client.get(NOTIFICATION_URL)
+        self.assertEqual(response.status_code, 403)
+
+        response = self.alfredo_client.get(NOTIFICATION_URL, {'unread': 'true'})
+        self.assertEqual(len(response.data['results']), 2)
+        notification = Notification.objects.filter(recipient=self.alfredo).first()
+        NotificationService.mark_as_read(notification)
+        response = self.alfredo_client.get(NOTIFICATION_URL, {'unread': 'true'})
+        self.assertEqual(len(response.data['results']), 1)
+        response = self.alfredo_client.get(NOTIFICATION_URL, {'unread': 'false'})
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], notification.id)
+
+    def test_unread_count(self):
+        self.create_friendship(self.trump, self.alfredo)
+        self.create_comment(self.trump, self.tweet)
+        NotificationService.write_notifications()
+
+        response = self.anonymous_client.get(UNREAD_COUNT_URL)
+        self.assertEqual(response.status_code, 403)
+        response = self.alfredo_client.get(UNREAD_COUNT_URL)
+        self.assertEqual(response.data['unread_count'], 2)
+        # served from the cache
+        response = self.alfredo_client.get(UNREAD_COUNT_URL)
+        self.assertEqual(self.alfredo_client.last_call.queries, [])
+        self.assertEqual(response.data['unread_count'], 2)
+        response = self.trump_client.get(UNREAD_COUNT_URL)
+        self.assertEqual(response.data['unread_count'], 0)
+
+    def test_mark_as_read(self):
+        self.create_friendship(self.trump, self.alfredo)
+        self.create_comment(self.trump, self.tweet)
+        NotificationService.write_notifications()
+        notification = Notification.objects.filter(recipient=self.alfredo).first()
+        url = NOTIFICATION_DETAIL_URL.format(notification.id)
+
+        # only the recipient can mark it
+        response = self.trump_client.put(url, {'unread': False})
+        self.assertEqual(response.status_code, 404)
+        # it cannot be marked unread
+        response = self.alfredo_client.put(url, {'unread': True})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.alfredo_client.put(url, {'unread': False})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['unread'], False)
+        response = self.alfredo_client.get(UNREAD_COUNT_URL)
+        self.assertEqual(response.data['unread_count'], 1)
+
+        # mark all
+        response = self.anonymous_client.post(MARK_ALL_AS_READ_URL)
+        self.assertEqual(response.status_code, 403)
+        response = self.alfredo_client.post(MARK_ALL_AS_READ_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['marked_count'], 1)
+        response = self.alfredo_client.get(UNREAD_COUNT_URL)
+        self.assertEqual(response.data['unread_count'], 0)
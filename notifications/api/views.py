@@ -0,0 +1,69 @@
+from accounts.services import UserService
+from notifications.api.serializers import (
+    NotificationSerializer,
+    NotificationSerializerForUpdate,
+)
+from notifications.models import Notification
+from notifications.services import NotificationService
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from utils.decorators import query_budget
+from utils.paginations import EndlessPagination
+
+
+class NotificationViewSet(viewsets.GenericViewSet):
+    serializer_class = NotificationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = EndlessPagination
+
+    def get_queryset(self):
+        return Notification.objects.filter(recipient=self.request.user)
+
+    @query_budget(max_queries=3)
+    def list(self, request):
+        queryset = self.get_queryset()
+        if 'unread' in request.query_params:
+            queryset = queryset.filter(
+                unread=request.query_params['unread'].lower() == 'true',
+            )
+        notifications = UserService.hydrate_users(
+            self.paginate_queryset(queryset),
+            user_field='actor',
+        )
+        serializer = NotificationSerializer(notifications, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    # the count is cached, it costs no query once loaded
+    @action(methods=['GET'], detail=False, url_path='unread-count')
+    @query_budget(max_queries=1)
+    def unread_count(self, request):
+        count = NotificationService.get_unread_count(request.user.id)
+        return Response({'unread_count': count}, status=status.HTTP_200_OK)
+
+    @action(methods=['POST'], detail=False, url_path='mark-all-as-read')
+    @query_budget(max_queries=1)
+    def mark_all_as_read(self, request):
+        updated = NotificationService.mark_all_as_read(request.user.id)
+        return Response({'marked_count': updated}, status=status.HTTP_200_OK)
+
+    @query_budget(max_queries=3)
+    def update(self, request, *args, **kwargs):
+        # get_object raises 404 for the notifications of other users
+        notification = self.get_object()
+        serializer = NotificationSerializerForUpdate(
+            instance=notification,
+            data=request.data,
+        )
+        if not serializer.is_valid():
+            return Response({
+                'message': 'Please check input',
+                'errors': serializer.errors,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        NotificationService.mark_as_read(notification)
+        UserService.hydrate_users([notification], user_field='actor')
+        return Response(
+            NotificationSerializer(notification).data,
+            status=status.HTTP_200_OK,
+        )
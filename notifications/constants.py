@@ -0,0 +1,16 @@
+from utils.time_constants import ONE_MINUTE
+
+# what happened to the recipient, a follow has no target, a comment targets
+# the commented tweet and a like the liked tweet or comment
+FOLLOW = 'follow'
+COMMENT = 'comment'
+LIKE = 'like'
+NOTIFICATION_VERBS = (FOLLOW, COMMENT, LIKE)
+
+# number of events written by one run of write_notifications_task, the
+# remaining events wait for the next run
+NOTIFICATION_BATCH_SIZE = 1000
+
+# a single writer runs at a time, the lock outlives the time_limit of
+# write_notifications_task so that it does not expire under a running writer
+NOTIFICATION_WRITER_LOCK_TIMEOUT = 2 * ONE_MINUTE
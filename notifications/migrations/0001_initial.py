@@ -0,0 +1,36 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import utils.time_helpers
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actors_count', models.IntegerField(default=1)),
+                ('verb', models.CharField(choices=[('follow', 'follow'), ('comment', 'comment'), ('like', 'like')], max_length=20)),
+                ('target_object_id', models.PositiveBigIntegerField(null=True)),
+                ('unread', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=utils.time_helpers.utc_now)),
+                ('actor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+                ('target_content_type', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='contenttypes.contenttype')),
+            ],
+            options={
+                'index_together': {('recipient', 'created_at'), ('recipient', 'unread', 'verb')},
+            },
+        ),
+    ]
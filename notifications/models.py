@@ -0,0 +1,58 @@
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from notifications.constants import NOTIFICATION_VERBS
+from utils.time_helpers import utc_now
+
+
+class Notification(models.Model):
+    """
+    the unread events of a recipient with the same verb and target are
+    coalesced into one notification, e.g. "actor and 36 others commented
+    on your tweet". actor is the latest actor.
+    """
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+    )
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+    )
+    actors_count = models.IntegerField(default=1)
+    verb = models.CharField(
+        max_length=20,
+        choices=[(verb, verb) for verb in NOTIFICATION_VERBS],
+    )
+    target_content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.SET_NULL,
+        null=True,
+    )
+    target_object_id = models.PositiveBigIntegerField(null=True)
+    target = GenericForeignKey('target_content_type', 'target_object_id')
+    unread = models.BooleanField(default=True)
+    # the time of the latest coalesced event, a coalesced notification moves
+    # back to the top of the list
+    created_at = models.DateTimeField(default=utc_now)
+
+    class Meta:
+        # requirement: list the notifications of a recipient, newest first,
+        # and count or coalesce into the unread ones
+        index_together = (
+            ('recipient', 'created_at'),
+            ('recipient', 'unread', 'verb'),
+        )
+
+    def __str__(self):
+        return '{} - {} x{} {} {}'.format(
+            self.created_at,
+            self.actor,
+            self.actors_count,
+            self.verb,
+            self.recipient,
+        )
@@ -0,0 +1,261 @@
+from comments.models import Comment
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
+from django.utils.dateparse import parse_datetime
+from notifications.constants import (
+    NOTIFICATION_BATCH_SIZE,
+    NOTIFICATION_WRITER_LOCK_TIMEOUT,
+)
+from notifications.models import Notification
+from twitter.cache import (
+    NOTIFICATION_EVENTS_KEY,
+    NOTIFICATION_PROCESSING_EVENTS_KEY,
+    NOTIFICATION_WRITER_LOCK_KEY,
+    USER_UNREAD_NOTIFICATIONS_COUNT_PATTERN,
+)
+from tweets.models import Tweet
+from utils.redis_client import RedisClient
+from utils.redis_helper import RedisHelper
+from utils.time_helpers import utc_now
+import json
+
+
+class NotificationService(object):
+    """
+    the requests only push events onto a redis list, write_notifications
+    (run by a celery beat task) pops them in batches, coalesces them and
+    writes the notifications with one bulk insert and one update per
+    coalesced notification
+    """
+
+    @classmethod
+    def notify(cls, verb, actor_id, recipient_id=None, target_model=None, target_id=None):
+        # a target notifies its owner, which is resolved by the writer
+        cls.notify_many([{
+            'verb': verb,
+            'actor_id': actor_id,
+            'recipient_id': recipient_id,
+            'target_model': target_model,
+            'target_id': target_id,
+        }])
+
+    @classmethod
+    def notify_many(cls, events):
+        serialized_events = []
+        for event in events:
+            target_model = event.get('target_model')
+            content_type_id = None
+            if target_model is not None:
+                content_type_id = ContentType.objects.get_for_model(target_model).id
+            serialized_events.append(json.dumps({
+                'verb': event['verb'],
+                'actor_id': event['actor_id'],
+                'recipient_id': event.get('recipient_id'),
+                'content_type_id': content_type_id,
+                'object_id': event.get('target_id'),
+                'created_at': utc_now().isoformat(),
+            }))
+        if serialized_events:
+            # newest first, the writer pops the oldest events from the tail
+            conn = RedisClient.get_connection()
+            conn.lpush(NOTIFICATION_EVENTS_KEY, *serialized_events)
+
+    @classmethod
+    def pop_events(cls, batch_size):
+        """
+        returns a batch of events, oldest first. RPOPLPUSH moves them to the
+        processing list, which is only deleted once they are written: the
+        events left there by a writer which died are popped again first
+        """
+        conn = RedisClient.get_connection()
+        serialized_events = conn.lrange(NOTIFICATION_PROCESSING_EVENTS_KEY, 0, -1)
+        serialized_events.reverse()
+        if not serialized_events:
+            pipeline = conn.pipeline(transaction=False)
+            for _ in range(batch_size):
+                pipeline.rpoplpush(
+                    NOTIFICATION_EVENTS_KEY,
+                    NOTIFICATION_PROCESSING_EVENTS_KEY,
+                )
+            serialized_events = [
+                serialized_event
+                for serialized_event in pipeline.execute()
+                if serialized_event is not None
+            ]
+        events = [json.loads(serialized_event) for serialized_event in serialized_events]
+        for event in events:
+            event['created_at'] = parse_datetime(event['created_at'])
+        return events
+
+    @classmethod
+    def resolve_recipients(cls, events):
+        # the owners of the targets, with one query per target model
+        owner_models = (Tweet, Comment)
+        content_types = ContentType.objects.get_for_models(*owner_models)
+        owner_ids = {}
+        for model_class in owner_models:
+            content_type_id = content_types[model_class].id
+            object_ids = set(
+                event['object_id']
+                for event in events
+                if event['recipient_id'] is None
+                and event['content_type_id'] == content_type_id
+            )
+            if not object_ids:
+                continue
+            rows = model_class.objects.filter(id__in=object_ids)\
+                .order_by()\
+                .values_list('id', 'user_id')
+            for object_id, user_id in rows:
+                owner_ids[(content_type_id, object_id)] = user_id
+        for event in events:
+            if event['recipient_id'] is None:
+                event['recipient_id'] = owner_ids.get(
+                    (event['content_type_id'], event['object_id']),
+                )
+        # nobody is notified of their own actions or of deleted targets
+        return [
+            event
+            for event in events
+            if event['recipient_id'] is not None
+            and event['recipient_id'] != event['actor_id']
+        ]
+
+    @classmethod
+    def coalesce(cls, events):
+        # returns {(recipient_id, verb, content_type_id, object_id): events}
+        # where the events of each group are in order and by distinct actors.
+        # an actor is only deduplicated within a batch, actors_count may count
+        # twice someone who commented in two batches
+        groups = {}
+        for event in events:
+            key = (
+                event['recipient_id'],
+                event['verb'],
+                event['content_type_id'],
+                event['object_id'],
+            )
+            group = groups.setdefault(key, {})
+            # a repeated actor only moves to the end
+            group.pop(event['actor_id'], None)
+            group[event['actor_id']] = event
+        return {key: list(group.values()) for key, group in groups.items()}
+
+    @classmethod
+    def write_notifications(cls, batch_size=NOTIFICATION_BATCH_SIZE):
+        """
+        write a batch of events, returns the number of events. the unread
+        notifications with the same recipient, verb and target are updated
+        instead of inserting new ones. a single writer runs at a time, the
+        beat task and the task chained by a full batch would otherwise
+        coalesce into the same notifications concurrently
+        """
+        token = RedisHelper.acquire_lock(
+            NOTIFICATION_WRITER_LOCK_KEY,
+            NOTIFICATION_WRITER_LOCK_TIMEOUT,
+        )
+        if token is None:
+            return 0
+        try:
+            events = cls.pop_events(batch_size)
+            if not events:
+                return 0
+            groups = cls.coalesce(cls.resolve_recipients(events))
+            if groups:
+                cls.save_notifications(groups)
+            # the events are written at least once, a writer which dies
+            # before this delete writes them again
+            conn = RedisClient.get_connection()
+            conn.delete(NOTIFICATION_PROCESSING_EVENTS_KEY)
+            return len(events)
+        finally:
+            RedisHelper.release_lock(NOTIFICATION_WRITER_LOCK_KEY, token)
+
+    @classmethod
+    def save_notifications(cls, groups):
+        unread_notifications = Notification.objects.filter(
+            recipient_id__in=set(key[0] for key in groups),
+            verb__in=set(key[1] for key in groups),
+            unread=True,
+        )
+        notification_ids_by_key = {
+            (
+                notification.recipient_id,
+                notification.verb,
+                notification.target_content_type_id,
+                notification.target_object_id,
+            ): notification.id
+            for notification in unread_notifications
+        }
+        new_notifications = []
+        with transaction.atomic():
+            for key, group in groups.items():
+                latest_event = group[-1]
+                notification_id = notification_ids_by_key.get(key)
+                # a notification read since it was loaded is not updated,
+                # the events go to a new one
+                if notification_id is not None and Notification.objects.filter(
+                    id=notification_id,
+                    unread=True,
+                ).update(
+                    actor_id=latest_event['actor_id'],
+                    actors_count=F('actors_count') + len(group),
+                    created_at=latest_event['created_at'],
+                ):
+                    continue
+                recipient_id, verb, content_type_id, object_id = key
+                new_notifications.append(Notification(
+                    recipient_id=recipient_id,
+                    verb=verb,
+                    target_content_type_id=content_type_id,
+                    target_object_id=object_id,
+                    actor_id=latest_event['actor_id'],
+                    actors_count=len(group),
+                    created_at=latest_event['created_at'],
+                ))
+            Notification.objects.bulk_create(new_notifications)
+        deltas_by_key = {}
+        for notification in new_notifications:
+            key = USER_UNREAD_NOTIFICATIONS_COUNT_PATTERN.format(
+                user_id=notification.recipient_id,
+            )
+            deltas_by_key[key] = deltas_by_key.get(key, 0) + 1
+        RedisHelper.incr_cached_counts(deltas_by_key)
+
+    @classmethod
+    def get_unread_count(cls, user_id):
+        key = USER_UNREAD_NOTIFICATIONS_COUNT_PATTERN.format(user_id=user_id)
+        return RedisHelper.load_count(
+            key,
+            lambda: Notification.objects.filter(
+                recipient_id=user_id,
+                unread=True,
+            ).count(),
+        )
+
+    @classmethod
+    def mark_as_read(cls, notification):
+        # returns whether the notification was unread
+        updated = Notification.objects.filter(
+            id=notification.id,
+            unread=True,
+        ).update(unread=False)
+        notification.unread = False
+        if updated:
+            key = USER_UNREAD_NOTIFICATIONS_COUNT_PATTERN.format(
+                user_id=notification.recipient_id,
+            )
+            RedisHelper.incr_cached_counts({key: -1})
+        return bool(updated)
+
+    @classmethod
+    def mark_all_as_read(cls, user_id):
+        # returns the number of notifications marked as read
+        updated = Notification.objects.filter(
+            recipient_id=user_id,
+            unread=True,
+        ).update(unread=False)
+        key = USER_UNREAD_NOTIFICATIONS_COUNT_PATTERN.format(user_id=user_id)
+        RedisHelper.invalidate_key(key)
+        return updated
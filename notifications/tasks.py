@@ -0,0 +1,15 @@
+from celery import shared_task
+from notifications.constants import NOTIFICATION_BATCH_SIZE
+from utils.time_constants import ONE_MINUTE
+
+
+@shared_task(time_limit=ONE_MINUTE)
+def write_notifications_task():
+    # import inside the task to avoid the circular import with services
+    from notifications.services import NotificationService
+
+    written = NotificationService.write_notifications(NOTIFICATION_BATCH_SIZE)
+    # a full batch means more events are waiting, do not wait for the beat
+    if written == NOTIFICATION_BATCH_SIZE:
+        write_notifications_task.delay()
+    return '{} notification events written'.format(written)
@@ -0,0 +1,207 @@
+from notifications.constants import COMMENT, FOLLOW, LIKE
+from notifications.models import Notification
+from notifications.services import NotificationService
+from notifications.tasks import write_notifications_task
+from testing.testcases import TestCase
+from tweets.models import Tweet
+from twitter.cache import (
+    NOTIFICATION_EVENTS_KEY,
+    NOTIFICATION_PROCESSING_EVENTS_KEY,
+    NOTIFICATION_WRITER_LOCK_KEY,
+    USER_UNREAD_NOTIFICATIONS_COUNT_PATTERN,
+)
+from unittest import mock
+from utils.redis_client import RedisClient
+from utils.redis_helper import RedisHelper
+
+
+class NotificationServiceTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+        self.tweet = self.create_tweet(self.alfredo)
+
+    def test_events_are_queued(self):
+        trump = self.create_user('trump')
+        # the requests do not write notifications
+        self.create_friendship(trump, self.alfredo)
+        comment = self.create_comment(trump, self.tweet)
+        self.create_like(trump, comment)
+        self.assertEqual(Notification.objects.count(), 0)
+        conn = RedisClient.get_connection()
+        self.assertEqual(conn.llen(NOTIFICATION_EVENTS_KEY), 3)
+
+        self.assertEqual(write_notifications_task(), '3 notification events written')
+        self.assertEqual(conn.llen(NOTIFICATION_EVENTS_KEY), 0)
+        # trump is notified of nothing, they liked their own comment
+        self.assertEqual(Notification.objects.filter(recipient=trump).count(), 0)
+        notifications = Notification.objects.filter(recipient=self.alfredo)
+        self.assertEqual(
+            set(notifications.values_list('verb', flat=True)),
+            {FOLLOW, COMMENT},
+        )
+        notification = notifications.get(verb=COMMENT)
+        self.assertEqual(notification.actor, trump)
+        self.assertEqual(notification.target, self.tweet)
+
+    def test_coalesce_events(self):
+        users = [self.create_user('user{}'.format(i)) for i in range(5)]
+        for user in users:
+            self.create_comment(user, self.tweet)
+        # a second comment by the same user is not counted twice
+        self.create_comment(users[0], self.tweet)
+        # one query to resolve the owners, one to load the unread
+        # notifications and one bulk insert within its transaction
+        with self.assertNumQueries(5):
+            NotificationService.write_notifications()
+        notification = Notification.objects.get(recipient=self.alfredo)
+        self.assertEqual(notification.actors_count, 5)
+        self.assertEqual(notification.actor, users[0])
+
+        # the next events are coalesced into the unread notification
+        for user in users[1:3]:
+            self.create_like(user, self.tweet)
+            self.create_comment(user, self.tweet)
+        NotificationService.write_notifications()
+        notification.refresh_from_db()
+        self.assertEqual(notification.actors_count, 7)
+        self.assertEqual(notification.actor, users[2])
+        like = Notification.objects.get(recipient=self.alfredo, verb=LIKE)
+        self.assertEqual(like.actors_count, 2)
+
+        # but not into a read one
+        NotificationService.mark_all_as_read(self.alfredo.id)
+        self.create_comment(users[4], self.tweet)
+        NotificationService.write_notifications()
+        self.assertEqual(Notification.objects.filter(
+            recipient=self.alfredo,
+            verb=COMMENT,
+        ).count(), 2)
+
+    def test_deleted_target(self):
+        trump = self.create_user('trump')
+        self.create_comment(trump, self.tweet)
+        Tweet.objects.filter(id=self.tweet.id).delete()
+        self.assertEqual(NotificationService.write_notifications(), 1)
+        self.assertEqual(Notification.objects.count(), 0)
+
+    def test_write_in_batches(self):
+        users = [self.create_user('user{}'.format(i)) for i in range(3)]
+        for user in users:
+            self.create_friendship(user, self.alfredo)
+        # every full batch chains the next one
+        with mock.patch('notifications.tasks.NOTIFICATION_BATCH_SIZE', 2), \
+                mock.patch.object(
+                    NotificationService,
+                    'write_notifications',
+                    wraps=NotificationService.write_notifications,
+                ) as write_notifications:
+            write_notifications_task()
+        self.assertEqual(write_notifications.call_count, 2)
+        # the second batch is coalesced into the notification of the first
+        self.assertEqual(
+            Notification.objects.get(recipient=self.alfredo).actors_count,
+            3,
+        )
+
+    def test_unread_count(self):
+        trump = self.create_user('trump')
+        self.create_friendship(trump, self.alfredo)
+        NotificationService.write_notifications()
+
+        self.assertEqual(NotificationService.get_unread_count(self.alfredo.id), 1)
+        # the count is cached
+        with self.assertNumQueries(0):
+            self.assertEqual(NotificationService.get_unread_count(self.alfredo.id), 1)
+
+        # new notifications update the cached count, coalesced ones do not
+        self.create_comment(trump, self.tweet)
+        self.create_like(trump, self.tweet)
+        lisa = self.create_user('lisa')
+        self.create_friendship(lisa, self.alfredo)
+        NotificationService.write_notifications()
+        with self.assertNumQueries(0):
+            self.assertEqual(NotificationService.get_unread_count(self.alfredo.id), 3)
+
+        notification = Notification.objects.filter(recipient=self.alfredo).first()
+        self.assertEqual(NotificationService.mark_as_read(notification), True)
+        self.assertEqual(NotificationService.mark_as_read(notification), False)
+        self.assertEqual(NotificationService.get_unread_count(self.alfredo.id), 2)
+
+        self.assertEqual(NotificationService.mark_all_as_read(self.alfredo.id), 2)
+        self.assertEqual(NotificationService.get_unread_count(self.alfredo.id), 0)
+
+    def test_single_writer(self):
+        trump = self.create_user('trump')
+        self.create_comment(trump, self.tweet)
+        conn = RedisClient.get_connection()
+        # another writer holds the lock
+        conn.set(NOTIFICATION_WRITER_LOCK_KEY, 'token')
+        self.assertEqual(NotificationService.write_notifications(), 0)
+        self.assertEqual(conn.llen(NOTIFICATION_EVENTS_KEY), 1)
+        conn.delete(NOTIFICATION_WRITER_LOCK_KEY)
+        self.assertEqual(NotificationService.write_notifications(), 1)
+        self.assertEqual(conn.exists(NOTIFICATION_WRITER_LOCK_KEY), 0)
+
+    def test_failed_write_is_retried(self):
+        users = [self.create_user('user{}'.format(i)) for i in range(2)]
+        for user in users:
+            self.create_comment(user, self.tweet)
+        with mock.patch.object(
+            NotificationService,
+            'save_notifications',
+            side_effect=Exception('database is down'),
+        ), self.assertRaises(Exception):
+            NotificationService.write_notifications()
+        # the events wait in the processing list
+        conn = RedisClient.get_connection()
+        self.assertEqual(conn.llen(NOTIFICATION_PROCESSING_EVENTS_KEY), 2)
+
+        self.create_comment(self.create_user('lisa'), self.tweet)
+        self.assertEqual(NotificationService.write_notifications(batch_size=5), 2)
+        notification = Notification.objects.get(recipient=self.alfredo)
+        self.assertEqual(notification.actors_count, 2)
+        self.assertEqual(notification.actor, users[1])
+        self.assertEqual(conn.llen(NOTIFICATION_PROCESSING_EVENTS_KEY), 0)
+        self.assertEqual(NotificationService.write_notifications(), 1)
+        notification.refresh_from_db()
+        self.assertEqual(notification.actors_count, 3)
+
+    def test_notification_read_while_writing(self):
+        trump = self.create_user('trump')
+        self.create_comment(trump, self.tweet)
+        NotificationService.write_notifications()
+        notification = Notification.objects.get(recipient=self.alfredo)
+
+        lisa = self.create_user('lisa')
+        self.create_comment(lisa, self.tweet)
+        filter_notifications = Notification.objects.filter
+
+        def load_then_read(*args, **kwargs):
+            notifications = filter_notifications(*args, **kwargs)
+            if 'recipient_id__in' in kwargs:
+                # the recipient reads the notification once it is loaded
+                notifications = list(notifications)
+                filter_notifications(id=notification.id).update(unread=False)
+            return notifications
+        with mock.patch.object(Notification.objects, 'filter', side_effect=load_then_read):
+            self.assertEqual(NotificationService.write_notifications(), 1)
+        # the events go to a new notification instead of the read one
+        notification.refresh_from_db()
+        self.assertEqual(notification.actors_count, 1)
+        new_notification = Notification.objects.get(recipient=self.alfredo, unread=True)
+        self.assertEqual(new_notification.actor, lisa)
+        self.assertEqual(new_notification.actors_count, 1)
+
+    def test_unread_count_loaded_concurrently(self):
+        key = USER_UNREAD_NOTIFICATIONS_COUNT_PATTERN.format(user_id=self.alfredo.id)
+
+        def get_stale_count():
+            # another request loaded the count and a notification was
+            # written meanwhile
+            RedisClient.get_connection().set(key, 1)
+            RedisHelper.incr_cached_counts({key: 1})
+            return 0
+        self.assertEqual(RedisHelper.load_count(key, get_stale_count), 2)
+        self.assertEqual(RedisHelper.load_count(key, get_stale_count), 2)
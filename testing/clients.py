@@ -0,0 +1,277 @@
+from asgiref.sync import async_to_sync
+from collections import Counter, namedtuple
+from contextlib import ExitStack
+from django.conf import settings
+from django.core import signals
+from django.db import close_old_connections, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404
+from rest_framework import test
+from urllib.parse import urlencode
+import asyncio
+import json
+import re
+import time
+
+APICall = namedtuple('APICall', (
+    'method',
+    'path',
+    'view',
+    'status_code',
+    'queries',
+    'duplicates',
+    'time_ms',
+))
+
+# transaction bookkeeping repeats by design, it is not a duplicate query
+IGNORED_QUERY_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def fingerprint(sql):
+    """
+    the shape of a query: literals become ? and IN lists collapse, so that
+    the same query issued for different rows has the same fingerprint
+    """
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'\bIN \((?:\?, )*\?\)', 'IN (...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def find_duplicates(queries):
+    counter = Counter(
+        fingerprint(sql)
+        for sql in queries
+        if not sql.startswith(IGNORED_QUERY_PREFIXES)
+    )
+    return {sql: count for sql, count in counter.items() if count > 1}
+
+
+def get_view_budget(response):
+    # DRF keeps the viewset class and the method -> action mapping on the view
+    try:
+        view = response.resolver_match.func
+    except Resolver404:
+        # no view answered the path, there is no budget to check
+        return None, None
+    if not hasattr(view, 'cls') or not getattr(view, 'actions', None):
+        return None, None
+    action = view.actions.get(response.request['REQUEST_METHOD'].lower())
+    if action is None:
+        return None, None
+    view_name = '{}.{}'.format(view.cls.__name__, action)
+    budget = getattr(getattr(view.cls, action, None), 'query_budget', None)
+    return view_name, budget
+
+
+class CaptureAllQueriesContext:
+    """
+    CaptureQueriesContext over every database: the newsfeeds shards and the
+    replicas are queried on their own connections. an alias which shares
+    the connection of another one is captured once, the databases which the
+    running test does not allow are skipped
+    """
+
+    def __enter__(self):
+        self.contexts = []
+        self.exit_stack = ExitStack()
+        captured_connections = []
+        for alias in connections:
+            if any(connections[alias] is conn for conn in captured_connections):
+                continue
+            captured_connections.append(connections[alias])
+            try:
+                connections[alias].ensure_connection()
+            except AssertionError:
+                # the test case forbids the connections to the database,
+                # it cannot be queried either
+                continue
+            self.contexts.append(self.exit_stack.enter_context(
+                CaptureQueriesContext(connections[alias]),
+            ))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self.exit_stack.__exit__(exc_type, exc_value, traceback)
+
+    @property
+    def captured_queries(self):
+        return [
+            query
+            for context in self.contexts
+            for query in context.captured_queries
+        ]
+
+
+class QueryBudgetMixin:
+    """
+    the calls of a test client are recorded in self.calls and checked
+    against the @query_budget of the views
+    """
+
+    @property
+    def last_call(self):
+        return self.calls[-1] if self.calls else None
+
+    def check_budget(self, call, budget):
+        if call.duplicates and not budget['allow_duplicates']:
+            raise AssertionError(
+                '{} {} ({}) issued the same query shape more than once:\n{}'.format(
+                    call.method,
+                    call.path,
+                    call.view,
+                    '\n'.join(
+                        '{} x {}'.format(count, sql)
+                        for sql, count in call.duplicates.items()
+                    ),
+                ),
+            )
+        if len(call.queries) > budget['max_queries']:
+            raise AssertionError(
+                '{} {} ({}) issued {} queries, over its budget of {}:\n{}'.format(
+                    call.method,
+                    call.path,
+                    call.view,
+                    len(call.queries),
+                    budget['max_queries'],
+                    '\n'.join(call.queries),
+                ),
+            )
+        max_time_ms = budget['max_time_ms']
+        if max_time_ms is not None and call.time_ms > max_time_ms:
+            raise AssertionError(
+                '{} {} ({}) took {:.1f}ms, over its budget of {}ms'.format(
+                    call.method,
+                    call.path,
+                    call.view,
+                    call.time_ms,
+                    max_time_ms,
+                ),
+            )
+
+
+class APIClient(QueryBudgetMixin, test.APIClient):
+    """
+    rest_framework's APIClient which records the queries, the duplicate
+    query shapes and the wall time of every call in self.calls, and fails
+    the test when the view exceeds its @query_budget
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(APIClient, self).__init__(*args, **kwargs)
+        self.calls = []
+
+    def request(self, **kwargs):
+        with CaptureAllQueriesContext() as ctx:
+            start = time.perf_counter()
+            response = super(APIClient, self).request(**kwargs)
+            time_ms = (time.perf_counter() - start) * 1000
+
+        queries = [query['sql'] for query in ctx.captured_queries]
+        view_name, budget = get_view_budget(response)
+        call = APICall(
+            method=kwargs['REQUEST_METHOD'],
+            path=kwargs['PATH_INFO'],
+            view=view_name,
+            status_code=response.status_code,
+            queries=queries,
+            duplicates=find_duplicates(queries),
+            time_ms=time_ms,
+        )
+        self.calls.append(call)
+        if budget is not None:
+            self.check_budget(call, budget)
+        return response
+
+
+class AsgiResponse:
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsgiClient(QueryBudgetMixin):
+    """
+    calls twitter.asgi.application in process, for the raw ASGI views which
+    the test clients of Django do not reach. it records and checks the
+    calls like APIClient, the @query_budget of an async view is read from
+    its app
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.cookie = None
+
+    def force_login(self, user):
+        client = Client()
+        client.force_login(user)
+        self.cookie = '{}={}'.format(
+            settings.SESSION_COOKIE_NAME,
+            client.cookies[settings.SESSION_COOKIE_NAME].value,
+        )
+
+    def get(self, path, data=None):
+        return self.request('GET', path, urlencode(data or {}, doseq=True))
+
+    def request(self, method, path, query_string=''):
+        from twitter.asgi import application
+
+        scope = {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': query_string.encode(),
+            'headers': [(b'host', b'localhost')],
+        }
+        if self.cookie:
+            scope['headers'].append((b'cookie', self.cookie.encode()))
+        app, _ = application.resolve(scope)
+        budget = getattr(app, 'query_budget', None)
+        messages = []
+        received = []
+
+        async def receive():
+            # an empty body, then the client waits until it is served
+            if not received:
+                received.append(True)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+
+        # like the test client, keep the connection of the test transaction
+        signals.request_started.disconnect(close_old_connections)
+        signals.request_finished.disconnect(close_old_connections)
+        try:
+            with CaptureAllQueriesContext() as ctx:
+                start = time.perf_counter()
+                async_to_sync(application)(scope, receive, send)
+                time_ms = (time.perf_counter() - start) * 1000
+        finally:
+            signals.request_started.connect(close_old_connections)
+            signals.request_finished.connect(close_old_connections)
+
+        response = AsgiResponse(
+            messages[0]['status'],
+            b''.join(message.get('body', b'') for message in messages[1:]),
+        )
+        queries = [query['sql'] for query in ctx.captured_queries]
+        call = APICall(
+            method=method,
+            path=path,
+            view=app.__name__ if app is not None else None,
+            status_code=response.status_code,
+            queries=queries,
+            duplicates=find_duplicates(queries),
+            time_ms=time_ms,
+        )
+        self.calls.append(call)
+        if budget is not None:
+            self.check_budget(call, budget)
+        return response
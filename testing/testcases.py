@@ -1,12 +1,26 @@
 from comments.models import Comment
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
 from django.test import TestCase as DjangoTestCase
-from rest_framework.test import APIClient
+from friendships.models import Friendship
+from likes.models import Like
+from newsfeeds.models import NewsFeed
+from testing.clients import APIClient
 from tweets.models import Tweet
+from utils.full_text import FullTextClient
+from utils.redis_client import RedisClient
+from utils.wide_column import WideColumnClient
 
 
 class TestCase(DjangoTestCase):
 
+    def clear_cache(self):
+        caches['testing'].clear()
+        RedisClient.clear()
+        WideColumnClient.clear()
+        FullTextClient.clear()
+
     @property
     def anonymous_client(self):
         if hasattr(self, '_anonymous_client'):
@@ -31,4 +45,19 @@ class TestCase(DjangoTestCase):
     def create_comment(self, user, tweet, content=None):
         if content is None:
             content = 'default comment content'
-        return Comment.objects.create(user=user, tweet=tweet, content=content)
\ No newline at end of file
+        return Comment.objects.create(user=user, tweet=tweet, content=content)
+
+    def create_friendship(self, from_user, to_user):
+        return Friendship.objects.create(from_user=from_user, to_user=to_user)
+
+    def create_newsfeed(self, user, tweet):
+        return NewsFeed.objects.create(user=user, tweet=tweet)
+
+    def create_like(self, user, target):
+        # target is a tweet or a comment
+        instance, _ = Like.objects.get_or_create(
+            content_type=ContentType.objects.get_for_model(target.__class__),
+            object_id=target.id,
+            user=user,
+        )
+        return instance
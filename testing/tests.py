@@ -0,0 +1,98 @@
+from django.test import override_settings
+from newsfeeds.sharding import get_shard_alias
+from testing.clients import APIClient, find_duplicates, fingerprint
+from testing.testcases import TestCase
+from tweets.api.views import TweetViewSet
+from unittest import mock
+
+TWEET_LIST_API = '/api/tweets/'
+TWEET_RETRIEVE_API = '/api/tweets/{}/'
+NEWSFEEDS_API = '/api/newsfeeds/'
+NEWSFEED_SHARDS = ['default', 'newsfeeds_shard_1', 'newsfeeds_shard_2']
+
+
+class InstrumentedClientTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.user = self.create_user('user')
+        self.tweet = self.create_tweet(self.user)
+        self.client = APIClient()
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 1 AND name = 'it''s'"),
+            'SELECT * FROM t WHERE id = ? AND name = ?',
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t0 WHERE id IN (1, 2, 3)'),
+            fingerprint('SELECT * FROM t0 WHERE id IN (4)'),
+        )
+        self.assertEqual(find_duplicates([
+            'SELECT * FROM t WHERE id = 1',
+            'SELECT * FROM t WHERE id = 2',
+            'SAVEPOINT "s1"',
+            'SAVEPOINT "s1"',
+            'SELECT * FROM u WHERE id = 1',
+        ]), {'SELECT * FROM t WHERE id = ?': 2})
+
+    def test_calls_are_recorded(self):
+        self.client.get(TWEET_LIST_API, {'user_id': self.user.id})
+        call = self.client.last_call
+        self.assertEqual(call.method, 'GET')
+        self.assertEqual(call.path, TWEET_LIST_API)
+        self.assertEqual(call.view, 'TweetViewSet.list')
+        self.assertEqual(call.status_code, 200)
+        self.assertEqual(len(call.queries) > 0, True)
+        self.assertEqual(call.duplicates, {})
+
+        self.client.get(TWEET_RETRIEVE_API.format(self.tweet.id))
+        self.assertEqual(len(self.client.calls), 2)
+
+        # a path without view is recorded with its 404
+        response = self.client.get('/api/unknown/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.last_call.view, None)
+
+    def test_query_budget(self):
+        budget = {'max_queries': 0}
+        with mock.patch.dict(TweetViewSet.list.query_budget, budget):
+            with self.assertRaisesRegex(AssertionError, 'over its budget'):
+                self.client.get(TWEET_LIST_API, {'user_id': self.user.id})
+
+        budget = {'max_time_ms': 0}
+        with mock.patch.dict(TweetViewSet.list.query_budget, budget):
+            with self.assertRaisesRegex(AssertionError, 'over its budget'):
+                self.client.get(TWEET_LIST_API, {'user_id': self.user.id})
+
+    def test_duplicate_queries_fail(self):
+        # one user query per comment is what the budget is there to catch
+        for i in range(2):
+            user = self.create_user('commenter{}'.format(i))
+            self.create_comment(user, self.tweet)
+        with mock.patch(
+            'tweets.api.views.UserService.hydrate_users',
+            lambda objects: objects,
+        ):
+            with self.assertRaisesRegex(AssertionError, 'same query shape'):
+                self.client.get(TWEET_RETRIEVE_API.format(self.tweet.id))
+
+
+@override_settings(NEWSFEED_SHARDS=NEWSFEED_SHARDS)
+class ShardedQueriesTests(TestCase):
+    databases = set(NEWSFEED_SHARDS)
+
+    def test_queries_of_every_database_are_recorded(self):
+        self.clear_cache()
+        users = [self.create_user('user{}'.format(i)) for i in range(6)]
+        user = next(
+            user for user in users
+            if get_shard_alias(user.id) != 'default'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        client.get(NEWSFEEDS_API)
+        self.assertEqual(
+            any('newsfeeds_newsfeed' in sql for sql in client.last_call.queries),
+            True,
+        )
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from trends.models import TrendSnapshot
+
+
+@admin.register(TrendSnapshot)
+class TrendSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'created_at')
+    list_filter = ('kind',)
+    date_hierarchy = 'created_at'
@@ -0,0 +1,11 @@
+from rest_framework import serializers
+
+
+class HashtagTrendSerializer(serializers.Serializer):
+    hashtag = serializers.CharField(source='name')
+    count = serializers.IntegerField()
+
+
+class TweetTrendSerializer(serializers.Serializer):
+    tweet_id = serializers.IntegerField(source='name')
+    count = serializers.IntegerField()
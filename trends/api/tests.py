@@ -0,0 +1,34 @@
+from testing.testcases import TestCase
+from trends.services import TrendService
+
+TRENDS_URL = '/api/trends/'
+
+
+class TrendApiTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+
+    def test_list(self):
+        response = self.anonymous_client.get(TRENDS_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'hashtags': [], 'tweets': []})
+
+        tweet = self.create_tweet(self.alfredo, 'hello #world')
+        self.create_tweet(self.alfredo, 'the #World is #big')
+        self.create_like(self.alfredo, tweet)
+        # the top lists are only updated by the snapshots
+        response = self.anonymous_client.get(TRENDS_URL)
+        self.assertEqual(response.data['hashtags'], [])
+
+        TrendService.take_snapshots()
+        response = self.anonymous_client.get(TRENDS_URL)
+        self.assertEqual(self.anonymous_client.last_call.queries, [])
+        self.assertEqual(response.data['hashtags'], [
+            {'hashtag': 'world', 'count': 2},
+            {'hashtag': 'big', 'count': 1},
+        ])
+        self.assertEqual(response.data['tweets'], [
+            {'tweet_id': tweet.id, 'count': 1},
+        ])
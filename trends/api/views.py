@@ -0,0 +1,21 @@
+from rest_framework import status, viewsets
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from trends.api.serializers import HashtagTrendSerializer, TweetTrendSerializer
+from trends.constants import HASHTAG, TWEET
+from trends.services import TrendService
+from utils.decorators import query_budget
+
+
+class TrendViewSet(viewsets.GenericViewSet):
+    permission_classes = [AllowAny]
+
+    # the top lists are precomputed by take_trends_snapshots_task and
+    # cached, only a cache miss reads the latest snapshots
+    @query_budget(max_queries=1)
+    def list(self, request):
+        trends = TrendService.get_trends()
+        return Response({
+            'hashtags': HashtagTrendSerializer(trends[HASHTAG], many=True).data,
+            'tweets': TweetTrendSerializer(trends[TWEET], many=True).data,
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,17 @@
+HASHTAG = 'hashtag'
+TWEET = 'tweet'
+TREND_KINDS = (HASHTAG, TWEET)
+
+# the trends are counted over a sliding window of the last minutes
+TRENDS_WINDOW_MINUTES = 60
+# number of trends of each kind in a snapshot
+TRENDS_SIZE = 10
+# the heaviest items kept per minute, the candidates of the snapshots
+TRENDS_CANDIDATES_PER_MINUTE = 50
+# count-min sketch of depth rows of width counters, an estimate is off by
+# at most 2 / width of the counts of the window with a probability of
+# 1 - 1 / 2 ** depth
+TRENDS_SKETCH_WIDTH = 2048
+TRENDS_SKETCH_DEPTH = 4
+# snapshots older than this are deleted, in seconds
+TRENDS_SNAPSHOT_TTL = 24 * 3600
@@ -0,0 +1,26 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('hashtag', 'hashtag'), ('tweet', 'tweet')], max_length=20)),
+                ('trends', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'index_together': {('kind', 'created_at')},
+            },
+        ),
+    ]
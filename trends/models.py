@@ -0,0 +1,22 @@
+from django.db import models
+from trends.constants import TREND_KINDS
+
+
+class TrendSnapshot(models.Model):
+    """
+    the top list of a kind of trends at created_at, [{name, count}] with
+    the heaviest first. the latest snapshots are also cached in redis
+    """
+    kind = models.CharField(
+        max_length=20,
+        choices=[(kind, kind) for kind in TREND_KINDS],
+    )
+    trends = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # requirement: load the latest snapshot of a kind
+        index_together = (('kind', 'created_at'),)
+
+    def __str__(self):
+        return '{} {} trends'.format(self.created_at, self.kind)
@@ -0,0 +1,119 @@
+from datetime import timedelta
+from django.conf import settings
+from trends.constants import (
+    HASHTAG,
+    TREND_KINDS,
+    TRENDS_CANDIDATES_PER_MINUTE,
+    TRENDS_SIZE,
+    TRENDS_SKETCH_DEPTH,
+    TRENDS_SKETCH_WIDTH,
+    TRENDS_SNAPSHOT_TTL,
+    TRENDS_WINDOW_MINUTES,
+    TWEET,
+)
+from trends.models import TrendSnapshot
+from twitter.cache import TRENDS_PATTERN
+from utils.redis_client import RedisClient
+from utils.routers import read_from_primary
+from utils.time_helpers import utc_now
+from utils.trending import SlidingWindowTopK
+import json
+import re
+
+# a hashtag is a # followed by letters, digits or underscores, not within
+# a word like a#b
+HASHTAG_PATTERN = re.compile(r'(?<!\w)#(\w+)', re.UNICODE)
+
+
+class TrendService(object):
+    streams = {
+        kind: SlidingWindowTopK(
+            kind,
+            TRENDS_WINDOW_MINUTES,
+            TRENDS_SKETCH_WIDTH,
+            TRENDS_SKETCH_DEPTH,
+            TRENDS_CANDIDATES_PER_MINUTE,
+        )
+        for kind in TREND_KINDS
+    }
+
+    @classmethod
+    def extract_hashtags(cls, content):
+        # a tweet counts once per hashtag, whatever the case
+        return set(hashtag.lower() for hashtag in HASHTAG_PATTERN.findall(content))
+
+    @classmethod
+    def record_hashtags(cls, content):
+        cls.streams[HASHTAG].add(cls.extract_hashtags(content))
+
+    @classmethod
+    def record_tweet_engagements(cls, tweet_ids):
+        # likes and comments make a tweet trend
+        cls.streams[TWEET].add(tweet_ids)
+
+    @classmethod
+    def take_snapshots(cls):
+        """
+        compute the top lists of the window, store them as snapshots and
+        cache them for the readers. returns the snapshots
+        """
+        snapshots = [
+            TrendSnapshot(kind=kind, trends=[
+                {'name': name, 'count': count}
+                for name, count in stream.top(TRENDS_SIZE)
+            ])
+            for kind, stream in cls.streams.items()
+        ]
+        TrendSnapshot.objects.bulk_create(snapshots)
+        TrendSnapshot.objects.filter(
+            created_at__lt=utc_now() - timedelta(seconds=TRENDS_SNAPSHOT_TTL),
+        ).delete()
+        cls.cache_snapshots(snapshots)
+        return snapshots
+
+    @classmethod
+    def cache_snapshots(cls, snapshots):
+        conn = RedisClient.get_connection()
+        pipeline = conn.pipeline()
+        for snapshot in snapshots:
+            pipeline.set(
+                TRENDS_PATTERN.format(kind=snapshot.kind),
+                json.dumps(snapshot.trends),
+                ex=settings.REDIS_KEY_EXPIRE_TIME,
+            )
+        pipeline.execute()
+
+    @classmethod
+    def get_trends(cls):
+        """
+        returns {kind: [{name, count}]} from the cached top lists, only a
+        cache miss reads the latest snapshots from the database
+        """
+        conn = RedisClient.get_connection()
+        cached_trends = conn.mget([
+            TRENDS_PATTERN.format(kind=kind)
+            for kind in TREND_KINDS
+        ])
+        trends = {
+            kind: json.loads(cached)
+            for kind, cached in zip(TREND_KINDS, cached_trends)
+            if cached is not None
+        }
+        missing_kinds = [kind for kind in TREND_KINDS if kind not in trends]
+        if not missing_kinds:
+            return trends
+
+        # every run snapshots all the kinds at once, so the newest snapshots
+        # hold the latest one of each kind
+        latest_snapshots = {}
+        with read_from_primary():
+            for snapshot in TrendSnapshot.objects.filter(kind__in=missing_kinds)\
+                    .order_by('-created_at')[:len(missing_kinds)]:
+                latest_snapshots.setdefault(snapshot.kind, snapshot)
+        snapshots = [
+            latest_snapshots.get(kind, TrendSnapshot(kind=kind, trends=[]))
+            for kind in missing_kinds
+        ]
+        cls.cache_snapshots(snapshots)
+        trends.update((snapshot.kind, snapshot.trends) for snapshot in snapshots)
+        return trends
@@ -0,0 +1,11 @@
+from celery import shared_task
+from utils.time_constants import ONE_MINUTE
+
+
+@shared_task(time_limit=ONE_MINUTE)
+def take_trends_snapshots_task():
+    # import inside the task to avoid the circular import with services
+    from trends.services import TrendService
+
+    snapshots = TrendService.take_snapshots()
+    return '{} trends snapshots taken'.format(len(snapshots))
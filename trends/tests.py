@@ -0,0 +1,118 @@
+from datetime import timedelta
+from testing.testcases import TestCase
+from trends.constants import HASHTAG, TWEET
+from trends.models import TrendSnapshot
+from trends.services import TrendService
+from trends.tasks import take_trends_snapshots_task
+from utils.time_helpers import utc_now
+from utils.trending import SlidingWindowTopK
+
+
+class SlidingWindowTopKTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.stream = SlidingWindowTopK('test', 3, 64, 4, 5)
+        self.now = utc_now()
+
+    def test_top(self):
+        self.assertEqual(self.stream.top(3, self.now), [])
+        self.stream.add(['a'] * 5 + ['b'] * 3 + ['c'], self.now)
+        self.stream.add(['c', 'b'], self.now)
+        # the count-min sketch never under counts
+        top = self.stream.top(2, self.now)
+        self.assertEqual([item for item, _ in top], ['a', 'b'])
+        self.assertGreaterEqual(top[0][1], 5)
+        self.assertGreaterEqual(top[1][1], 4)
+
+    def test_sliding_window(self):
+        self.stream.add(['a'] * 3, self.now - timedelta(minutes=2))
+        self.stream.add(['b'] * 2, self.now - timedelta(minutes=1))
+        self.stream.add(['a', 'b', 'b'], self.now)
+        # the counts are summed over the minutes of the window
+        self.assertEqual(self.stream.top(2, self.now), [('a', 4), ('b', 4)])
+        # a minute later the oldest minute is out of the window
+        later = self.now + timedelta(minutes=1)
+        self.assertEqual(self.stream.top(2, later), [('b', 4), ('a', 1)])
+        later = self.now + timedelta(minutes=3)
+        self.assertEqual(self.stream.top(2, later), [])
+
+    def test_capacity(self):
+        # only the heaviest items of a minute stay candidates
+        self.stream.add(
+            [str(i) for i in range(10) for _ in range(i + 1)],
+            self.now,
+        )
+        top = self.stream.top(10, self.now)
+        self.assertEqual(len(top), 5)
+        self.assertEqual([item for item, _ in top], ['9', '8', '7', '6', '5'])
+
+    def test_accuracy(self):
+        # a narrow sketch with many light items still ranks the heavy ones
+        stream = SlidingWindowTopK('accuracy', 1, 256, 4, 20)
+        items = ['light{}'.format(i) for i in range(500)]
+        items += ['heavy{}'.format(i) for i in range(5) for _ in range(50 + i * 10)]
+        stream.add(items, self.now)
+        top = stream.top(5, self.now)
+        self.assertEqual(
+            [item for item, _ in top],
+            ['heavy4', 'heavy3', 'heavy2', 'heavy1', 'heavy0'],
+        )
+        # the error is bounded by the light items
+        for item, count in top:
+            true_count = 50 + int(item[-1]) * 10
+            self.assertLessEqual(true_count, count)
+            self.assertLessEqual(count, true_count + 2 * len(items) // 256)
+
+
+class TrendServiceTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+
+    def test_extract_hashtags(self):
+        self.assertEqual(
+            TrendService.extract_hashtags('#Django and #python, #django! a#b #'),
+            {'django', 'python'},
+        )
+
+    def test_take_snapshots(self):
+        self.create_tweet(self.alfredo, 'learning #Django')
+        self.create_tweet(self.alfredo, '#django #python')
+        tweet = self.create_tweet(self.alfredo, 'no hashtag')
+        self.create_like(self.alfredo, tweet)
+        self.create_comment(self.alfredo, tweet)
+
+        self.assertEqual(take_trends_snapshots_task(), '2 trends snapshots taken')
+        snapshot = TrendSnapshot.objects.get(kind=HASHTAG)
+        self.assertEqual(snapshot.trends, [
+            {'name': 'django', 'count': 2},
+            {'name': 'python', 'count': 1},
+        ])
+        snapshot = TrendSnapshot.objects.get(kind=TWEET)
+        self.assertEqual(snapshot.trends, [{'name': str(tweet.id), 'count': 2}])
+
+        # the snapshots of the last day are kept
+        TrendSnapshot.objects.filter(kind=HASHTAG).update(
+            created_at=utc_now() - timedelta(days=2),
+        )
+        TrendService.take_snapshots()
+        self.assertEqual(TrendSnapshot.objects.filter(kind=HASHTAG).count(), 1)
+        self.assertEqual(TrendSnapshot.objects.filter(kind=TWEET).count(), 2)
+
+    def test_get_trends(self):
+        self.assertEqual(TrendService.get_trends(), {HASHTAG: [], TWEET: []})
+        self.create_tweet(self.alfredo, '#django')
+        TrendService.take_snapshots()
+        with self.assertNumQueries(0):
+            trends = TrendService.get_trends()
+        self.assertEqual(trends[HASHTAG], [{'name': 'django', 'count': 1}])
+
+        # a cache miss reads the latest snapshot
+        self.clear_cache()
+        with self.assertNumQueries(1):
+            trends = TrendService.get_trends()
+        self.assertEqual(trends[HASHTAG], [{'name': 'django', 'count': 1}])
+        with self.assertNumQueries(0):
+            TrendService.get_trends()
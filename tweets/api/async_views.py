@@ -0,0 +1,61 @@
+from accounts.services import UserService
+from comments.services import CommentService
+from django.http import Http404
+from likes.services import LikeService
+from rest_framework.response import Response
+from tweets.api.serializers import TweetSerializer, TweetSerializerWithComments
+from tweets.models import Tweet
+from tweets.services import TweetService
+from utils.asgi import async_view, required_params, run_sync
+from utils.decorators import query_budget
+from utils.paginations import EndlessPagination
+import asyncio
+
+
+def load_tweets_page(request, paginator):
+    tweets = Tweet.objects.filter(
+        user_id=request.query_params['user_id'],
+    ).order_by('-created_at')
+    tweets = UserService.hydrate_users(paginator.paginate_queryset(tweets, request))
+    tweets = LikeService.hydrate_likes(request.user, tweets)
+    return TweetSerializer(tweets, many=True).data
+
+
+def serialize_tweet_with_comments(user, tweet, comments, has_next_page):
+    UserService.hydrate_users([tweet] + comments)
+    LikeService.hydrate_likes(user, [tweet] + comments)
+    tweet.comments_preview = comments
+    tweet.comments_has_next_page = has_next_page
+    return TweetSerializerWithComments(tweet).data
+
+
+@async_view()
+@query_budget(max_queries=6)
+@required_params(params=['user_id'])
+async def list_tweets(request):
+    # the async TweetViewSet.list
+    paginator = EndlessPagination()
+    data = await run_sync(load_tweets_page, request, paginator)
+    return paginator.get_paginated_response(data, key='tweets')
+
+
+@async_view()
+@query_budget(max_queries=7)
+async def retrieve_tweet(request):
+    # the async TweetViewSet.retrieve, the tweet and its comments preview
+    # are read at the same time
+    tweet_id = int(request.kwargs['pk'])
+    tweet, (comments, has_next_page) = await asyncio.gather(
+        run_sync(TweetService.get_tweet_through_cache, tweet_id),
+        run_sync(CommentService.get_comments_preview, tweet_id),
+    )
+    if tweet is None:
+        raise Http404
+    data = await run_sync(
+        serialize_tweet_with_comments,
+        request.user,
+        tweet,
+        comments,
+        has_next_page,
+    )
+    return Response(data)
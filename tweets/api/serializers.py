@@ -5,11 +5,28 @@ from tweets.models import Tweet
 
 
 class TweetSerializer(serializers.ModelSerializer):
+    """
+    the view hydrates the likes with LikeService.hydrate_likes, which sets
+    likes_count_with_pending and has_liked. the snowflake ids go beyond the
+    integers of javascript, id_str is the id as a string
+    """
+    id_str = serializers.CharField(source='id', read_only=True)
     user = UserSerializerForTweet()
+    likes_count = serializers.IntegerField(source='likes_count_with_pending')
+    has_liked = serializers.BooleanField()
 
     class Meta:
         model = Tweet
-        fields = ('id', 'user', 'created_at', 'content')
+        fields = (
+            'id',
+            'id_str',
+            'user',
+            'created_at',
+            'content',
+            'comments_count',
+            'likes_count',
+            'has_liked',
+        )
 
 
 class TweetSerializerForCreate(serializers.ModelSerializer):
@@ -27,9 +44,38 @@ class TweetSerializerForCreate(serializers.ModelSerializer):
 
 
 class TweetSerializerWithComments(serializers.ModelSerializer):
+    """
+    the view sets comments_preview, the newest comments with their users
+    and likes hydrated, and comments_has_next_page. comments_next_cursor is
+    the created_before cursor of the next page of the comments api.
+    """
+    id_str = serializers.CharField(source='id', read_only=True)
     user = UserSerializerForTweet()
-    comments = CommentSerializer(source='comment_set', many=True)
+    likes_count = serializers.IntegerField(source='likes_count_with_pending')
+    has_liked = serializers.BooleanField()
+    comments = CommentSerializer(source='comments_preview', many=True)
+    comments_has_next_page = serializers.BooleanField()
+    comments_next_cursor = serializers.SerializerMethodField()
 
     class Meta:
         model = Tweet
-        fields = ('id', 'user', 'comments', 'created_at', 'content')
\ No newline at end of file
+        fields = (
+            'id',
+            'id_str',
+            'user',
+            'comments',
+            'comments_count',
+            'comments_has_next_page',
+            'comments_next_cursor',
+            'created_at',
+            'content',
+            'likes_count',
+            'has_liked',
+        )
+
+    def get_comments_next_cursor(self, obj):
+        if not obj.comments_has_next_page:
+            return None
+        return serializers.DateTimeField().to_representation(
+            obj.comments_preview[-1].created_at,
+        )
\ No newline at end of file
@@ -1,15 +1,22 @@
-from rest_framework.test import APIClient
+from comments.constants import COMMENTS_PREVIEW_SIZE
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.dateparse import parse_datetime
+from testing.clients import APIClient, AsgiClient
 from testing.testcases import TestCase
 from tweets.models import Tweet
+from utils.paginations import EndlessPagination
 
 TWEET_LIST_API = '/api/tweets/'
 TWEET_CREATE_API = '/api/tweets/'
 TWEET_RETRIEVE_API = '/api/tweets/{}/'
+TWEET_SEARCH_API = '/api/tweets/search/'
 
 
 class TweetApiTests(TestCase):
 
     def setUp(self):
+        self.clear_cache()
         self.user1 = self.create_user('user1', 'user1@jiuzhang.com')
         self.tweets1 = [
             self.create_tweet(self.user1)
@@ -81,3 +88,233 @@ class TweetApiTests(TestCase):
         self.create_comment(self.user1, tweet, 'hmm...')
         response = self.anonymous_client.get(url)
         self.assertEqual(len(response.data['comments']), 2)
+        self.assertEqual(response.data['comments'][0]['content'], 'hmm...')
+        self.assertEqual(response.data['comments_has_next_page'], False)
+        self.assertEqual(response.data['comments_next_cursor'], None)
+
+        # the snowflake ids do not fit in the integers of javascript
+        self.assertGreater(tweet.id, 2 ** 53)
+        self.assertEqual(response.data['id_str'], str(tweet.id))
+        self.assertEqual(response.data['comments'][0]['tweet_id_str'], str(tweet.id))
+
+    def test_retrieve_comments_preview(self):
+        tweet = self.create_tweet(self.user1)
+        comments = [
+            self.create_comment(self.user2, tweet, 'comment{}'.format(i))
+            for i in range(COMMENTS_PREVIEW_SIZE + 2)
+        ]
+        url = TWEET_RETRIEVE_API.format(tweet.id)
+        response = self.anonymous_client.get(url)
+        # only the newest comments are embedded
+        self.assertEqual(len(response.data['comments']), COMMENTS_PREVIEW_SIZE)
+        self.assertEqual(response.data['comments'][0]['id'], comments[-1].id)
+        self.assertEqual(response.data['comments_count'], len(comments))
+        self.assertEqual(response.data['comments_has_next_page'], True)
+        oldest = comments[-COMMENTS_PREVIEW_SIZE]
+        self.assertEqual(
+            parse_datetime(response.data['comments_next_cursor']),
+            oldest.created_at,
+        )
+
+        # the preview is cached, the commenters come from the user cache
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.anonymous_client.get(url)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        # creating, updating and deleting a comment refresh the preview
+        new_comment = self.create_comment(self.user1, tweet, 'newest')
+        response = self.anonymous_client.get(url)
+        self.assertEqual(response.data['comments'][0]['id'], new_comment.id)
+        new_comment.content = 'edited'
+        new_comment.save()
+        response = self.anonymous_client.get(url)
+        self.assertEqual(response.data['comments'][0]['content'], 'edited')
+        new_comment.delete()
+        response = self.anonymous_client.get(url)
+        self.assertEqual(response.data['comments'][0]['id'], comments[-1].id)
+
+    def test_pagination(self):
+        page_size = EndlessPagination.page_size
+        # create page_size * 2 tweets, user1 already has 3 tweets
+        for i in range(page_size * 2 - len(self.tweets1)):
+            self.tweets1.append(self.create_tweet(self.user1, 'tweet{}'.format(i)))
+        tweets = self.tweets1[::-1]
+
+        # pull the first page
+        response = self.user1_client.get(TWEET_LIST_API, {'user_id': self.user1.id})
+        self.assertEqual(response.data['has_next_page'], True)
+        self.assertEqual(len(response.data['tweets']), page_size)
+        self.assertEqual(response.data['tweets'][0]['id'], tweets[0].id)
+        self.assertEqual(response.data['tweets'][1]['id'], tweets[1].id)
+
+        # pull the second page
+        response = self.user1_client.get(TWEET_LIST_API, {
+            'created_before': tweets[page_size - 1].created_at,
+            'user_id': self.user1.id,
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        self.assertEqual(len(response.data['tweets']), page_size)
+        self.assertEqual(response.data['tweets'][0]['id'], tweets[page_size].id)
+        self.assertEqual(response.data['tweets'][-1]['id'], tweets[-1].id)
+
+        # pull latest tweets
+        response = self.user1_client.get(TWEET_LIST_API, {
+            'created_after': tweets[0].created_at,
+            'user_id': self.user1.id,
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        self.assertEqual(len(response.data['tweets']), 0)
+
+        new_tweet = self.create_tweet(self.user1, 'a new tweet comes in')
+        response = self.user1_client.get(TWEET_LIST_API, {
+            'created_after': tweets[0].created_at,
+            'user_id': self.user1.id,
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        self.assertEqual(len(response.data['tweets']), 1)
+        self.assertEqual(response.data['tweets'][0]['id'], new_tweet.id)
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        def count_list_queries():
+            params = {'user_id': self.user1.id}
+            # warm up the cached users
+            self.anonymous_client.get(TWEET_LIST_API, params)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.anonymous_client.get(TWEET_LIST_API, params)
+            return len(response.data['tweets']), len(ctx.captured_queries)
+
+        results_count, small_page_queries = count_list_queries()
+        self.assertEqual(results_count, len(self.tweets1))
+        for i in range(EndlessPagination.page_size):
+            self.create_tweet(self.user1)
+        results_count, full_page_queries = count_list_queries()
+        self.assertEqual(results_count, EndlessPagination.page_size)
+        self.assertEqual(small_page_queries, full_page_queries)
+
+
+class AsyncTweetApiTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.user1 = self.create_user('user1')
+        self.user2 = self.create_user('user2')
+        self.tweets = [self.create_tweet(self.user1) for _ in range(3)]
+        self.create_comment(self.user2, self.tweets[0])
+        self.create_like(self.user2, self.tweets[0])
+        self.user2_client = APIClient()
+        self.user2_client.force_authenticate(self.user2)
+        self.user2_asgi_client = AsgiClient()
+        self.user2_asgi_client.force_login(self.user2)
+
+    def test_list(self):
+        response = self.user2_asgi_client.get(TWEET_LIST_API)
+        self.assertEqual(response.status_code, 400)
+        response = self.user2_asgi_client.get(TWEET_LIST_API, {
+            'user_id': self.user1.id,
+            'created_before': 'yesterday',
+        })
+        self.assertEqual(response.status_code, 400)
+
+        # the async view answers like the sync one
+        for params in [
+            {'user_id': self.user1.id},
+            {'user_id': self.user1.id, 'created_before': self.tweets[1].created_at},
+        ]:
+            response = self.user2_asgi_client.get(TWEET_LIST_API, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                response.json(),
+                self.user2_client.get(TWEET_LIST_API, params).json(),
+            )
+        self.assertEqual(self.user2_asgi_client.last_call.view, 'list_tweets')
+        response = AsgiClient().get(TWEET_LIST_API, {'user_id': self.user1.id})
+        self.assertEqual(response.json()['tweets'][2]['has_liked'], False)
+
+    def test_retrieve(self):
+        url = TWEET_RETRIEVE_API.format(self.tweets[0].id)
+        response = self.user2_asgi_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.user2_client.get(url).json())
+        self.assertEqual(len(response.json()['comments']), 1)
+        self.assertEqual(response.json()['has_liked'], True)
+
+        response = self.user2_asgi_client.get(TWEET_RETRIEVE_API.format(0))
+        self.assertEqual(response.status_code, 404)
+
+    def test_other_requests_go_to_django(self):
+        client = AsgiClient()
+        response = client.request('POST', TWEET_CREATE_API)
+        self.assertEqual(client.last_call.view, None)
+        self.assertEqual(response.status_code, 403)
+
+
+class TweetSearchApiTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.user = self.create_user('user1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_search(self):
+        tweet = self.create_tweet(self.user, 'Django full text search')
+        self.create_tweet(self.user, 'nothing to see')
+
+        # q is required and needs a word
+        response = self.anonymous_client.get(TWEET_SEARCH_API)
+        self.assertEqual(response.status_code, 400)
+        response = self.anonymous_client.get(TWEET_SEARCH_API, {'q': ' ?! '})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.anonymous_client.get(TWEET_SEARCH_API, {'q': 'django SEARCH'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([t['id'] for t in response.data['results']], [tweet.id])
+        self.assertEqual(response.data['results'][0]['user']['id'], self.user.id)
+        self.assertEqual(response.data['results'][0]['has_liked'], False)
+        self.assertEqual(response.data['has_next_page'], False)
+
+        # the user input cannot inject fts5 syntax
+        response = self.anonymous_client.get(TWEET_SEARCH_API, {'q': 'django OR nothing'})
+        self.assertEqual(response.data['results'], [])
+        response = self.anonymous_client.get(TWEET_SEARCH_API, {'q': '"django'})
+        self.assertEqual(len(response.data['results']), 1)
+
+        self.create_like(self.user, tweet)
+        response = self.client.get(TWEET_SEARCH_API, {'q': 'django'})
+        self.assertEqual(response.data['results'][0]['has_liked'], True)
+        self.assertEqual(response.data['results'][0]['likes_count'], 1)
+
+    def test_search_pagination(self):
+        page_size = EndlessPagination.page_size
+        tweets = [
+            self.create_tweet(self.user, 'paginated tweet {}'.format(i))
+            for i in range(page_size * 2)
+        ]
+        self.create_tweet(self.user, 'another one')
+        tweets.reverse()
+
+        response = self.client.get(TWEET_SEARCH_API, {'q': 'paginated'})
+        self.assertEqual(response.data['has_next_page'], True)
+        self.assertEqual(
+            [t['id'] for t in response.data['results']],
+            [t.id for t in tweets[:page_size]],
+        )
+
+        # scroll down
+        response = self.client.get(TWEET_SEARCH_API, {
+            'q': 'paginated',
+            'created_before': response.data['results'][-1]['created_at'],
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        self.assertEqual(
+            [t['id'] for t in response.data['results']],
+            [t.id for t in tweets[page_size:]],
+        )
+
+        # pull to refresh
+        new_tweet = self.create_tweet(self.user, 'paginated tweet again')
+        response = self.client.get(TWEET_SEARCH_API, {
+            'q': 'paginated',
+            'created_after': tweets[0].created_at,
+        })
+        self.assertEqual([t['id'] for t in response.data['results']], [new_tweet.id])
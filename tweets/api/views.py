@@ -1,4 +1,11 @@
+from accounts.services import UserService
+from comments.services import CommentService
+from django.http import Http404
+from functools import partial
+from likes.services import LikeService
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from tweets.api.serializers import (
@@ -7,26 +14,53 @@ from tweets.api.serializers import (
     TweetSerializerWithComments,
 )
 from tweets.models import Tweet
+from tweets.services import TweetService
 from newsfeeds.services import NewsFeedService
-from utils.decorators import required_params
+from utils.decorators import query_budget, required_params
+from utils.full_text import to_match_query
+from utils.paginations import EndlessPagination
 
 
 class TweetViewSet(viewsets.GenericViewSet):
     serializer_class = TweetSerializerForCreate
     queryset = Tweet.objects.all()
+    pagination_class = EndlessPagination
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'search']:
             return [AllowAny()]
         return [IsAuthenticated()]
 
+    @query_budget(max_queries=4)
     @required_params(params=['user_id'])
     def list(self, request):
         user_id = request.query_params['user_id']
         tweets = Tweet.objects.filter(user_id=user_id).order_by('-created_at')
+        tweets = UserService.hydrate_users(self.paginate_queryset(tweets))
+        tweets = LikeService.hydrate_likes(request.user, tweets)
         serializer = TweetSerializer(tweets, many=True)
-        return Response({'tweets': serializer.data})
+        return self.paginator.get_paginated_response(serializer.data, key='tweets')
 
+    @action(methods=['GET'], detail=False)
+    @query_budget(max_queries=3)
+    @required_params(params=['q'])
+    def search(self, request):
+        # the tweets holding every word of q, newest first, read from the
+        # full text index instead of scanning the contents
+        match_query = to_match_query(request.query_params['q'])
+        if match_query is None:
+            raise ValidationError({'q': 'Search for at least one word.'})
+        tweets = self.paginator.paginate_by_cursors(
+            partial(TweetService.search_tweets, match_query),
+            request,
+        )
+        tweets = UserService.hydrate_users(tweets)
+        tweets = LikeService.hydrate_likes(request.user, tweets)
+        serializer = TweetSerializer(tweets, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    # the fanout tasks run eagerly in tests, each batch repeats its insert
+    @query_budget(max_queries=10, allow_duplicates=True)
     def create(self, request):
         serializer = TweetSerializerForCreate(
             data=request.data,
@@ -41,8 +75,19 @@ class TweetViewSet(viewsets.GenericViewSet):
         # save will call create method in TweetSerializerForCreate
         tweet = serializer.save()
         NewsFeedService.fanout_to_followers(tweet)
+        LikeService.hydrate_likes(request.user, [tweet])
         return Response(TweetSerializer(tweet).data, status=201)
 
+    @query_budget(max_queries=5)
     def retrieve(self, request, *args, **kwargs):
-        tweet = self.get_object()
+        tweet = TweetService.get_tweet_through_cache(kwargs['pk'])
+        if tweet is None:
+            raise Http404
+        # only the newest comments are embedded, their users and the author
+        # are loaded in one batch instead of one query per comment
+        comments, has_next_page = CommentService.get_comments_preview(tweet.id)
+        UserService.hydrate_users([tweet] + comments)
+        LikeService.hydrate_likes(request.user, [tweet] + comments)
+        tweet.comments_preview = comments
+        tweet.comments_has_next_page = has_next_page
         return Response(TweetSerializerWithComments(tweet).data)
\ No newline at end of file
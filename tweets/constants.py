@@ -0,0 +1,4 @@
+# the full text index of Tweet.content, see utils.full_text
+TWEET_SEARCH_INDEX = 'tweets'
+# number of tweets indexed by one rebuild_search_index task
+SEARCH_INDEX_CHUNK_SIZE = 1000
@@ -0,0 +1,26 @@
+def index_tweet(sender, instance, created, update_fields=None, **kwargs):
+    # only a new tweet or a changed content is indexed, the saves of the
+    # other fields are not written to the index
+    if not created:
+        if update_fields is not None and 'content' not in update_fields:
+            return
+        if instance.content == getattr(instance, 'loaded_content', None):
+            return
+
+    # import inside the function to avoid the circular import
+    from tweets.services import TweetService
+    TweetService.add_tweets_to_search_index([instance])
+    instance.loaded_content = instance.content
+
+
+def record_trends(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    from trends.services import TrendService
+    TrendService.record_hashtags(instance.content)
+
+
+def unindex_tweet(sender, instance, **kwargs):
+    from tweets.services import TweetService
+    TweetService.remove_tweets_from_search_index([instance.id])
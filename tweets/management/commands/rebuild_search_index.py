@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from tweets.constants import SEARCH_INDEX_CHUNK_SIZE
+from tweets.models import Tweet
+from tweets.services import TweetService
+from tweets.tasks import index_tweets_chunk_task
+
+
+class Command(BaseCommand):
+    help = (
+        'Index the contents of every tweet again. The tweets are split into '
+        'id ranges of --chunk-size tweets, each range is indexed by a celery '
+        'task so that the workers index the chunks in parallel. Tweets are '
+        'replaced in the index, the rebuild can be run again. The workers '
+        'write to the index file at SEARCH_INDEX_LOCATION, they must share it '
+        'with the web processes: one host or one mounted volume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=SEARCH_INDEX_CHUNK_SIZE,
+            help='number of tweets indexed per task',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='empty the index first, the search misses tweets until '
+                 'their chunk is indexed',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            TweetService.get_search_index().clear()
+
+        chunks = 0
+        last_id = None
+        while True:
+            # walk the ids by range, no OFFSET is issued
+            queryset = Tweet.objects.order_by('id').values_list('id', flat=True)
+            if last_id is not None:
+                queryset = queryset.filter(id__gt=last_id)
+            tweet_ids = list(queryset[:options['chunk_size']])
+            if not tweet_ids:
+                break
+            last_id = tweet_ids[-1]
+            index_tweets_chunk_task.delay(tweet_ids[0], tweet_ids[-1])
+            chunks += 1
+        self.stdout.write('{} chunks of tweets queued for indexing'.format(chunks))
@@ -0,0 +1,19 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:25
+
+from django.db import migrations, models
+import utils.snowflake
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweets', '0003_tweet_comments_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tweet',
+            name='id',
+            field=models.BigIntegerField(default=utils.snowflake.generate_id, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweets', '0004_snowflake_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tweet',
+            name='likes_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
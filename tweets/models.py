@@ -1,9 +1,15 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from tweets.listeners import index_tweet, record_trends, unindex_tweet
+from utils.listeners import cache_object, invalidate_object_cache
+from utils.snowflake import generate_id
 from utils.time_helpers import utc_now
 
 
 class Tweet(models.Model):
+    # time ordered and unique across the shards, see utils.snowflake
+    id = models.BigIntegerField(primary_key=True, default=generate_id, editable=False)
     user = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -11,16 +17,42 @@ class Tweet(models.Model):
         help_text='who posts this tweet',
     )
     content = models.CharField(max_length=255)
+    # denormalized counter, updated with F() expressions by the comment
+    # listeners and fixed by the reconcile_counters command if it drifts
+    comments_count = models.IntegerField(default=0)
+    # write-behind counter, the likes are buffered in redis and added to the
+    # row by likes.tasks.flush_likes_counts_task, see utils.buffered_counters
+    likes_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         index_together = (('user', 'created_at'), )
         ordering = ('user', '-created_at')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # the content as loaded, a save which keeps it does not index the
+        # tweet again, see tweets.listeners.index_tweet
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_content = instance.__dict__.get('content')
+        return instance
+
     @property
     def hours_to_now(self):
         return (utc_now() - self.created_at).seconds // 3600
 
     def __str__(self):
         # display contents when executing print(tweet instance)
-        return f'{self.created_at} {self.user}: {self.content}'
\ No newline at end of file
+        return f'{self.created_at} {self.user}: {self.content}'
+
+
+# write through the tweet cache on save, invalidate it on delete
+post_save.connect(cache_object, sender=Tweet)
+post_delete.connect(invalidate_object_cache, sender=Tweet)
+
+# keep the search index of the contents up to date
+post_save.connect(index_tweet, sender=Tweet)
+post_delete.connect(unindex_tweet, sender=Tweet)
+
+# count the hashtags of the trends
+post_save.connect(record_trends, sender=Tweet)
@@ -0,0 +1,108 @@
+from datetime import timedelta
+from django.db.models import F
+from tweets.constants import TWEET_SEARCH_INDEX
+from tweets.models import Tweet
+from utils.full_text import FullTextClient
+from utils.memcached_helper import MemcachedHelper
+from utils.snowflake import min_id_for
+
+
+class TweetService(object):
+
+    @classmethod
+    def get_tweet_through_cache(cls, tweet_id):
+        # returns None if the tweet does not exist
+        return MemcachedHelper.get_object_through_cache(Tweet, tweet_id)
+
+    @classmethod
+    def get_tweets_through_cache(cls, tweet_ids):
+        # returns {tweet_id: tweet} with one cache multi-get, the misses are
+        # loaded with a single IN query
+        return MemcachedHelper.get_objects_through_cache(Tweet, tweet_ids)
+
+    @classmethod
+    def incr_comments_count(cls, tweet_id, delta):
+        # update() does not send post_save, invalidate the cached tweet here
+        Tweet.objects.filter(id=tweet_id).update(
+            comments_count=F('comments_count') + delta,
+        )
+        MemcachedHelper.invalidate_cached_object(Tweet, tweet_id)
+
+    @classmethod
+    def get_search_index(cls):
+        return FullTextClient.get_index(TWEET_SEARCH_INDEX)
+
+    @classmethod
+    def add_tweets_to_search_index(cls, tweets):
+        cls.get_search_index().put_many(
+            (tweet.id, tweet.content)
+            for tweet in tweets
+        )
+
+    @classmethod
+    def remove_tweets_from_search_index(cls, tweet_ids):
+        cls.get_search_index().delete_many(tweet_ids)
+
+    @classmethod
+    def search_tweets(cls, match_query, created_before=None, created_after=None):
+        """
+        the tweets matching an utils.full_text.to_match_query query, newest
+        first, as a lazy sequence which paginate_by_cursors can slice
+        """
+        return TweetSearchResults(
+            cls.get_search_index(),
+            match_query,
+            created_before,
+            created_after,
+        )
+
+
+class TweetSearchResults:
+    """
+    the posting lists are sorted by tweet id, a snowflake id is generated
+    just before created_at is set, so the created_at cursors are turned into
+    slightly wider id ranges and the tweets out of the cursors are dropped
+    once loaded. the tweets deleted since they were indexed are dropped too.
+    """
+    # the lower bound of the ids is widened by the time between the id and
+    # created_at of a tweet
+    CREATED_AFTER_SLACK = timedelta(seconds=1)
+
+    def __init__(self, index, match_query, created_before, created_after):
+        self.index = index
+        self.match_query = match_query
+        self.created_before = created_before
+        self.created_after = created_after
+
+    def in_range(self, tweet):
+        if self.created_before is not None and tweet.created_at >= self.created_before:
+            return False
+        if self.created_after is not None and tweet.created_at <= self.created_after:
+            return False
+        return True
+
+    def fetch(self, limit):
+        max_id, min_id = None, None
+        if self.created_before is not None:
+            max_id = min_id_for(self.created_before + timedelta(milliseconds=1))
+        if self.created_after is not None:
+            min_id = min_id_for(self.created_after - self.CREATED_AFTER_SLACK)
+        tweets = []
+        while len(tweets) < limit:
+            chunk_size = limit - len(tweets)
+            tweet_ids = self.index.search(self.match_query, max_id, min_id, chunk_size)
+            tweets_by_id = TweetService.get_tweets_through_cache(tweet_ids)
+            tweets.extend(
+                tweets_by_id[tweet_id]
+                for tweet_id in tweet_ids
+                if tweet_id in tweets_by_id and self.in_range(tweets_by_id[tweet_id])
+            )
+            if len(tweet_ids) < chunk_size:
+                break
+            max_id = tweet_ids[-1]
+        return tweets
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.start or index.step or index.stop is None:
+            raise TypeError('search results only support [:limit] slices')
+        return self.fetch(index.stop)
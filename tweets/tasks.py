@@ -0,0 +1,21 @@
+from celery import shared_task
+from utils.time_constants import ONE_HOUR
+
+
+@shared_task(
+    time_limit=ONE_HOUR,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+)
+def index_tweets_chunk_task(min_id, max_id):
+    # import inside the task to avoid the circular import with services
+    from tweets.models import Tweet
+    from tweets.services import TweetService
+
+    tweets = list(Tweet.objects.filter(
+        id__gte=min_id,
+        id__lte=max_id,
+    ).only('id', 'content'))
+    TweetService.add_tweets_to_search_index(tweets)
+    return '{} tweets indexed'.format(len(tweets))
@@ -1,8 +1,25 @@
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
+from testing.testcases import TestCase as TwitterTestCase
 from tweets.models import Tweet
+from tweets.services import TweetService
+from unittest import mock
+from utils.snowflake import (
+    MAX_SEQUENCE,
+    SEQUENCE_BITS,
+    SLOT_BITS,
+    SnowflakeGenerator,
+    generate_id,
+    get_id_timestamp,
+    min_id_for,
+)
+from utils.full_text import to_match_query
+from utils.memcached_helper import MemcachedHelper
 from utils.time_helpers import utc_now
 from datetime import timedelta
+from io import StringIO
+import multiprocessing
 
 
 class TweetTests(TestCase):
@@ -13,3 +30,198 @@ class TweetTests(TestCase):
         tweet.created_at = utc_now() - timedelta(hours=10)
         tweet.save()
         self.assertEqual(tweet.hours_to_now, 10)
+
+
+class TweetServiceTests(TwitterTestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+
+    def test_get_tweet_through_cache(self):
+        tweet = self.create_tweet(self.alfredo, 'original content')
+
+        # the tweet is written through on create
+        with self.assertNumQueries(0):
+            cached_tweet = TweetService.get_tweet_through_cache(tweet.id)
+        self.assertEqual(cached_tweet.content, 'original content')
+
+        # the cache is updated on save
+        tweet.content = 'new content'
+        tweet.save()
+        with self.assertNumQueries(0):
+            cached_tweet = TweetService.get_tweet_through_cache(str(tweet.id))
+        self.assertEqual(cached_tweet.content, 'new content')
+
+        # the cache is invalidated on delete
+        tweet_id = tweet.id
+        tweet.delete()
+        self.assertEqual(TweetService.get_tweet_through_cache(tweet_id), None)
+        self.assertEqual(TweetService.get_tweet_through_cache('invalid'), None)
+
+    def test_get_tweets_through_cache(self):
+        tweets = [self.create_tweet(self.alfredo) for _ in range(3)]
+        tweet_ids = [tweet.id for tweet in tweets]
+        self.clear_cache()
+
+        # the misses are loaded with one query and cached
+        with self.assertNumQueries(1):
+            cached_tweets = TweetService.get_tweets_through_cache(tweet_ids + [-1])
+        self.assertEqual(sorted(cached_tweets.keys()), tweet_ids)
+        with self.assertNumQueries(0):
+            cached_tweets = TweetService.get_tweets_through_cache(tweet_ids)
+        self.assertEqual(sorted(cached_tweets.keys()), tweet_ids)
+        self.assertEqual(cached_tweets[tweet_ids[0]].user_id, self.alfredo.id)
+
+
+def generate_ids(count):
+    return [generate_id() for _ in range(count)]
+
+
+class TweetSearchTests(TwitterTestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.alfredo = self.create_user('alfredo')
+
+    def search(self, text, **kwargs):
+        results = TweetService.search_tweets(to_match_query(text), **kwargs)
+        return [tweet.id for tweet in results[:100]]
+
+    def test_to_match_query(self):
+        self.assertEqual(to_match_query('Hello, world!'), '"Hello" "world"')
+        # the fts5 syntax is quoted away
+        self.assertEqual(to_match_query('a OR "b" NEAR(c*)'), '"a" "OR" "b" "NEAR" "c"')
+        self.assertEqual(to_match_query('?! '), None)
+
+    def test_index_on_create_and_delete(self):
+        tweet1 = self.create_tweet(self.alfredo, 'Hello world, café time')
+        tweet2 = self.create_tweet(self.alfredo, 'hello again')
+        self.create_tweet(self.alfredo, 'something else')
+
+        # newest first, case and accents are folded
+        self.assertEqual(self.search('HELLO'), [tweet2.id, tweet1.id])
+        self.assertEqual(self.search('hello world'), [tweet1.id])
+        self.assertEqual(self.search('cafe'), [tweet1.id])
+        self.assertEqual(self.search('nothing'), [])
+
+        # an edit replaces the indexed content
+        tweet1.content = 'goodbye world'
+        tweet1.save()
+        self.assertEqual(self.search('hello'), [tweet2.id])
+        self.assertEqual(self.search('goodbye'), [tweet1.id])
+
+        tweet2.delete()
+        self.assertEqual(self.search('hello'), [])
+
+    def test_saves_of_other_fields_are_not_indexed(self):
+        tweet = self.create_tweet(self.alfredo, 'hello world')
+        with mock.patch.object(TweetService, 'add_tweets_to_search_index') as index:
+            tweet.likes_count = 1
+            tweet.save()
+            tweet = Tweet.objects.get(id=tweet.id)
+            tweet.comments_count = 1
+            tweet.save()
+            tweet.content = 'hello again'
+            tweet.save(update_fields=['comments_count'])
+            self.assertEqual(index.call_count, 0)
+
+            tweet.save(update_fields=['content'])
+            self.assertEqual(index.call_count, 1)
+            tweet = Tweet.objects.get(id=tweet.id)
+            tweet.content = 'goodbye'
+            tweet.save()
+            self.assertEqual(index.call_count, 2)
+
+    def test_search_cursors(self):
+        tweets = [self.create_tweet(self.alfredo, 'tweet {}'.format(i)) for i in range(5)]
+        ids = [tweet.id for tweet in reversed(tweets)]
+        self.assertEqual(self.search('tweet', created_before=tweets[3].created_at), ids[2:])
+        self.assertEqual(self.search('tweet', created_after=tweets[1].created_at), ids[:3])
+        self.assertEqual(TweetService.search_tweets('"tweet"')[:2], list(reversed(tweets))[:2])
+
+    def test_stale_index(self):
+        # a tweet deleted without its signal is dropped from the results
+        tweets = [self.create_tweet(self.alfredo, 'tweet {}'.format(i)) for i in range(3)]
+        Tweet.objects.filter(id=tweets[2].id)._raw_delete('default')
+        MemcachedHelper.invalidate_cached_object(Tweet, tweets[2].id)
+        self.assertEqual(TweetService.search_tweets('"tweet"')[:2], [tweets[1], tweets[0]])
+
+    def test_rebuild_search_index(self):
+        tweets = [self.create_tweet(self.alfredo, 'tweet {}'.format(i)) for i in range(5)]
+        # bulk_create sends no signal
+        bulk_tweet = Tweet.objects.bulk_create([
+            Tweet(user=self.alfredo, content='bulk tweet'),
+        ])[0]
+        self.assertEqual(self.search('bulk'), [])
+        TweetService.get_search_index().put_many([(12345, 'stale tweet')])
+
+        out = StringIO()
+        call_command('rebuild_search_index', chunk_size=2, clear=True, stdout=out)
+        self.assertIn('3 chunks of tweets queued for indexing', out.getvalue())
+        self.assertEqual(self.search('bulk'), [bulk_tweet.id])
+        self.assertEqual(self.search('stale'), [])
+        self.assertEqual(
+            self.search('tweet'),
+            [bulk_tweet.id] + [tweet.id for tweet in reversed(tweets)],
+        )
+
+        # the tweets are replaced, not indexed twice
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('tweet')), 6)
+
+
+class SnowflakeTests(TestCase):
+
+    def test_ids_are_time_ordered(self):
+        ids = generate_ids(5000)
+        self.assertEqual(sorted(ids), ids)
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(max(ids) < 2 ** 63, True)
+        now = utc_now()
+        self.assertEqual(abs(get_id_timestamp(ids[-1]) - now) < timedelta(seconds=1), True)
+        self.assertEqual(min_id_for(now - timedelta(seconds=10)) < ids[0], True)
+
+        hippo = User.objects.create_user(username='hippo')
+        tweets = [Tweet.objects.create(user=hippo, content=str(i)) for i in range(3)]
+        self.assertEqual(
+            [tweet.id for tweet in tweets],
+            sorted(tweet.id for tweet in tweets),
+        )
+        self.assertEqual(tweets[0].id > ids[-1], True)
+
+    def test_sequence_overflow_and_clock_going_backwards(self):
+        SnowflakeGenerator.next_id()
+        last_ms = SnowflakeGenerator.last_ms
+        SnowflakeGenerator.sequence = 0
+        # the sequence of one millisecond runs out, the next id waits for
+        # the next millisecond
+        clock = [last_ms] * (MAX_SEQUENCE + 1) + [last_ms + 1]
+        with mock.patch('utils.snowflake.current_ms', side_effect=clock):
+            ids = [SnowflakeGenerator.next_id() for _ in range(MAX_SEQUENCE + 1)]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(sorted(ids), ids)
+
+        # the clock moved back, the id waits for the last timestamp
+        clock = [last_ms - 5, last_ms + 2]
+        with mock.patch('utils.snowflake.current_ms', side_effect=clock):
+            with mock.patch('utils.snowflake.time.sleep') as sleep:
+                snowflake_id = SnowflakeGenerator.next_id()
+        sleep.assert_called_once()
+        self.assertEqual(snowflake_id > ids[-1], True)
+
+    def test_processes_lease_distinct_slots(self):
+        generate_id()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(4) as pool:
+            batches = pool.map(generate_ids, [2000] * 4)
+        ids = generate_ids(2000)
+        all_ids = [snowflake_id for batch in batches for snowflake_id in batch]
+        all_ids += ids
+        self.assertEqual(len(set(all_ids)), len(all_ids))
+        slot_mask = (1 << SLOT_BITS) - 1
+        slots = set(
+            (batch[0] >> SEQUENCE_BITS) & slot_mask
+            for batch in batches + [ids]
+        )
+        self.assertEqual(len(slots), 5)
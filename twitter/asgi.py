@@ -13,4 +13,25 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'twitter.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported once the apps are loaded
+from friendships.api.async_views import list_followers, list_followings  # noqa: E402
+from newsfeeds.api.async_views import list_newsfeeds  # noqa: E402
+from newsfeeds.api.streaming import poll_newsfeeds, stream_newsfeeds  # noqa: E402
+from tweets.api.async_views import list_tweets, retrieve_tweet  # noqa: E402
+from utils.asgi import AsgiRouter  # noqa: E402
+
+# the read heavy and the long lived requests are served by raw ASGI apps
+# next to Django, see utils.asgi. everything else goes to the Django views
+ASYNC_ROUTES = [
+    (r'/api/tweets/', ['GET'], list_tweets),
+    (r'/api/tweets/(?P<pk>\d+)/', ['GET'], retrieve_tweet),
+    (r'/api/newsfeeds/', ['GET'], list_newsfeeds),
+    (r'/api/newsfeeds/poll/', ['GET'], poll_newsfeeds),
+    (r'/api/newsfeeds/stream/', ['GET'], stream_newsfeeds),
+    (r'/api/friendships/(?P<pk>\d+)/followers/', ['GET'], list_followers),
+    (r'/api/friendships/(?P<pk>\d+)/followings/', ['GET'], list_followings),
+]
+
+application = AsgiRouter(ASYNC_ROUTES, django_application)
@@ -0,0 +1,18 @@
+# redis
+USER_NEWSFEEDS_PATTERN = 'user_newsfeeds:{user_id}'
+NEWSFEED_PUSHED_PATTERN = 'newsfeed_pushed:{tweet_id}'
+USER_FOLLOWER_IDS_PATTERN = 'user_follower_ids:{user_id}'
+USER_FOLLOWING_IDS_PATTERN = 'user_following_ids:{user_id}'
+TWEET_COMMENTS_PATTERN = 'tweet_comments:{tweet_id}'
+COUNTER_BUFFER_PATTERN = 'counter_buffer:{model_label}:{field}'
+NOTIFICATION_EVENTS_KEY = 'notification_events'
+NOTIFICATION_PROCESSING_EVENTS_KEY = 'notification_events:processing'
+NOTIFICATION_WRITER_LOCK_KEY = 'notification_events:lock'
+USER_UNREAD_NOTIFICATIONS_COUNT_PATTERN = 'user_unread_notifications_count:{user_id}'
+TRENDS_SKETCH_PATTERN = 'trends_sketch:{name}:{minute}'
+TRENDS_CANDIDATES_PATTERN = 'trends_candidates:{name}:{minute}'
+TRENDS_PATTERN = 'trends:{kind}'
+PUBSUB_CHANNEL_PATTERN = 'pubsub:{channel}'
+
+# memcached
+TWEET_COMMENTS_PREVIEW_PATTERN = 'tweet_comments_preview:{tweet_id}'
@@ -0,0 +1,27 @@
+import os
+
+from celery import Celery
+
+# set the default Django settings module for the 'celery' program.
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'twitter.settings')
+
+app = Celery('twitter')
+
+# Using a string here means the worker doesn't have to serialize
+# the configuration object to child processes.
+# - namespace='CELERY' means all celery-related configuration keys
+#   should have a `CELERY_` prefix.
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# Load task modules from all registered Django app configs.
+app.autodiscover_tasks()
+
+
+@app.on_after_configure.connect
+def create_filesystem_broker_folders(sender, **kwargs):
+    # the filesystem transport used as the local broker does not create
+    # its message folders, so make sure they exist for producers and workers
+    if not sender.conf.broker_url.startswith('filesystem://'):
+        return
+    for folder in sender.conf.broker_transport_options.values():
+        os.makedirs(folder, exist_ok=True)
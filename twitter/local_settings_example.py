@@ -35,4 +35,43 @@ DATABASES = {
         'USER': 'root',
         'PASSWORD': 'yourpassword',
     }
-}
\ No newline at end of file
+}
+# use redis as the celery broker instead of the local filesystem stand-in
+# CELERY_BROKER_URL = 'redis://127.0.0.1:6379/2'
+
+# share the object cache between processes with memcached
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+#         'LOCATION': '127.0.0.1:11211',
+#         'TIMEOUT': 86400,
+#     },
+#     'testing': {
+#         'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+#         'LOCATION': '127.0.0.1:11211',
+#         'TIMEOUT': 86400,
+#         'KEY_PREFIX': 'testing',
+#     },
+# }
+
+# shard the newsfeeds over another database, create its tables with:
+# python manage.py migrate --database=newsfeeds_shard_1
+# DATABASES['newsfeeds_shard_1'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': 'newsfeeds_shard_1.sqlite3',
+# }
+# NEWSFEED_SHARDS = ['default', 'newsfeeds_shard_1']
+
+# every host generating ids needs a distinct host id, 0 to 31
+# SNOWFLAKE_HOST_ID = 1
+
+# read the GET requests from a replica of the default database
+# DATABASES['replica'] = {
+#     'ENGINE': 'django.db.backends.mysql',
+#     'NAME': 'twitter',
+#     'HOST': '10.0.0.2',
+#     'PORT': '3306',
+#     'USER': 'readonly',
+#     'PASSWORD': 'yourpassword',
+# }
+# DATABASE_REPLICAS = ['replica']
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,6 +26,8 @@ SECRET_KEY = 'p8lltj3168)exru@2%vy7)!_mt-f_2w15jt$9c^_ep(uzd6d=1'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
+TESTING = ((" ".join(sys.argv)).find('manage.py test') != -1)
+
 ALLOWED_HOSTS = ['127.0.0.1', '192.168.33.10', 'localhost']
 INTERNAL_IPS = ['10.0.2.2']
 
@@ -50,6 +53,10 @@ INSTALLED_APPS = [
     'friendships',
     'newsfeeds',
     'comments',
+    'likes',
+    'notifications',
+    'trends',
+    'benchmarks',
 ]
 
 REST_FRAMEWORK = {
@@ -69,6 +76,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'utils.middlewares.ReadYourWritesMiddleware',
 ]
 
 ROOT_URLCONF = 'twitter.urls'
@@ -130,7 +138,128 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# the local-memory cache is a per-process stand-in, point both aliases to
+# memcached in local_settings.py when running more than one process
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'TIMEOUT': 86400,
+    },
+    'testing': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'TIMEOUT': 86400,
+        'KEY_PREFIX': 'testing',
+    },
+}
+
+# Redis
+# fakeredis is used as an in-process stand-in when REDIS_USE_FAKE is True
+REDIS_HOST = '127.0.0.1'
+REDIS_PORT = 6379
+REDIS_DB = 0 if TESTING else 1
+REDIS_USE_FAKE = TESTING
+REDIS_KEY_EXPIRE_TIME = 7 * 86400  # in seconds
+# number of newest objects kept in a cached list, older ones are read from db
+REDIS_LIST_LENGTH_LIMIT = 1000 if not TESTING else 20
+
+# tweets of users with more followers than this are not fanned out to
+# their followers, the followers pull them when reading their newsfeeds
+CELEBRITY_FOLLOWERS_THRESHOLD = 100000
+
+# NewsFeed rows are sharded by user_id over the NEWSFEED_SHARDS aliases of
+# DATABASES, every other model stays on the default database. append an
+# alias to add a shard then run rebalance_newsfeed_shards, only the
+# newsfeeds of about 1 / len(NEWSFEED_SHARDS) of the users are moved
+DATABASE_ROUTERS = [
+    'newsfeeds.routers.NewsFeedShardRouter',
+    'utils.routers.ReplicaRouter',
+]
+NEWSFEED_SHARDS = ['default']
+
+# aliases of DATABASES which replicate the default database, the GET
+# requests read from them. a client which wrote is pinned to the primary
+# for PIN_TO_PRIMARY_SECONDS, longer than the replication lag
+DATABASE_REPLICAS = []
+PIN_TO_PRIMARY_SECONDS = 10
+
+# Friendship and NewsFeed are always read by user, then by time range. they
+# can be stored in the relational databases or in a wide-column store:
+# 'relational' or 'wide_column'. run copy_friendships_to_wide_column and
+# copy_newsfeeds_to_wide_column before switching a model
+MODEL_STORAGE_BACKENDS = {
+    'friendships.Friendship': 'relational',
+    'newsfeeds.NewsFeed': 'relational',
+}
+# the embedded, file-backed stand-in of the wide-column store
+WIDE_COLUMN_LOCATION = ':memory:' if TESTING else str(BASE_DIR / 'wide_column.sqlite3')
+
+# the embedded, file-backed full text index of the tweets, rebuild it with
+# rebuild_search_index. the web processes and the celery workers must share
+# this file, run them on one host or mount one volume here
+SEARCH_INDEX_LOCATION = ':memory:' if TESTING else str(BASE_DIR / 'search_index.sqlite3')
+
+# the new newsfeeds are pushed to the streaming clients through an
+# in-process hub. the fanout runs in the celery workers, RedisBackend
+# carries the messages from them to the ASGI processes
+PUBSUB_BACKEND = 'utils.pubsub.InProcessBackend' if TESTING else 'utils.pubsub.RedisBackend'
+
+# twitter.asgi serves the read heavy endpoints with async views, their
+# blocking ORM and cache calls run in the thread pool of the event loop.
+# the tests run them in the thread of the test transaction instead
+ASYNC_VIEWS_THREAD_SENSITIVE = TESTING
+
+# Tweet, NewsFeed and Comment use time ordered 64 bit ids. every host needs
+# its own SNOWFLAKE_HOST_ID (0 to 31), the processes of a host lease one of
+# 32 slots through the lock files in SNOWFLAKE_LOCK_DIR
+SNOWFLAKE_HOST_ID = 0
+SNOWFLAKE_LOCK_DIR = str(BASE_DIR / 'snowflake_locks')
+
+# Celery Configuration Options
+# https://docs.celeryproject.org/en/stable/django/first-steps-with-django.html
+# start a worker with: celery -A twitter worker -l INFO
+# the filesystem transport is a local stand-in broker that needs no external
+# service, point CELERY_BROKER_URL to redis in local_settings.py on servers
+CELERY_BROKER_URL = 'filesystem://'
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'data_folder_in': str(BASE_DIR / 'celery_broker'),
+    'data_folder_out': str(BASE_DIR / 'celery_broker'),
+}
+CELERY_TIMEZONE = 'UTC'
+# run tasks synchronously in the calling process, used by unit tests
+CELERY_TASK_ALWAYS_EAGER = TESTING
+CELERY_TASK_EAGER_PROPAGATES = TESTING
+# start the scheduler with: celery -A twitter beat -l INFO
+CELERY_BEAT_SCHEDULE = {
+    # the buffered likes counts are written to the rows in batches
+    'flush-likes-counts': {
+        'task': 'likes.tasks.flush_likes_counts_task',
+        'schedule': 10.0,
+    },
+    # the queued notification events are written in batches
+    'write-notifications': {
+        'task': 'notifications.tasks.write_notifications_task',
+        'schedule': 5.0,
+    },
+    # the trends are counted as the tweets come, the top lists are
+    # snapshotted for the readers
+    'take-trends-snapshots': {
+        'task': 'trends.tasks.take_trends_snapshots_task',
+        'schedule': 60.0,
+    },
+}
+
 try:
     from .local_settings import *
 except:
     pass
+
+# DATABASES comes from local_settings.py, add in-memory sqlite shards to it
+# so that the sharding tests can switch NEWSFEED_SHARDS over to them
+if TESTING and 'DATABASES' in globals():
+    for alias in ('newsfeeds_shard_1', 'newsfeeds_shard_2'):
+        DATABASES.setdefault(alias, {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': str(BASE_DIR / '{}.sqlite3'.format(alias)),
+        })
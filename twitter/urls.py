@@ -18,8 +18,11 @@ from comments.api.views import CommentViewSet
 from django.contrib import admin
 from django.urls import include, path
 from friendships.api.views import FriendshipViewSet
+from likes.api.views import LikeViewSet
 from newsfeeds.api.views import NewsFeedViewSet
+from notifications.api.views import NotificationViewSet
 from rest_framework import routers
+from trends.api.views import TrendViewSet
 from tweets.api.views import TweetViewSet
 
 import debug_toolbar
@@ -31,6 +34,9 @@ router.register(r'api/tweets', TweetViewSet, basename='tweets')
 router.register(r'api/friendships', FriendshipViewSet, basename='friendships')
 router.register(r'api/newsfeeds', NewsFeedViewSet, basename='newsfeeds')
 router.register(r'api/comments', CommentViewSet, basename='comments')
+router.register(r'api/likes', LikeViewSet, basename='likes')
+router.register(r'api/notifications', NotificationViewSet, basename='notifications')
+router.register(r'api/trends', TrendViewSet, basename='trends')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
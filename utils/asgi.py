@@ -0,0 +1,216 @@
+from asgiref.sync import sync_to_async
+from contextlib import nullcontext
+from django.conf import settings
+from django.contrib import auth
+from django.core import signals
+from django.db import close_old_connections
+from django.http import Http404, HttpRequest, QueryDict
+from django.http.cookie import parse_cookie
+from functools import partial, wraps
+from importlib import import_module
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from utils.middlewares import is_pinned_to_primary
+from utils.routers import read_from_replicas
+import json
+import re
+
+NOT_AUTHENTICATED = {'detail': 'Authentication credentials were not provided.'}
+NOT_FOUND = {'detail': 'Not found.'}
+
+
+def get_cookie_request(scope):
+    # an HttpRequest with the cookies of the raw ASGI request
+    request = HttpRequest()
+    request.COOKIES = parse_cookie('; '.join(
+        value.decode('latin1')
+        for name, value in scope['headers']
+        if name == b'cookie'
+    ))
+    return request
+
+
+def authenticate(scope):
+    # the session cookie authenticates the raw ASGI requests like the
+    # others, called with run_sync
+    request = get_cookie_request(scope)
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME),
+    )
+    return auth.get_user(request)
+
+
+def replica_reads_for(scope):
+    # the reads of a raw ASGI request go to the replicas unless its client
+    # wrote recently, like ReadYourWritesMiddleware does for the others.
+    # the raw ASGI views only read, they never pin a client themselves
+    if is_pinned_to_primary(get_cookie_request(scope)):
+        return nullcontext()
+    return read_from_replicas()
+
+
+def get_header(scope, header):
+    for name, value in scope['headers']:
+        if name == header:
+            return value.decode('latin1')
+    return None
+
+
+async def send_json(send, status_code, data):
+    await send({
+        'type': 'http.response.start',
+        'status': status_code,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps(data).encode(),
+    })
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+def _call_in_pool(func, *args, **kwargs):
+    # the threads of the pool hold a connection each, drop it once it is
+    # obsolete like the request_finished of the sync requests does
+    close_old_connections()
+    return func(*args, **kwargs)
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    run a blocking call of the ORM or of the cache clients, which have no
+    async api in Django 3.1, in a thread of the pool of the event loop.
+    a request makes as few calls as it can, the independent ones can be
+    awaited together. ASYNC_VIEWS_THREAD_SENSITIVE runs them in the thread
+    of the test transaction instead
+    """
+    if settings.ASYNC_VIEWS_THREAD_SENSITIVE:
+        return await sync_to_async(func)(*args, **kwargs)
+    return await sync_to_async(
+        partial(_call_in_pool, func),
+        thread_sensitive=False,
+    )(*args, **kwargs)
+
+
+class AsyncRequest:
+    """
+    the request of a raw ASGI view, it has the attributes of the DRF
+    requests which the paginators and the services read
+    """
+
+    def __init__(self, scope, user, kwargs):
+        self.scope = scope
+        self.method = scope['method']
+        self.path = scope['path']
+        self.user = user
+        self.query_params = QueryDict(scope['query_string'].decode('latin1'))
+        self.kwargs = kwargs
+
+
+async def send_response(send, response):
+    # rendered like the DRF views, so both paths answer the same bytes
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': JSONRenderer().render(response.data),
+    })
+
+
+def async_view(authenticated=False):
+    """
+    turn an async function of an AsyncRequest, which returns a DRF
+    Response, into a raw ASGI app. the async views are served next to
+    Django by twitter.asgi: Django 3.1 runs the async views below the sync
+    middlewares in a single thread shared by the requests, which would
+    serialize them again. the session and the user of a logged in request
+    cost two queries, the @query_budget of an async view counts them
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def app(scope, receive, send):
+            await run_sync(signals.request_started.send, sender=app, scope=scope)
+            try:
+                with replica_reads_for(scope):
+                    await serve(scope, send)
+            finally:
+                await run_sync(signals.request_finished.send, sender=app)
+
+        async def serve(scope, send):
+            user = await run_sync(authenticate, scope)
+            if authenticated and not user.is_authenticated:
+                response = Response(NOT_AUTHENTICATED, status=status.HTTP_403_FORBIDDEN)
+            else:
+                request = AsyncRequest(scope, user, scope.get('url_route', {}).get('kwargs', {}))
+                try:
+                    response = await view_func(request)
+                except Http404:
+                    response = Response(NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
+                except APIException as exc:
+                    response = Response(exc.detail, status=exc.status_code)
+            await send_response(send, response)
+        return app
+    return decorator
+
+
+def required_params(params):
+    # the @required_params of the async views, reads the query params
+    def decorator(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request):
+            missing_params = [
+                param
+                for param in params
+                if param not in request.query_params
+            ]
+            if missing_params:
+                return Response({
+                    'message': u'missing {} in request'.format(','.join(missing_params)),
+                    'success': False,
+                }, status=status.HTTP_400_BAD_REQUEST)
+            return await view_func(request)
+        return _wrapped_view
+    return decorator
+
+
+class AsgiRouter:
+    """
+    route the http requests of some paths to raw ASGI apps, everything else
+    goes to the Django application. a route is (path regex, methods, app),
+    the named groups of the regex are passed in scope['url_route']
+    """
+
+    def __init__(self, routes, default_app):
+        self.routes = [
+            (re.compile(pattern), set(methods), app)
+            for pattern, methods, app in routes
+        ]
+        self.default_app = default_app
+
+    def resolve(self, scope):
+        if scope['type'] != 'http':
+            return None, None
+        for regex, methods, app in self.routes:
+            match = regex.fullmatch(scope['path'])
+            if match is not None and scope['method'] in methods:
+                return app, match.groupdict()
+        return None, None
+
+    async def __call__(self, scope, receive, send):
+        app, kwargs = self.resolve(scope)
+        if app is None:
+            return await self.default_app(scope, receive, send)
+        scope = dict(scope, url_route={'kwargs': kwargs})
+        return await app(scope, receive, send)
@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.db.models import F
+from redis.exceptions import ResponseError
+from twitter.cache import COUNTER_BUFFER_PATTERN
+from utils.redis_client import RedisClient
+from utils.redis_helper import RedisHelper
+from utils.time_constants import ONE_MINUTE
+
+# the lock of a flush outlives the time_limit of the flush tasks, so that it
+# does not expire under a running flush
+FLUSH_LOCK_TIMEOUT = 2 * ONE_MINUTE
+
+
+class BufferedCounter:
+    """
+    write-behind buffer of a denormalized counter column, e.g.
+    Tweet.likes_count. the increments go to a redis hash instead of the row,
+    so that the row of a viral tweet is not locked by every like. flush()
+    applies the summed deltas with one UPDATE per object, the reads add the
+    pending deltas to the stored counts.
+    """
+
+    def __init__(self, model_class, field):
+        self.model_class = model_class
+        self.field = field
+        self.buffer_key = COUNTER_BUFFER_PATTERN.format(
+            model_label=model_class._meta.label_lower,
+            field=field,
+        )
+        # the deltas being flushed, they are still pending until the flush
+        # is done
+        self.flushing_key = '{}:flushing'.format(self.buffer_key)
+        self.lock_key = '{}:lock'.format(self.buffer_key)
+
+    def incr(self, object_id, delta=1):
+        conn = RedisClient.get_connection()
+        conn.hincrby(self.buffer_key, object_id, delta)
+
+    def get_pending_deltas(self, object_ids):
+        # returns {object_id: delta} with one round trip
+        object_ids = list(object_ids)
+        if not object_ids:
+            return {}
+        conn = RedisClient.get_connection()
+        pipeline = conn.pipeline()
+        pipeline.hmget(self.buffer_key, object_ids)
+        pipeline.hmget(self.flushing_key, object_ids)
+        buffered, flushing = pipeline.execute()
+        return {
+            object_id: int(buffered_delta or 0) + int(flushing_delta or 0)
+            for object_id, buffered_delta, flushing_delta
+            in zip(object_ids, buffered, flushing)
+        }
+
+    def get_counts(self, objects):
+        # returns {object_id: count} of objects loaded from the database
+        objects = list(objects)
+        deltas = self.get_pending_deltas([obj.id for obj in objects])
+        return {
+            obj.id: max(getattr(obj, self.field) + deltas[obj.id], 0)
+            for obj in objects
+        }
+
+    def flush(self):
+        """
+        apply the buffered deltas to the rows, returns the ids of the
+        updated objects. the buffer is moved aside first, so increments made
+        meanwhile go to a new buffer. a flush which failed leaves its deltas
+        aside, the next flush applies them before it moves the buffer again.
+        the deltas aside are deleted right before the commit and restored if
+        it fails, a flush which dies in between loses them rather than
+        applying them twice.
+        """
+        conn = RedisClient.get_connection()
+        # only one flush at a time
+        token = RedisHelper.acquire_lock(self.lock_key, FLUSH_LOCK_TIMEOUT)
+        if token is None:
+            return []
+        try:
+            if not conn.exists(self.flushing_key):
+                try:
+                    conn.renamenx(self.buffer_key, self.flushing_key)
+                except ResponseError:
+                    # nothing is buffered
+                    return []
+            deltas = {
+                int(object_id): int(delta)
+                for object_id, delta in conn.hgetall(self.flushing_key).items()
+                if int(delta) != 0
+            }
+            deleted = False
+            try:
+                with transaction.atomic():
+                    for object_id, delta in deltas.items():
+                        self.model_class.objects.filter(id=object_id).update(**{
+                            self.field: F(self.field) + delta,
+                        })
+                    conn.delete(self.flushing_key)
+                    deleted = True
+            except Exception:
+                if deleted:
+                    self.restore_flushing_deltas(deltas)
+                raise
+            return list(deltas.keys())
+        finally:
+            RedisHelper.release_lock(self.lock_key, token)
+
+    def restore_flushing_deltas(self, deltas):
+        # HINCRBY, the deltas are pending again for the readers and the
+        # next flush
+        conn = RedisClient.get_connection()
+        pipeline = conn.pipeline()
+        for object_id, delta in deltas.items():
+            pipeline.hincrby(self.flushing_key, object_id, delta)
+        pipeline.execute()
@@ -26,3 +26,20 @@ def required_params(request_attr='query_params', params=None):
             return view_func(instance, request, *args, **kwargs)
         return _wrapped_view
     return decorator
+
+
+def query_budget(max_queries, allow_duplicates=False, max_time_ms=None):
+    """
+    declare the budget of an API view, it costs nothing at runtime: the
+    instrumented test client (testing.clients.APIClient) reads it and fails
+    the test when a call issues more than max_queries queries, issues the
+    same query shape twice, or takes longer than max_time_ms.
+    """
+    def decorator(view_func):
+        view_func.query_budget = {
+            'max_queries': max_queries,
+            'allow_duplicates': allow_duplicates,
+            'max_time_ms': max_time_ms,
+        }
+        return view_func
+    return decorator
@@ -0,0 +1,147 @@
+from django.conf import settings
+import os
+import re
+import sqlite3
+import threading
+
+# unicode letters and digits, the same tokens as the unicode61 tokenizer
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def to_match_query(text):
+    """
+    an FTS5 query which matches the documents holding every token of text,
+    returns None when there is no token. the tokens are quoted, so the user
+    input cannot use the FTS5 query syntax
+    """
+    tokens = TOKEN_PATTERN.findall(text)
+    if not tokens:
+        return None
+    return ' '.join('"{}"'.format(token) for token in tokens)
+
+
+class FullTextIndex:
+    """
+    an inverted index of documents keyed by an integer id. the posting lists
+    are sorted by id, so documents with time ordered ids (see
+    utils.snowflake) are returned newest first without sorting the matches.
+    """
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def put_many(self, documents):
+        # documents is [(doc_id, text)], a document indexed again is replaced
+        documents = list(documents)
+        if not documents:
+            return
+        self.client.execute_many([
+            (
+                'DELETE FROM "{}" WHERE rowid = ?'.format(self.name),
+                [(doc_id,) for doc_id, _ in documents],
+            ),
+            (
+                'INSERT INTO "{}" (rowid, content) VALUES (?, ?)'.format(self.name),
+                documents,
+            ),
+        ])
+
+    def delete_many(self, doc_ids):
+        self.client.execute_many([(
+            'DELETE FROM "{}" WHERE rowid = ?'.format(self.name),
+            [(doc_id,) for doc_id in doc_ids],
+        )])
+
+    def search(self, match_query, max_id=None, min_id=None, limit=None):
+        # returns the ids of the matching documents with
+        # min_id <= id < max_id, in decreasing order
+        conditions, params = ['"{}" MATCH ?'.format(self.name)], [match_query]
+        if max_id is not None:
+            conditions.append('rowid < ?')
+            params.append(max_id)
+        if min_id is not None:
+            conditions.append('rowid >= ?')
+            params.append(min_id)
+        sql = 'SELECT rowid FROM "{}" WHERE {} ORDER BY rowid DESC'.format(
+            self.name,
+            ' AND '.join(conditions),
+        )
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [doc_id for doc_id, in self.client.execute(sql, params)]
+
+    def clear(self):
+        self.client.execute('DELETE FROM "{}"'.format(self.name), [])
+
+
+class FullTextClient:
+    """
+    embedded, file-backed full-text search, one sqlite FTS5 table per index.
+    like utils.wide_column it needs no external service and the processes
+    of a host share the file at SEARCH_INDEX_LOCATION. the web processes,
+    which index the new tweets and search, and the celery workers, which run
+    the chunks of rebuild_search_index, have to run on one host or mount
+    one volume at SEARCH_INDEX_LOCATION: a process with a file of its own
+    would index into and search an index the others never see.
+    """
+    conn = None
+    pid = None
+    lock = threading.Lock()
+    indexes = set()
+
+    @classmethod
+    def get_connection(cls):
+        # one connection per process, a forked worker opens its own
+        if cls.conn is not None and cls.pid == os.getpid():
+            return cls.conn
+        cls.conn = sqlite3.connect(
+            settings.SEARCH_INDEX_LOCATION,
+            check_same_thread=False,
+            isolation_level=None,
+            # the rebuild workers write to the same file
+            timeout=30,
+        )
+        cls.pid = os.getpid()
+        cls.indexes = set()
+        return cls.conn
+
+    @classmethod
+    def get_index(cls, name):
+        with cls.lock:
+            conn = cls.get_connection()
+            if name not in cls.indexes:
+                # remove_diacritics folds "café" into "cafe"
+                conn.execute(
+                    'CREATE VIRTUAL TABLE IF NOT EXISTS "{}" USING fts5('
+                    'content, tokenize="unicode61 remove_diacritics 2")'
+                    .format(name),
+                )
+                cls.indexes.add(name)
+        return FullTextIndex(cls, name)
+
+    @classmethod
+    def execute(cls, sql, params):
+        with cls.lock:
+            return cls.get_connection().execute(sql, params).fetchall()
+
+    @classmethod
+    def execute_many(cls, statements):
+        # [(sql, params_list)] in one transaction
+        with cls.lock:
+            conn = cls.get_connection()
+            with conn:
+                conn.execute('BEGIN')
+                for sql, params_list in statements:
+                    conn.executemany(sql, params_list)
+
+    @classmethod
+    def clear(cls):
+        # clear all indexes, for testing purpose
+        if not settings.TESTING:
+            raise Exception('You can not clear the search index in production environment')
+        with cls.lock:
+            conn = cls.get_connection()
+            for name in cls.indexes:
+                conn.execute('DELETE FROM "{}"'.format(name))
@@ -0,0 +1,17 @@
+from django.core.serializers.json import DjangoJSONEncoder
+import datetime
+
+
+class JSONEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder truncates datetimes to milliseconds, which breaks the
+    created_at cursors of the cached lists. keep the microseconds instead.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            r = o.isoformat()
+            if r.endswith('+00:00'):
+                r = r[:-6] + 'Z'
+            return r
+        return super(JSONEncoder, self).default(o)
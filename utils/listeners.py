@@ -0,0 +1,9 @@
+def cache_object(sender, instance, **kwargs):
+    # import inside the function to avoid the circular import
+    from utils.memcached_helper import MemcachedHelper
+    MemcachedHelper.set_cached_object(instance)
+
+
+def invalidate_object_cache(sender, instance, **kwargs):
+    from utils.memcached_helper import MemcachedHelper
+    MemcachedHelper.invalidate_cached_object(sender, instance.pk)
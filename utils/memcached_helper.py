@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from utils.routers import read_from_primary
+import copy
+
+cache = caches['testing'] if settings.TESTING else caches['default']
+
+
+class MemcachedHelper:
+    """
+    object cache keyed by model and id, written through on save and
+    invalidated on delete by the listeners in utils/listeners.py
+    """
+
+    @classmethod
+    def get_key(cls, model_class, object_id):
+        return '{}:{}'.format(model_class.__name__, object_id)
+
+    @classmethod
+    def _detach(cls, obj):
+        # only cache the row itself, related objects are cached on their own
+        obj = copy.copy(obj)
+        obj._state = copy.copy(obj._state)
+        obj._state.fields_cache = {}
+        return obj
+
+    @classmethod
+    def _to_pk(cls, model_class, object_id):
+        # ids may come from the url as strings, invalid ids match nothing
+        try:
+            return model_class._meta.pk.to_python(object_id)
+        except ValidationError:
+            return None
+
+    @classmethod
+    def get_object_through_cache(cls, model_class, object_id):
+        object_id = cls._to_pk(model_class, object_id)
+        objects = cls.get_objects_through_cache(model_class, [object_id])
+        return objects.get(object_id)
+
+    @classmethod
+    def get_objects_through_cache(cls, model_class, object_ids):
+        """
+        returns {object_id: object}, the hits come from one cache multi-get
+        and the misses from one IN query, missing rows are left out
+        """
+        object_ids = set(
+            cls._to_pk(model_class, object_id)
+            for object_id in object_ids
+        ) - {None}
+        if not object_ids:
+            return {}
+        keys = {
+            cls.get_key(model_class, object_id): object_id
+            for object_id in object_ids
+        }
+
+        # cache hit
+        cached_objects = cache.get_many(keys.keys())
+        objects = {keys[key]: obj for key, obj in cached_objects.items()}
+
+        # cache miss
+        missing_ids = object_ids - set(objects.keys())
+        if missing_ids:
+            with read_from_primary():
+                loaded_objects = model_class.objects.in_bulk(missing_ids)
+            cache.set_many({
+                cls.get_key(model_class, object_id): cls._detach(obj)
+                for object_id, obj in loaded_objects.items()
+            })
+            objects.update(loaded_objects)
+        return objects
+
+    @classmethod
+    def set_cached_object(cls, obj):
+        key = cls.get_key(obj.__class__, obj.pk)
+        cache.set(key, cls._detach(obj))
+
+    @classmethod
+    def invalidate_cached_object(cls, model_class, object_id):
+        key = cls.get_key(model_class, object_id)
+        cache.delete(key)
+
+    @classmethod
+    def invalidate_cached_objects(cls, model_class, object_ids):
+        cache.delete_many([
+            cls.get_key(model_class, object_id)
+            for object_id in object_ids
+        ])
+
+    @classmethod
+    def get_list_through_cache(cls, key, load_objects):
+        """
+        cache a short list of objects under key, load_objects() is only
+        called on a miss and the list is dropped with invalidate_cached_list
+        """
+        objects = cache.get(key)
+        if objects is None:
+            with read_from_primary():
+                objects = [cls._detach(obj) for obj in load_objects()]
+            cache.set(key, objects)
+        return objects
+
+    @classmethod
+    def invalidate_cached_list(cls, key):
+        cache.delete(key)
@@ -0,0 +1,46 @@
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+from utils.routers import read_from_replicas
+
+PIN_TO_PRIMARY_COOKIE = 'pin_to_primary'
+PIN_TO_PRIMARY_SALT = 'utils.middlewares.pin_to_primary'
+
+
+def is_pinned_to_primary(request):
+    return request.get_signed_cookie(
+        PIN_TO_PRIMARY_COOKIE,
+        default=None,
+        salt=PIN_TO_PRIMARY_SALT,
+        max_age=settings.PIN_TO_PRIMARY_SECONDS,
+    ) is not None
+
+
+class ReadYourWritesMiddleware:
+    """
+    read only requests are served from the replicas, except for the clients
+    which wrote in the last PIN_TO_PRIMARY_SECONDS: a successful write sets
+    a signed cookie which pins the reads of the client to the primary until
+    the replicas have caught up, so that users always see their own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if response.status_code < 400:
+                response.set_signed_cookie(
+                    PIN_TO_PRIMARY_COOKIE,
+                    '1',
+                    salt=PIN_TO_PRIMARY_SALT,
+                    max_age=settings.PIN_TO_PRIMARY_SECONDS,
+                    httponly=True,
+                    samesite='Lax',
+                )
+            return response
+
+        if is_pinned_to_primary(request):
+            return self.get_response(request)
+        with read_from_replicas():
+            return self.get_response(request)
@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def parse_cursor(value):
+    """
+    the created_at of an ISO 8601 cursor, None if it is not a datetime. a
+    cursor without offset is in UTC, created_at is compared with it
+    """
+    try:
+        cursor = parse_datetime(value)
+    except ValueError:
+        return None
+    if cursor is not None and timezone.is_naive(cursor):
+        cursor = timezone.make_aware(cursor, timezone.utc)
+    return cursor
+
+
+class EndlessPagination(BasePagination):
+    """
+    keyset pagination over a (user, created_at) index, newest first
+    - created_before: load the page older than this created_at (scroll down)
+    - created_after: load the page newer than this created_at (pull to refresh)
+    no COUNT(*) and no OFFSET is issued, so a deep page costs the same as
+    the first page. has_next_page tells whether older items exist after
+    the returned page.
+    """
+    page_size = 20 if not settings.TESTING else 10
+
+    def __init__(self):
+        super(EndlessPagination, self).__init__()
+        self.has_next_page = False
+
+    def to_html(self):
+        pass
+
+    def parse_cursor(self, request, param):
+        if param not in request.query_params:
+            return None
+        cursor = parse_cursor(request.query_params[param])
+        if cursor is None:
+            raise ValidationError({
+                param: 'Invalid cursor, expect an ISO 8601 datetime.',
+            })
+        return cursor
+
+    def paginate_queryset(self, queryset, request, view=None):
+        def filter_queryset(created_before, created_after):
+            filtered = queryset
+            if created_before is not None:
+                filtered = filtered.filter(created_at__lt=created_before)
+            if created_after is not None:
+                filtered = filtered.filter(created_at__gt=created_after)
+            return filtered.order_by('-created_at')
+        return self.paginate_by_cursors(filter_queryset, request)
+
+    def paginate_by_cursors(self, get_objects, request):
+        """
+        get_objects(created_before, created_after) returns the objects within
+        the cursors, newest first, as a queryset or any other lazy sequence
+        which can be sliced, e.g. a wide column scan
+        """
+        created_before = self.parse_cursor(request, 'created_before')
+        created_after = self.parse_cursor(request, 'created_after')
+        objects = get_objects(created_before, created_after)
+
+        # fetch one more item to know whether there is a next page
+        page = list(objects[:self.page_size + 1])
+        self.has_next_page = len(page) > self.page_size
+        return page[:self.page_size]
+
+    def paginate_ordered_list(self, reverse_ordered_list, request):
+        created_before = self.parse_cursor(request, 'created_before')
+        created_after = self.parse_cursor(request, 'created_after')
+        objects = [
+            obj
+            for obj in reverse_ordered_list
+            if (created_before is None or obj.created_at < created_before)
+            and (created_after is None or obj.created_at > created_after)
+        ]
+        self.has_next_page = len(objects) > self.page_size
+        return objects[:self.page_size]
+
+    def paginate_cached_list(self, cached_list, request):
+        """
+        paginate a cached list which holds at most REDIS_LIST_LENGTH_LIMIT
+        newest objects, returns None if the page may go beyond the cached
+        window and has to be read from the database instead.
+        """
+        page = self.paginate_ordered_list(cached_list, request)
+        # the whole page and one more object are in the cache
+        if self.has_next_page:
+            return page
+        # the cached list is not full, so it holds every object
+        if len(cached_list) < settings.REDIS_LIST_LENGTH_LIMIT:
+            return page
+        # everything beyond the cached window is older than the oldest cached
+        # object, so it is out of range if that object is out of range too
+        created_after = self.parse_cursor(request, 'created_after')
+        if created_after is not None and \
+                cached_list[-1].created_at <= created_after:
+            return page
+        return None
+
+    def get_paginated_response(self, data, key='results'):
+        # the lists which existed before the pagination keep their key,
+        # e.g. tweets or newsfeeds, has_next_page comes next to it
+        return Response({
+            'has_next_page': self.has_next_page,
+            key: data,
+        })
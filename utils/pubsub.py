@@ -0,0 +1,186 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+from redis.exceptions import ConnectionError, TimeoutError
+from twitter.cache import PUBSUB_CHANNEL_PATTERN
+from utils.redis_client import RedisClient
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    the messages of a channel for one consumer, which runs on an asyncio
+    event loop. the messages are delivered from any thread, a consumer
+    which lags behind drops the overflowing ones.
+    """
+    max_size = 100
+
+    def __init__(self, channel, loop):
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+
+    def _put(self, message):
+        if not self.queue.full():
+            self.queue.put_nowait(message)
+
+    def deliver(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def drain(self):
+        # drop the queued messages, once the consumer caught up anyway
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    async def get(self, timeout=None):
+        # returns None on timeout
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class PubSub:
+    """
+    in-process hub of the subscriptions, the messages reach it through the
+    backend of PUBSUB_BACKEND: InProcessBackend when the publishers run in
+    the process of the subscribers, RedisBackend across processes
+    """
+    lock = threading.Lock()
+    subscriptions = {}
+    backends = {}
+
+    @classmethod
+    def get_backend(cls):
+        path = settings.PUBSUB_BACKEND
+        if path not in cls.backends:
+            cls.backends[path] = import_string(path)()
+        return cls.backends[path]
+
+    @classmethod
+    def publish(cls, channel, message):
+        cls.publish_many([channel], message)
+
+    @classmethod
+    def publish_many(cls, channels, message):
+        channels = list(channels)
+        if channels:
+            cls.get_backend().publish_many(channels, json.dumps(message))
+
+    @classmethod
+    def subscribe(cls, channel):
+        # call it from the event loop of the consumer
+        subscription = Subscription(channel, asyncio.get_running_loop())
+        cls.get_backend().listen()
+        with cls.lock:
+            cls.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    @classmethod
+    def unsubscribe(cls, subscription):
+        with cls.lock:
+            subscriptions = cls.subscriptions.get(subscription.channel, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                cls.subscriptions.pop(subscription.channel, None)
+
+    @classmethod
+    def deliver(cls, channel, data):
+        # called by the backends, from any thread
+        with cls.lock:
+            subscriptions = list(cls.subscriptions.get(channel, ()))
+        if not subscriptions:
+            return
+        message = json.loads(data)
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    @classmethod
+    def deliver_all(cls, data):
+        # wake every subscription, e.g. once messages may have been lost
+        with cls.lock:
+            channels = list(cls.subscriptions.keys())
+        for channel in channels:
+            cls.deliver(channel, data)
+
+
+class InProcessBackend:
+
+    def publish_many(self, channels, data):
+        for channel in channels:
+            PubSub.deliver(channel, data)
+
+    def listen(self):
+        pass
+
+
+class RedisBackend:
+    """
+    PUBLISH to redis, every subscribing process runs one thread which
+    listens to all the channels and hands the messages to its hub. the
+    thread reconnects when the connection to redis is lost, with a backoff
+    doubling from min_backoff to max_backoff seconds
+    """
+    min_backoff = 0.1
+    max_backoff = 30
+    # delivered to every subscription once reconnected, the messages
+    # published meanwhile are lost and the consumers catch up with a read
+    reconnected_message = json.dumps({})
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.prefix = PUBSUB_CHANNEL_PATTERN.format(channel='')
+
+    def publish_many(self, channels, data):
+        pipeline = RedisClient.get_connection().pipeline()
+        for channel in channels:
+            pipeline.publish(PUBSUB_CHANNEL_PATTERN.format(channel=channel), data)
+        pipeline.execute()
+
+    def listen(self):
+        # one listener per process, a forked worker starts its own
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+
+    def run(self):
+        backoff = self.min_backoff
+        reconnecting = False
+        while True:
+            pubsub = RedisClient.get_connection().pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(PUBSUB_CHANNEL_PATTERN.format(channel='*'))
+                backoff = self.min_backoff
+                if reconnecting:
+                    PubSub.deliver_all(self.reconnected_message)
+                for message in pubsub.listen():
+                    self.deliver(message)
+            except (ConnectionError, TimeoutError):
+                logger.warning(
+                    'lost the connection to redis, reconnecting in %ss',
+                    backoff,
+                    exc_info=True,
+                )
+            finally:
+                pubsub.close()
+            reconnecting = True
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def deliver(self, message):
+        # a message which fails to be delivered does not stop the listener
+        channel = message['channel'].decode()[len(self.prefix):]
+        try:
+            PubSub.deliver(channel, message['data'])
+        except Exception:
+            logger.exception('failed to deliver a message of %s', channel)
@@ -0,0 +1,262 @@
+from django.conf import settings
+from redis.exceptions import WatchError
+from utils.redis_client import RedisClient
+from utils.redis_serializers import DjangoModelSerializer
+from utils.routers import read_from_primary
+import uuid
+
+# the members which tell the state of a cached id set, ids are integers
+ID_SET_LOADED = b'loaded'
+ID_SET_LOADING = b'loading'
+
+
+class RedisHelper:
+    """
+    newest-first lists of serialized objects, capped at REDIS_LIST_LENGTH_LIMIT
+    items. a list is loaded lazily on the first read, new objects are only
+    pushed into lists which are already cached.
+    """
+
+    @classmethod
+    def _load_objects_to_cache(cls, key, objects):
+        conn = RedisClient.get_connection()
+
+        serialized_list = [
+            DjangoModelSerializer.serialize(obj)
+            for obj in objects
+        ]
+        if serialized_list:
+            conn.rpush(key, *serialized_list)
+            conn.expire(key, settings.REDIS_KEY_EXPIRE_TIME)
+
+    @classmethod
+    def load_objects(cls, key, queryset):
+        conn = RedisClient.get_connection()
+
+        # cache hit, deserialize the list and return
+        if conn.exists(key):
+            serialized_list = conn.lrange(key, 0, -1)
+            return [
+                DjangoModelSerializer.deserialize(serialized_data)
+                for serialized_data in serialized_list
+            ]
+
+        # cache miss, only the newest REDIS_LIST_LENGTH_LIMIT objects are
+        # cached, the readers go to the database for anything older
+        with read_from_primary():
+            objects = list(queryset[:settings.REDIS_LIST_LENGTH_LIMIT])
+        cls._load_objects_to_cache(key, objects)
+        return objects
+
+    @classmethod
+    def push_object(cls, key, obj):
+        conn = RedisClient.get_connection()
+        # LPUSHX is a no-op when the list is not cached yet, it will be
+        # loaded from the database with this object on the next read
+        serialized_data = DjangoModelSerializer.serialize(obj)
+        if conn.lpushx(key, serialized_data):
+            conn.ltrim(key, 0, settings.REDIS_LIST_LENGTH_LIMIT - 1)
+
+    @classmethod
+    def push_objects_once(cls, pushed_key, objects_by_key, expire):
+        """
+        push_object for many lists in one transaction, which also adds the
+        keys to the set at pushed_key. the keys already in it are skipped, so
+        a retried push does not push twice. the set expires after expire
+        seconds, keys given with obj None are only added to it
+        """
+        conn = RedisClient.get_connection()
+        keys = list(objects_by_key.keys())
+        if not keys:
+            return
+        pipeline = conn.pipeline()
+        for key in keys:
+            pipeline.sismember(pushed_key, key)
+        keys = [key for key, pushed in zip(keys, pipeline.execute()) if not pushed]
+        if not keys:
+            return
+        pipeline = conn.pipeline()
+        for key in keys:
+            obj = objects_by_key[key]
+            if obj is not None:
+                # LPUSHX, LTRIM is a no-op on a list which is not cached
+                pipeline.lpushx(key, DjangoModelSerializer.serialize(obj))
+                pipeline.ltrim(key, 0, settings.REDIS_LIST_LENGTH_LIMIT - 1)
+        pipeline.sadd(pushed_key, *keys)
+        pipeline.expire(pushed_key, expire)
+        pipeline.execute()
+
+    @classmethod
+    def invalidate_key(cls, key):
+        # the list or set is reloaded from the database on the next read
+        conn = RedisClient.get_connection()
+        conn.delete(key)
+
+    @classmethod
+    def filter_cached_keys(cls, keys):
+        conn = RedisClient.get_connection()
+        pipeline = conn.pipeline()
+        for key in keys:
+            pipeline.exists(key)
+        return [key for key, exists in zip(keys, pipeline.execute()) if exists]
+
+    @classmethod
+    def load_id_set(cls, key, queryset):
+        """
+        returns the set of ids cached at key, the set is loaded from a
+        values_list queryset on a cache miss. a loaded set holds the
+        ID_SET_LOADED member, so an empty set is cached too. the set is
+        created with ID_SET_LOADING before the read: the follows and
+        unfollows meanwhile update it, WATCH then gives up the fill and
+        the next read loads it again
+        """
+        conn = RedisClient.get_connection()
+        members = conn.smembers(key)
+        if ID_SET_LOADED in members:
+            return cls.parse_id_set(members)
+
+        pipeline = conn.pipeline()
+        pipeline.sadd(key, ID_SET_LOADING)
+        pipeline.expire(key, settings.REDIS_KEY_EXPIRE_TIME)
+        pipeline.execute()
+        with conn.pipeline() as pipeline:
+            try:
+                pipeline.watch(key)
+                with read_from_primary():
+                    ids = set(queryset)
+                pipeline.multi()
+                pipeline.sadd(key, ID_SET_LOADED, *ids)
+                pipeline.srem(key, ID_SET_LOADING)
+                pipeline.expire(key, settings.REDIS_KEY_EXPIRE_TIME)
+                pipeline.execute()
+            except WatchError:
+                pass
+        return ids
+
+    @classmethod
+    def parse_id_set(cls, members):
+        return set(
+            int(member)
+            for member in members
+            if member not in (ID_SET_LOADED, ID_SET_LOADING)
+        )
+
+    @classmethod
+    def add_to_cached_set(cls, key, member):
+        # SADD creates the key when it is missing, which would cache a partial
+        # set. only update cached sets, WATCH guards against an expiring key
+        conn = RedisClient.get_connection()
+        with conn.pipeline() as pipeline:
+            try:
+                pipeline.watch(key)
+                if not pipeline.exists(key):
+                    return
+                pipeline.multi()
+                pipeline.sadd(key, member)
+                pipeline.execute()
+            except WatchError:
+                # the set changed meanwhile, reload it on the next read
+                conn.delete(key)
+
+    @classmethod
+    def add_to_cached_sets(cls, members_by_key):
+        # add_to_cached_set for many sets in one transaction, missing sets
+        # are left for the next read to load
+        conn = RedisClient.get_connection()
+        keys = list(members_by_key.keys())
+        if not keys:
+            return
+        with conn.pipeline() as pipeline:
+            try:
+                pipeline.watch(*keys)
+                cached_keys = cls.filter_cached_keys(keys)
+                if not cached_keys:
+                    return
+                pipeline.multi()
+                for key in cached_keys:
+                    pipeline.sadd(key, *members_by_key[key])
+                pipeline.execute()
+            except WatchError:
+                # a set changed meanwhile, reload them on the next read
+                conn.delete(*keys)
+
+    @classmethod
+    def load_count(cls, key, get_count):
+        # returns the count cached at key, get_count() is only called on a
+        # cache miss
+        conn = RedisClient.get_connection()
+        count = conn.get(key)
+        if count is not None:
+            return int(count)
+
+        with read_from_primary():
+            count = get_count()
+        # NX keeps a count loaded and incremented meanwhile, this count may
+        # be older than it
+        if not conn.set(key, count, ex=settings.REDIS_KEY_EXPIRE_TIME, nx=True):
+            cached_count = conn.get(key)
+            if cached_count is not None:
+                return int(cached_count)
+        return count
+
+    @classmethod
+    def incr_cached_counts(cls, deltas_by_key):
+        # INCRBY creates the key when it is missing, which would cache a
+        # partial count. only update cached counts, like add_to_cached_sets
+        conn = RedisClient.get_connection()
+        keys = list(deltas_by_key.keys())
+        if not keys:
+            return
+        with conn.pipeline() as pipeline:
+            try:
+                pipeline.watch(*keys)
+                cached_keys = cls.filter_cached_keys(keys)
+                if not cached_keys:
+                    return
+                pipeline.multi()
+                for key in cached_keys:
+                    pipeline.incrby(key, deltas_by_key[key])
+                pipeline.execute()
+            except WatchError:
+                # a count changed meanwhile, reload them on the next read
+                conn.delete(*keys)
+
+    @classmethod
+    def remove_from_cached_set(cls, key, member):
+        conn = RedisClient.get_connection()
+        conn.srem(key, member)
+
+    @classmethod
+    def remove_from_cached_sets(cls, members_by_key):
+        conn = RedisClient.get_connection()
+        pipeline = conn.pipeline()
+        for key, members in members_by_key.items():
+            pipeline.srem(key, *members)
+        pipeline.execute()
+
+    @classmethod
+    def acquire_lock(cls, key, timeout):
+        # returns the token which releases the lock, or None when it is held.
+        # the lock expires after timeout seconds if its owner dies
+        token = uuid.uuid4().hex
+        conn = RedisClient.get_connection()
+        if conn.set(key, token, nx=True, ex=timeout):
+            return token
+        return None
+
+    @classmethod
+    def release_lock(cls, key, token):
+        # only the owner deletes the lock, once expired it may be held by
+        # someone else. WATCH makes the check and the delete atomic
+        conn = RedisClient.get_connection()
+        with conn.pipeline() as pipeline:
+            try:
+                pipeline.watch(key)
+                if pipeline.get(key) != token.encode():
+                    return False
+                pipeline.multi()
+                pipeline.delete(key)
+                pipeline.execute()
+                return True
+            except WatchError:
+                return False
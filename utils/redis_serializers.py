@@ -0,0 +1,15 @@
+from django.core import serializers
+from utils.json_encoder import JSONEncoder
+
+
+class DjangoModelSerializer:
+
+    @classmethod
+    def serialize(cls, instance):
+        # django serializers expect a QuerySet or a list of objects
+        return serializers.serialize('json', [instance], cls=JSONEncoder)
+
+    @classmethod
+    def deserialize(cls, serialized_data):
+        # .object returns the model instance instead of a DeserializedObject
+        return list(serializers.deserialize('json', serialized_data))[0].object
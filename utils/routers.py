@@ -0,0 +1,73 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+import random
+
+# only the requests marked by ReadYourWritesMiddleware read from the
+# replicas, celery tasks and management commands stay on the primary. it
+# holds the replica picked for the request, so that a request does not mix
+# replicas which are not as far behind
+replica_reads = ContextVar('replica_reads', default=None)
+
+
+@contextmanager
+def read_from_replicas():
+    replica = random.choice(settings.DATABASE_REPLICAS) \
+        if settings.DATABASE_REPLICAS else None
+    token = replica_reads.set(replica)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+@contextmanager
+def read_from_primary():
+    # the cache loaders read from the primary: a row read from a replica
+    # which is behind would be cached long after the replica caught up
+    token = replica_reads.set(None)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    send the reads to the replica picked by read_from_replicas() while it
+    is active, the writes always go to the
+    primary. the replicas are kept up to date by the database replication,
+    no table is migrated on them.
+    """
+
+    def is_replica_instance(self, hints):
+        instance = hints.get('instance')
+        return instance is not None and \
+            instance._state.db in settings.DATABASE_REPLICAS
+
+    def db_for_read(self, model, **hints):
+        replica = replica_reads.get()
+        if replica is not None:
+            return replica
+        # the related objects of an instance read from a replica would be
+        # read from the same replica otherwise
+        if self.is_replica_instance(hints):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        if self.is_replica_instance(hints):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,13 @@
+def jump_consistent_hash(key, num_buckets):
+    """
+    map an integer key to a bucket in [0, num_buckets), see Lamping & Veach,
+    "A Fast, Minimal Memory, Consistent Hash Algorithm". growing the buckets
+    from n to n + 1 only moves 1 / (n + 1) of the keys, all to the new bucket.
+    """
+    bucket, jump = -1, 0
+    key &= 0xffffffffffffffff
+    while jump < num_buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xffffffffffffffff
+        jump = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+from django.conf import settings
+import fcntl
+import os
+import threading
+import time
+
+# 41 bits of milliseconds since EPOCH, 5 bits of host, 5 bits of process slot
+# and 12 bits of sequence, the ids fit in a signed 64 bit BIGINT
+EPOCH = datetime(2021, 1, 1, tzinfo=timezone.utc)
+EPOCH_MS = int(EPOCH.timestamp() * 1000)
+HOST_ID_BITS = 5
+SLOT_BITS = 5
+SEQUENCE_BITS = 12
+MAX_HOST_ID = (1 << HOST_ID_BITS) - 1
+MAX_SLOT = (1 << SLOT_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+TIMESTAMP_SHIFT = HOST_ID_BITS + SLOT_BITS + SEQUENCE_BITS
+
+
+def current_ms():
+    return int(time.time() * 1000)
+
+
+def get_id_timestamp(snowflake_id):
+    # the datetime an id was generated at, with a millisecond precision
+    ms = (snowflake_id >> TIMESTAMP_SHIFT) + EPOCH_MS
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+def min_id_for(dt):
+    # the smallest id which can be generated at dt, to range scan by time
+    ms = int(dt.timestamp() * 1000) - EPOCH_MS
+    return max(ms, 0) << TIMESTAMP_SHIFT
+
+
+class SnowflakeGenerator:
+    """
+    time ordered, globally unique 64 bit ids. SNOWFLAKE_HOST_ID tells the
+    hosts apart, the processes of a host lease a slot each by holding an
+    exclusive lock on one of the files in SNOWFLAKE_LOCK_DIR. the lock goes
+    away with the process, so the slots of dead workers are reused.
+    """
+    lock = threading.Lock()
+    pid = None
+    slot = None
+    slot_file = None
+    last_ms = -1
+    sequence = 0
+
+    @classmethod
+    def lease_slot(cls):
+        # a forked child shares the lock of its parent, it has to open the
+        # files again to lease a slot of its own. closing its copy of the
+        # file keeps the lock of the parent
+        if cls.slot_file is not None:
+            cls.slot_file.close()
+            cls.slot_file = None
+        os.makedirs(settings.SNOWFLAKE_LOCK_DIR, exist_ok=True)
+        for slot in range(MAX_SLOT + 1):
+            path = os.path.join(
+                settings.SNOWFLAKE_LOCK_DIR,
+                'slot-{}.lock'.format(slot),
+            )
+            slot_file = open(path, 'a')
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                slot_file.close()
+                continue
+            cls.slot_file = slot_file
+            cls.slot = slot
+            cls.pid = os.getpid()
+            cls.last_ms = -1
+            cls.sequence = 0
+            return
+        raise RuntimeError(
+            'all {} snowflake slots of this host are taken'.format(MAX_SLOT + 1),
+        )
+
+    @classmethod
+    def get_node_id(cls):
+        host_id = settings.SNOWFLAKE_HOST_ID
+        if not 0 <= host_id <= MAX_HOST_ID:
+            raise ValueError('SNOWFLAKE_HOST_ID must be within 0 and {}'.format(
+                MAX_HOST_ID,
+            ))
+        if cls.pid != os.getpid():
+            cls.lease_slot()
+        return (host_id << SLOT_BITS) | cls.slot
+
+    @classmethod
+    def next_id(cls):
+        with cls.lock:
+            node_id = cls.get_node_id()
+            ms = current_ms()
+            # the clock moved backwards, wait for it instead of reusing ids
+            while ms < cls.last_ms:
+                time.sleep((cls.last_ms - ms) / 1000)
+                ms = current_ms()
+            if ms == cls.last_ms:
+                cls.sequence = (cls.sequence + 1) & MAX_SEQUENCE
+                # the sequence of this millisecond is used up
+                if cls.sequence == 0:
+                    while ms <= cls.last_ms:
+                        ms = current_ms()
+            else:
+                cls.sequence = 0
+            cls.last_ms = ms
+            return (
+                ((ms - EPOCH_MS) << TIMESTAMP_SHIFT)
+                | (node_id << SEQUENCE_BITS)
+                | cls.sequence
+            )
+
+
+def generate_id():
+    # the default of the primary keys, importable by the migrations
+    return SnowflakeGenerator.next_id()
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+RELATIONAL = 'relational'
+WIDE_COLUMN = 'wide_column'
+
+
+def get_storage_backend(model_label):
+    # MODEL_STORAGE_BACKENDS maps 'app_label.ModelName' to a backend
+    backend = settings.MODEL_STORAGE_BACKENDS.get(model_label, RELATIONAL)
+    if backend not in (RELATIONAL, WIDE_COLUMN):
+        raise ImproperlyConfigured(
+            'unknown storage backend "{}" for {}'.format(backend, model_label),
+        )
+    return backend
@@ -0,0 +1,212 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connections, router
+from django.test import TransactionTestCase, override_settings
+from testing.clients import APIClient, AsgiClient
+from testing.testcases import TestCase
+from tweets.models import Tweet
+from redis.exceptions import ConnectionError
+from tweets.services import TweetService
+from unittest import mock
+from utils import asgi
+from utils.pubsub import PubSub, RedisBackend
+from utils.middlewares import PIN_TO_PRIMARY_COOKIE
+from utils.redis_client import RedisClient
+from utils.routers import ReplicaRouter, read_from_replicas
+import threading
+import time
+
+TWEET_CREATE_API = '/api/tweets/'
+FOLLOWERS_API = '/api/friendships/{}/followers/'
+
+
+@override_settings(DATABASE_REPLICAS=['replica', 'replica_2'])
+class ReadReplicaTests(TestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        # the replicas are the test database itself, only the routing differs
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias] = connections['default']
+            self.addCleanup(connections.__delitem__, alias)
+        self.user = self.create_user('user')
+        self.tweet = self.create_tweet(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.read_dbs = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record_db_for_read(router, model, **hints):
+            db = db_for_read(router, model, **hints)
+            self.read_dbs.append(db)
+            return db
+        patcher = mock.patch.object(ReplicaRouter, 'db_for_read', record_db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_followers(self, client):
+        # returns the replicas read by the request
+        self.read_dbs = []
+        response = client.get(FOLLOWERS_API.format(self.user.id))
+        self.assertEqual(response.status_code, 200)
+        return set(self.read_dbs) & set(settings.DATABASE_REPLICAS)
+
+    def test_reads_go_to_the_replicas(self):
+        self.assertTrue(self.get_followers(self.anonymous_client))
+        self.assertTrue(self.get_followers(self.client))
+
+        # celery tasks and commands read from the primary
+        self.read_dbs = []
+        list(Tweet.objects.filter(user=self.user))
+        self.assertEqual(self.read_dbs, [None])
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        self.read_dbs = []
+        response = self.client.post(TWEET_CREATE_API, {'content': 'hello world'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(self.read_dbs) & set(settings.DATABASE_REPLICAS), set())
+        self.assertIn(PIN_TO_PRIMARY_COOKIE, response.cookies)
+
+        # the client reads its own writes from the primary
+        self.assertFalse(self.get_followers(self.client))
+        self.assertTrue(self.get_followers(self.anonymous_client))
+
+        # once the replicas caught up, the client reads from them again
+        expired = time.time() + settings.PIN_TO_PRIMARY_SECONDS + 1
+        with mock.patch('django.core.signing.time.time', return_value=expired):
+            self.assertTrue(self.get_followers(self.client))
+
+        # a failed write does not pin
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(TWEET_CREATE_API, {'content': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(PIN_TO_PRIMARY_COOKIE, response.cookies)
+
+    def test_async_views_read_from_the_replicas(self):
+        asgi_client = AsgiClient()
+        asgi_client.force_login(self.user)
+        self.read_dbs = []
+        response = asgi_client.get(FOLLOWERS_API.format(self.user.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(asgi_client.last_call.view, 'list_followers')
+        self.assertTrue(set(self.read_dbs) & set(settings.DATABASE_REPLICAS))
+
+        # a client which wrote recently reads from the primary
+        response = self.client.post(TWEET_CREATE_API, {'content': 'hello world'})
+        asgi_client.cookie = '{}; {}={}'.format(
+            asgi_client.cookie,
+            PIN_TO_PRIMARY_COOKIE,
+            response.cookies[PIN_TO_PRIMARY_COOKIE].value,
+        )
+        self.read_dbs = []
+        response = asgi_client.get(FOLLOWERS_API.format(self.user.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(self.read_dbs) & set(settings.DATABASE_REPLICAS), set())
+
+    def test_instances_read_from_a_replica(self):
+        with read_from_replicas():
+            tweet = Tweet.objects.get(id=self.tweet.id)
+        self.assertIn(tweet._state.db, settings.DATABASE_REPLICAS)
+        # they are written and their relations read on the primary
+        self.assertEqual(router.db_for_write(Tweet, instance=tweet), 'default')
+        self.assertEqual(router.db_for_read(User, instance=tweet), 'default')
+        self.assertEqual(router.allow_migrate('replica', 'tweets'), False)
+
+    def test_a_request_reads_from_one_replica(self):
+        for _ in range(5):
+            self.read_dbs = []
+            with read_from_replicas():
+                for _ in range(5):
+                    list(Tweet.objects.filter(user=self.user))
+            self.assertEqual(len(set(self.read_dbs)), 1)
+            self.assertIn(self.read_dbs[0], settings.DATABASE_REPLICAS)
+
+    def test_cache_refills_read_from_the_primary(self):
+        # the refill of an invalidated tweet would cache a stale row of a
+        # replica which is behind
+        TweetService.incr_comments_count(self.tweet.id, 1)
+        self.read_dbs = []
+        with read_from_replicas():
+            tweet = TweetService.get_tweet_through_cache(self.tweet.id)
+        self.assertEqual(set(self.read_dbs), {None})
+        self.assertEqual(tweet.comments_count, self.tweet.comments_count + 1)
+
+
+@override_settings(ASYNC_VIEWS_THREAD_SENSITIVE=False)
+class AsyncViewThreadPoolTests(TransactionTestCase):
+    # the threads of the pool have their own connections, which only see
+    # committed rows
+    databases = '__all__'
+
+    def setUp(self):
+        caches['testing'].clear()
+        RedisClient.clear()
+        self.user = User.objects.create_user('user')
+        self.tweets = [
+            Tweet.objects.create(user=self.user, content='tweet {}'.format(i))
+            for i in range(3)
+        ]
+
+    def test_blocking_calls_run_in_the_pool(self):
+        threads = set()
+        _call_in_pool = asgi._call_in_pool
+
+        def call_in_pool(func, *args, **kwargs):
+            threads.add(threading.get_ident())
+            return _call_in_pool(func, *args, **kwargs)
+        client = AsgiClient()
+        client.force_login(self.user)
+        with mock.patch('utils.asgi._call_in_pool', side_effect=call_in_pool) as patched:
+            response = client.get('/api/tweets/', {'user_id': self.user.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [tweet['id'] for tweet in response.json()['tweets']],
+            [tweet.id for tweet in reversed(self.tweets)],
+        )
+        # the signals, the authentication and the view
+        self.assertGreaterEqual(patched.call_count, 4)
+        self.assertNotIn(threading.get_ident(), threads)
+
+
+class RedisBackendTests(TestCase):
+
+    def test_listener_reconnects(self):
+        # the connection drops, redis refuses the next one, then the
+        # listener gets a message
+        message = {'channel': b'pubsub:newsfeeds:1', 'data': b'{"tweet_id": 1}'}
+
+        class Stop(Exception):
+            pass
+
+        def drop():
+            raise ConnectionError('connection reset')
+            yield
+
+        def deliver_then_stop():
+            yield message
+            raise Stop()
+        pubsubs = [
+            mock.Mock(**{'listen.side_effect': drop}),
+            mock.Mock(**{'psubscribe.side_effect': ConnectionError('refused')}),
+            mock.Mock(**{'listen.side_effect': deliver_then_stop}),
+        ]
+        connection = mock.Mock(**{'pubsub.side_effect': pubsubs})
+        with mock.patch('utils.pubsub.RedisClient.get_connection', return_value=connection), \
+                mock.patch('utils.pubsub.time.sleep') as sleep, \
+                mock.patch.object(PubSub, 'deliver') as deliver, \
+                mock.patch.object(PubSub, 'deliver_all') as deliver_all, \
+                self.assertLogs('utils.pubsub', 'WARNING') as logs, \
+                self.assertRaises(Stop):
+            RedisBackend().run()
+        self.assertEqual(len(logs.records), 2)
+        # the backoff doubles until a connection succeeds
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.1, 0.2])
+        for pubsub in pubsubs:
+            pubsub.close.assert_called_once_with()
+        pubsubs[2].psubscribe.assert_called_once_with('pubsub:*')
+        # the subscribers catch up with what was published meanwhile
+        deliver_all.assert_called_once_with(RedisBackend.reconnected_message)
+        deliver.assert_called_once_with('newsfeeds:1', b'{"tweet_id": 1}')
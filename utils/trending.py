@@ -0,0 +1,111 @@
+from collections import Counter
+from twitter.cache import TRENDS_CANDIDATES_PATTERN, TRENDS_SKETCH_PATTERN
+from utils.redis_client import RedisClient
+from utils.time_constants import ONE_MINUTE
+from utils.time_helpers import utc_now
+import hashlib
+
+
+class SlidingWindowTopK:
+    """
+    approximate top-k of a stream of items over the last window_minutes.
+    every minute has a count-min sketch, a redis hash of depth x width
+    counters, and a sorted set of its capacity heaviest items. an item is
+    counted with depth HINCRBY, whose smallest result is its estimate for
+    the minute. top() sums the sketches of the window for the candidates of
+    every minute, the memory does not grow with the number of items.
+    """
+
+    def __init__(self, name, window_minutes, width, depth, capacity):
+        self.name = name
+        self.window_minutes = window_minutes
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+
+    def get_minute(self, now=None):
+        now = now or utc_now()
+        return int(now.timestamp()) // ONE_MINUTE
+
+    def get_sketch_key(self, minute):
+        return TRENDS_SKETCH_PATTERN.format(name=self.name, minute=minute)
+
+    def get_candidates_key(self, minute):
+        return TRENDS_CANDIDATES_PATTERN.format(name=self.name, minute=minute)
+
+    def get_cells(self, item):
+        # one counter per row, the rows use independent hashes. the hashes
+        # of python are salted per process, hashlib is stable across them
+        cells = []
+        for row in range(self.depth):
+            digest = hashlib.blake2b(
+                item.encode(),
+                digest_size=8,
+                person='row{}'.format(row).encode(),
+            ).digest()
+            cells.append('{}:{}'.format(row, int.from_bytes(digest, 'big') % self.width))
+        return cells
+
+    def add(self, items, now=None):
+        counts = Counter(str(item) for item in items)
+        if not counts:
+            return
+        minute = self.get_minute(now)
+        sketch_key = self.get_sketch_key(minute)
+        candidates_key = self.get_candidates_key(minute)
+        # the keys outlive the window by a minute, then expire
+        expire = (self.window_minutes + 1) * ONE_MINUTE
+
+        conn = RedisClient.get_connection()
+        pipeline = conn.pipeline()
+        for item, count in counts.items():
+            for cell in self.get_cells(item):
+                pipeline.hincrby(sketch_key, cell, count)
+        pipeline.expire(sketch_key, expire)
+        results = pipeline.execute()
+
+        estimates = {}
+        for i, item in enumerate(counts):
+            estimates[item] = min(results[i * self.depth:(i + 1) * self.depth])
+        pipeline = conn.pipeline()
+        # the estimates only grow within a minute, overwriting is fine
+        pipeline.zadd(candidates_key, estimates)
+        # keep the capacity heaviest items, the set is sorted ascending
+        pipeline.zremrangebyrank(candidates_key, 0, -self.capacity - 1)
+        pipeline.expire(candidates_key, expire)
+        pipeline.execute()
+
+    def top(self, k, now=None):
+        # returns [(item, count)] of the k heaviest items of the window
+        current_minute = self.get_minute(now)
+        minutes = range(current_minute - self.window_minutes + 1, current_minute + 1)
+        conn = RedisClient.get_connection()
+
+        pipeline = conn.pipeline()
+        for minute in minutes:
+            pipeline.zrange(self.get_candidates_key(minute), 0, -1)
+        candidates = set()
+        for members in pipeline.execute():
+            candidates.update(member.decode() for member in members)
+        if not candidates:
+            return []
+
+        candidates = list(candidates)
+        cells = [self.get_cells(item) for item in candidates]
+        fields = [cell for item_cells in cells for cell in item_cells]
+        pipeline = conn.pipeline()
+        for minute in minutes:
+            pipeline.hmget(self.get_sketch_key(minute), fields)
+        # the counters of a cell summed over the window
+        sums = [0] * len(fields)
+        for values in pipeline.execute():
+            for i, value in enumerate(values):
+                if value is not None:
+                    sums[i] += int(value)
+
+        estimates = [
+            (item, min(sums[i * self.depth:(i + 1) * self.depth]))
+            for i, item in enumerate(candidates)
+        ]
+        estimates.sort(key=lambda estimate: (-estimate[1], estimate[0]))
+        return estimates[:k]
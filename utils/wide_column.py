@@ -0,0 +1,191 @@
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+import json
+import os
+import sqlite3
+import struct
+import threading
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MAX_TIMESTAMP = 2 ** 63 - 1
+
+
+def reverse_timestamp(dt):
+    # newer rows get smaller values, so that a scan returns newest first
+    return MAX_TIMESTAMP - (dt - EPOCH) // timedelta(microseconds=1)
+
+
+def from_reverse_timestamp(value):
+    return EPOCH + timedelta(microseconds=MAX_TIMESTAMP - value)
+
+
+def make_row_key(*parts):
+    # fixed width big endian integers sort like the integers themselves
+    return b''.join(struct.pack('>Q', part) for part in parts)
+
+
+def parse_row_key(row_key):
+    return struct.unpack('>{}Q'.format(len(row_key) // 8), row_key)
+
+
+class WideColumnTable:
+    """
+    rows sorted by a binary row key, each row holds a dict of columns. the
+    access pattern is the one of HBase / Cassandra: get rows by key and scan
+    a range of keys in order.
+    """
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def put(self, row_key, columns):
+        self.put_many([(row_key, columns)])
+
+    def put_many(self, rows):
+        self.client.execute_many(
+            'INSERT OR REPLACE INTO "{}" (row_key, columns) VALUES (?, ?)'
+            .format(self.name),
+            [(row_key, json.dumps(columns)) for row_key, columns in rows],
+        )
+
+    def row(self, row_key):
+        rows = self.rows([row_key])
+        return rows.get(row_key)
+
+    def rows(self, row_keys):
+        # returns {row_key: columns}, missing rows are left out
+        row_keys = list(row_keys)
+        if not row_keys:
+            return {}
+        results = self.client.execute(
+            'SELECT row_key, columns FROM "{}" WHERE row_key IN ({})'.format(
+                self.name,
+                ', '.join('?' * len(row_keys)),
+            ),
+            row_keys,
+        )
+        return {row_key: json.loads(columns) for row_key, columns in results}
+
+    def delete(self, row_key):
+        self.delete_many([row_key])
+
+    def delete_many(self, row_keys):
+        self.client.execute_many(
+            'DELETE FROM "{}" WHERE row_key = ?'.format(self.name),
+            [(row_key,) for row_key in row_keys],
+        )
+
+    def scan(self, row_start=None, row_stop=None, limit=None):
+        # returns [(row_key, columns)] with row_start <= row_key < row_stop
+        conditions, params = [], []
+        if row_start is not None:
+            conditions.append('row_key >= ?')
+            params.append(row_start)
+        if row_stop is not None:
+            conditions.append('row_key < ?')
+            params.append(row_stop)
+        sql = 'SELECT row_key, columns FROM "{}"'.format(self.name)
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY row_key'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [
+            (bytes(row_key), json.loads(columns))
+            for row_key, columns in self.client.execute(sql, params)
+        ]
+
+
+class Scan:
+    """
+    a lazy scan which can be sliced like a queryset, scan[:n] only reads
+    the first n rows. to_object(row_key, columns) builds the results.
+    """
+
+    def __init__(self, table, row_start, row_stop, to_object):
+        self.table = table
+        self.row_start = row_start
+        self.row_stop = row_stop
+        self.to_object = to_object
+
+    def fetch(self, limit=None):
+        return [
+            self.to_object(row_key, columns)
+            for row_key, columns in self.table.scan(
+                self.row_start,
+                self.row_stop,
+                limit,
+            )
+        ]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.start or index.step:
+            raise TypeError('a scan only supports [:limit] slices')
+        return self.fetch(index.stop)
+
+    def __iter__(self):
+        return iter(self.fetch())
+
+
+class WideColumnClient:
+    """
+    embedded, file-backed stand-in of a wide-column store, one sqlite table
+    sorted by row key per wide-column table. it needs no external service
+    and the processes of a host share the file at WIDE_COLUMN_LOCATION.
+    """
+    conn = None
+    pid = None
+    lock = threading.Lock()
+    tables = set()
+
+    @classmethod
+    def get_connection(cls):
+        # one connection per process, a forked worker opens its own
+        if cls.conn is not None and cls.pid == os.getpid():
+            return cls.conn
+        cls.conn = sqlite3.connect(
+            settings.WIDE_COLUMN_LOCATION,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        cls.pid = os.getpid()
+        cls.tables = set()
+        return cls.conn
+
+    @classmethod
+    def get_table(cls, name):
+        with cls.lock:
+            conn = cls.get_connection()
+            if name not in cls.tables:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS "{}" ('
+                    'row_key BLOB PRIMARY KEY, columns TEXT NOT NULL'
+                    ') WITHOUT ROWID'.format(name),
+                )
+                cls.tables.add(name)
+        return WideColumnTable(cls, name)
+
+    @classmethod
+    def execute(cls, sql, params):
+        with cls.lock:
+            return cls.get_connection().execute(sql, params).fetchall()
+
+    @classmethod
+    def execute_many(cls, sql, params_list):
+        with cls.lock:
+            conn = cls.get_connection()
+            with conn:
+                conn.execute('BEGIN')
+                conn.executemany(sql, params_list)
+
+    @classmethod
+    def clear(cls):
+        # clear all tables, for testing purpose
+        if not settings.TESTING:
+            raise Exception('You can not clear the wide column store in production environment')
+        with cls.lock:
+            conn = cls.get_connection()
+            for name in cls.tables:
+                conn.execute('DELETE FROM "{}"'.format(name))